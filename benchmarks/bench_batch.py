@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the batch runner.
+
+Processes eyepy archives of synthetic volumes with the default stages (import,
+layer check, drusen, quantification) serially in this process and in a
+process pool, then resumes the finished run, which only rewrites the output
+from the checkpoints.
+
+Run with `python benchmarks/bench_batch.py`
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import eyepy as ep
+from eyepy.batch import BatchRunner
+
+from bench_drusen import make_layers
+
+
+def make_archives(folder, n_volumes, volume_shape=(49, 496, 512)):
+    paths = []
+    for i in range(n_volumes):
+        rng = np.random.default_rng(i)
+        volume = ep.EyeVolume(
+            data=rng.integers(0, 255, volume_shape, dtype=np.uint8),
+        )
+        volume.meta.update(patient_id=str(i), laterality="OD")
+        rpe, bm = make_layers(volume_shape, seed=i)
+        volume.add_layer("RPE", rpe)
+        volume.add_layer("BM", bm)
+        path = Path(folder) / f"volume{i:03d}.eye"
+        volume.save(path)
+        paths.append(path)
+    return paths
+
+
+def run(folder, name, max_workers):
+    start = time.perf_counter()
+    with BatchRunner(Path(folder) / f"{name}.csv", max_workers=max_workers) as runner:
+        counts = runner.run(Path(folder) / "*.eye")
+    return time.perf_counter() - start, counts
+
+
+if __name__ == "__main__":
+    n_volumes = 32
+    with tempfile.TemporaryDirectory() as folder:
+        make_archives(folder, n_volumes)
+        print(f"{n_volumes} volumes, {os.cpu_count()} CPUs")
+        for name, max_workers in [("serial", 0), ("pool", None), ("pool", None)]:
+            duration, counts = run(folder, name, max_workers)
+            print(f"{name:>8} {duration:8.2f} s {counts}")
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the drusen map construction.
+
+Compares the previous map construction, a Python loop over all A-scans, with
+`eyepy.drusen`, which computes an IntervalVoxelMap, and with converting that
+map into a dense boolean array. Then compares recomputing the filtered drusen
+after an RPE edit with the update of `IncrementalDrusen`.
+
+Run with `python benchmarks/bench_drusen.py`
+"""
+import timeit
+
+import numpy as np
+
+import eyepy as ep
+from eyepy.quantification._drusen import ideal_rpe
+
+
+def legacy_drusen_map(rpe_height, bm_height, volume_shape):
+    idealrpe = ideal_rpe(rpe_height, bm_height, volume_shape)
+    drusen_map = np.zeros(volume_shape, dtype=bool)
+    rpe = np.flip((rpe_height + 1).astype(int), axis=0)
+    irpe = np.flip(idealrpe.astype(int), axis=0)
+    for sli in range(drusen_map.shape[0]):
+        for col in range(drusen_map.shape[2]):
+            if not rpe[sli, col] == -9223372036854775808:
+                drusen_map[sli, rpe[sli, col] : irpe[sli, col], col] = 1
+    return drusen_map
+
+
+def make_layers(volume_shape, seed=0):
+    n_bscans, height, width = volume_shape
+    rng = np.random.default_rng(seed)
+    bm = np.full((n_bscans, width), height * 0.8) + rng.normal(
+        0, 0.5, (n_bscans, width)
+    )
+    # Smooth random elevations of the RPE
+    elevation = np.maximum(rng.normal(0, 4, (n_bscans // 8 + 1, width // 8 + 1)), 0)
+    elevation = np.kron(elevation, np.ones((8, 8)))[:n_bscans, :width]
+    rpe = bm - 6 - elevation
+    return rpe, bm
+
+
+if __name__ == "__main__":
+    print(f"{'volume':>16} {'loop [ms]':>10} {'interval [ms]':>14} {'dense [ms]':>11}")
+    for volume_shape in [(49, 496, 512), (97, 496, 512), (241, 496, 768)]:
+        rpe, bm = make_layers(volume_shape)
+        expected = legacy_drusen_map(rpe, bm, volume_shape)
+        result = ep.drusen(rpe, bm, volume_shape, minimum_height=0)
+        assert np.array_equal(np.asarray(result), expected)
+
+        t_loop = min(
+            timeit.repeat(
+                lambda: legacy_drusen_map(rpe, bm, volume_shape), number=1, repeat=3
+            )
+        )
+        t_interval = min(
+            timeit.repeat(
+                lambda: ep.drusen(rpe, bm, volume_shape, minimum_height=0),
+                number=1,
+                repeat=3,
+            )
+        )
+        t_dense = min(
+            timeit.repeat(
+                lambda: np.asarray(ep.drusen(rpe, bm, volume_shape, minimum_height=0)),
+                number=1,
+                repeat=3,
+            )
+        )
+        shape = "x".join(str(s) for s in volume_shape)
+        print(
+            f"{shape:>16} {t_loop * 1e3:>10.1f} {t_interval * 1e3:>14.1f}"
+            f" {t_dense * 1e3:>11.1f}"
+        )
+
+    print()
+    print(f"{'volume':>16} {'drusen() [ms]':>14} {'incremental [ms]':>17}")
+    for volume_shape in [(49, 496, 512), (97, 496, 512), (241, 496, 768)]:
+        rpe, bm = make_layers(volume_shape)
+        volume = ep.EyeVolume(
+            data=np.broadcast_to(np.zeros(1, dtype=np.uint8), volume_shape),
+            localizer=ep.EyeEnface(np.zeros((1, 1)), meta=None),
+        )
+        volume.add_layer("RPE", rpe)
+        volume.add_layer("BM", bm)
+        tracker = ep.quantification.IncrementalDrusen(volume)
+
+        t_full = min(
+            timeit.repeat(lambda: ep.drusen(rpe, bm, volume_shape), number=1, repeat=3)
+        )
+
+        bscan = volume[volume_shape[0] // 2]
+        original = bscan.layers["RPE"].copy()
+
+        def edit():
+            heights = original.copy()
+            heights[100:140] -= np.random.uniform(0, 10)
+            bscan.layers["RPE"] = heights
+
+        t_incremental = min(timeit.repeat(edit, number=1, repeat=10))
+        shape = "x".join(str(s) for s in volume_shape)
+        print(f"{shape:>16} {t_full * 1e3:>14.1f} {t_incremental * 1e3:>17.1f}")
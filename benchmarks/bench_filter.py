@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the connected component filters for many components.
+
+Compares the previous filters, which looped over all components, with the
+current filters based on per label reductions.
+
+Run with `python benchmarks/bench_filter.py`
+"""
+import timeit
+
+import numpy as np
+from scipy import ndimage
+
+from eyepy.quantification.utils.filter import filter_by_depth, filter_by_height_enface
+
+
+def legacy_filter_by_depth(drusen_map, minimum_depth=2):
+    filtered_drusen = np.copy(drusen_map)
+    connected_component_array, num_drusen = ndimage.label(drusen_map)
+    max_depths = np.zeros_like(connected_component_array)
+    for label, drusen_pos in enumerate(ndimage.find_objects(connected_component_array)):
+        component_sub_vol = connected_component_array[drusen_pos]
+        component_max_depth = np.max(np.sum(component_sub_vol == label + 1, axis=0))
+        component_sub_vol[component_sub_vol == label + 1] = component_max_depth
+        max_depths[drusen_pos] = component_sub_vol
+    filtered_drusen[max_depths < minimum_depth] = False
+    return filtered_drusen.astype(bool)
+
+
+def legacy_filter_by_height_enface(drusen_map, minimum_height=2):
+    projection = np.sum(drusen_map, axis=1, keepdims=True)
+    connected_component_array, num_drusen = ndimage.label(projection != 0)
+    max_heights = np.zeros_like(connected_component_array)
+    for drusen_pos in ndimage.find_objects(connected_component_array):
+        component_sub_vol = connected_component_array[drusen_pos]
+        label = np.bincount(component_sub_vol[component_sub_vol != 0]).argmax()
+        component_max_height = np.max(
+            projection[drusen_pos][component_sub_vol == label]
+        )
+        max_heights[drusen_pos][component_sub_vol == label] = component_max_height
+    filtered_drusen = np.copy(drusen_map)
+    indices = np.nonzero(max_heights < minimum_height)
+    filtered_drusen[indices[0], :, indices[2]] = False
+    return filtered_drusen.astype(bool)
+
+
+def many_drusen(volume_shape, n_drusen, seed=0):
+    """Small separated box shaped drusen on random cells of a grid."""
+    rng = np.random.default_rng(seed)
+    n_bscans, height, width = volume_shape
+    drusen_map = np.zeros(volume_shape, dtype=bool)
+    cells = rng.choice((n_bscans // 2) * (width // 4), n_drusen, replace=False)
+    for cell in cells:
+        z, x = 2 * (cell // (width // 4)), 4 * (cell % (width // 4))
+        top = rng.integers(height // 2, height - 8)
+        drusen_map[z, top : top + rng.integers(1, 8), x : x + 3] = True
+    return drusen_map
+
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1e3
+
+
+if __name__ == "__main__":
+    volume_shape = (49, 496, 512)
+    print(f"{'components':>11} {'filter':>8} {'loop [ms]':>10} {'labels [ms]':>12}")
+    for n_drusen in [100, 1000, 3000]:
+        drusen_map = many_drusen(volume_shape, n_drusen)
+        n_enface = ndimage.label(drusen_map.sum(axis=1) != 0)[1]
+        n_volume = ndimage.label(drusen_map)[1]
+
+        t_legacy = best_of(lambda: legacy_filter_by_height_enface(drusen_map, 3))
+        t_new = best_of(lambda: filter_by_height_enface(drusen_map, 3))
+        print(f"{n_enface:>11} {'height':>8} {t_legacy:>10.1f} {t_new:>12.1f}")
+
+        assert np.array_equal(
+            legacy_filter_by_depth(drusen_map, 2), filter_by_depth(drusen_map, 2)
+        )
+        t_legacy = best_of(lambda: legacy_filter_by_depth(drusen_map, 2))
+        t_new = best_of(lambda: filter_by_depth(drusen_map, 2))
+        print(f"{n_volume:>11} {'depth':>8} {t_legacy:>10.1f} {t_new:>12.1f}")
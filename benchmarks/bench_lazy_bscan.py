@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark for iterating the B-scans of a LazyVolume.
+
+Iterating all B-scans and reading their `index` used to call `list.index` for
+every B-scan, which is quadratic in the number of B-scans. The index is now
+stored when the B-scan is created.
+
+Run with `python benchmarks/bench_lazy_bscan.py`
+"""
+import timeit
+
+import numpy as np
+
+from eyepy.io.lazy import LazyBscan, LazyVolume
+
+
+def make_volume(n_bscans):
+    meta = {"Quality": 1.0, "StartX": 0.0, "StartY": 0.0}
+    bscans = [
+        LazyBscan(np.zeros((2, 2), dtype="float32"), meta=meta) for _ in range(n_bscans)
+    ]
+    return LazyVolume(bscans=bscans, meta={"NumBScans": n_bscans}, data_path=".")
+
+
+def iterate_stored(volume):
+    return [bscan.index for bscan in volume]
+
+
+def iterate_list_index(volume):
+    # The previous implementation of LazyBscan.index
+    return [volume.bscans.index(bscan) for bscan in volume]
+
+
+if __name__ == "__main__":
+    print(f"{'B-scans':>8} {'list.index [ms]':>16} {'stored [ms]':>12}")
+    for n_bscans in [100, 500, 2000]:
+        volume = make_volume(n_bscans)
+        assert iterate_stored(volume) == iterate_list_index(volume)
+        t_list = min(timeit.repeat(lambda: iterate_list_index(volume), number=3))
+        t_stored = min(timeit.repeat(lambda: iterate_stored(volume), number=3))
+        print(f"{n_bscans:>8} {t_list / 3 * 1e3:>16.2f} {t_stored / 3 * 1e3:>12.2f}")
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the grid quantification of several volume maps.
+
+Compares the previous quantification, which multiplied every enface
+projection with every mask, with a single product of the stacked projections
+and the sparse mask matrix. Then compares the quantification of changed maps
+on the localizer, which requires warping the projections, with the
+quantification in OCT space.
+
+Run with `python benchmarks/bench_quantification.py`
+"""
+import timeit
+
+import numpy as np
+
+import eyepy as ep
+
+
+def legacy_quantify(voxel_map):
+    return {
+        name: (voxel_map.enface * mask).sum() for name, mask in voxel_map.masks.items()
+    }
+
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1e3
+
+
+def clear(volume):
+    for voxel_map in volume.volume_maps.values():
+        voxel_map._cache.pop("quantification", None)
+
+
+def change(volume):
+    for voxel_map in volume.volume_maps.values():
+        voxel_map.mark_dirty()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    volume = ep.EyeVolume(data=np.zeros((49, 64, 512), dtype=np.uint8))
+    volume.meta["laterality"] = "OD"
+    # Localizer of 512x512 pixels, grid radii are scaled to pixels by scale_x
+    volume.meta["scale_x"] = 0.0113
+
+    print(f"{'maps':>5} {'loop [ms]':>10} {'matrix [ms]':>12}")
+    for n_maps in [1, 4, 16]:
+        volume.volume_maps = {}
+        for i in range(n_maps):
+            volume.set_volume_map(f"map{i}", rng.random((49, 64, 512)) > 0.9)
+        # Projections, enfaces and masks are computed once up front
+        maps = list(volume.volume_maps.values())
+        for voxel_map in maps:
+            voxel_map.enface, voxel_map.mask_matrix
+
+        t_legacy = best_of(lambda: [legacy_quantify(m) for m in maps])
+        t_new = best_of(lambda: (clear(volume), volume.quantify()))
+        print(f"{n_maps:>5} {t_legacy:>10.1f} {t_new:>12.1f}")
+
+    print(f"\n{'maps':>5} {'localizer [ms]':>15} {'oct [ms]':>9}")
+    # The grid weights of the A-scans are computed once up front
+    volume.quantify(space="oct")
+    t_localizer = best_of(lambda: (change(volume), volume.quantify()))
+    t_oct = best_of(lambda: (change(volume), volume.quantify(space="oct")))
+    print(f"{len(volume.volume_maps):>5} {t_localizer:>15.1f} {t_oct:>9.1f}")
@@ -0,0 +1,489 @@
+# -*- coding: utf-8 -*-
+"""Batch processing of many volumes in a process pool.
+
+Every input file runs through a chain of stages, for example import, layer
+checks, drusen and quantification. Each stage adds columns to the result row
+of the file. Rows are written to a CSV or Parquet table as soon as their file
+is finished, and a checkpoint of every finished file is kept in an SQLite
+database, so an interrupted run can be resumed without processing finished
+files again.
+"""
+import abc
+import csv
+import glob
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ImportVolume:
+    def __init__(self, importer: Optional[Callable] = None, **kwargs):
+        """Import stage, the first stage of a chain
+
+        Adds the patient ID, visit date, laterality and shape of the volume to
+        the row.
+
+        Args:
+            importer: Function which imports a volume from a path. By default
+                the importer is chosen by the input: `import_heyex_vol` for
+                .vol files, `import_heyex_xml` for .xml files and
+                `EyeVolume.load` for eyepy archives.
+            **kwargs: Passed to the importer
+        """
+        self.importer = importer
+        self.kwargs = kwargs
+
+    def _importer(self, path: Path) -> Callable:
+        if self.importer is not None:
+            return self.importer
+        from eyepy import EyeVolume, import_heyex_vol, import_heyex_xml
+
+        if path.suffix.lower() == ".vol":
+            return import_heyex_vol
+        if path.suffix.lower() == ".xml":
+            return import_heyex_xml
+        if (path / "meta.json").is_file():
+            return EyeVolume.load
+        raise ValueError(f"No importer for {path}, please provide one.")
+
+    def __call__(self, path, row: Dict) -> "EyeVolume":
+        path = Path(path)
+        volume = self._importer(path)(path, **self.kwargs)
+        row.update(
+            patient_id=volume.meta.get("patient_id"),
+            visit_date=volume.meta.get("visit_date"),
+            laterality=volume.meta.get("laterality"),
+            n_bscans=volume.size_z,
+            size_y=volume.size_y,
+            size_x=volume.size_x,
+        )
+        return volume
+
+
+class CheckLayers:
+    def __init__(self, layers: Sequence[str] = ("RPE", "BM"), max_missing=0.1):
+        """Check that layers are present and mostly annotated
+
+        Adds the fraction of A-scans without height for every layer to the
+        row. The file fails when a layer is missing or too sparse.
+
+        Args:
+            layers: Names of the required layers
+            max_missing: Maximum fraction of A-scans without height
+        """
+        self.layers = list(layers)
+        self.max_missing = max_missing
+
+    def __call__(self, volume, row: Dict):
+        for name in self.layers:
+            if name not in volume.layers:
+                raise ValueError(f"Layer {name} is missing.")
+            missing = float(np.mean(np.isnan(volume.layers[name].data)))
+            row[f"{name} missing"] = missing
+            if missing > self.max_missing:
+                raise ValueError(
+                    f"Layer {name} has no height for {missing:.1%} of the A-scans."
+                )
+        return volume
+
+
+class ComputeDrusen:
+    def __init__(
+        self,
+        rpe: str = "RPE",
+        bm: str = "BM",
+        minimum_height: int = 2,
+        name: str = "drusen",
+    ):
+        """Compute drusen from the RPE and BM and set them as volume map
+
+        Args:
+            rpe: Name of the RPE layer
+            bm: Name of the BM layer
+            minimum_height: Minimum height of the highest A-scan of a drusen
+            name: Name of the volume map holding the drusen
+        """
+        self.rpe = rpe
+        self.bm = bm
+        self.minimum_height = minimum_height
+        self.name = name
+
+    def __call__(self, volume, row: Dict):
+        from eyepy.quantification import drusen
+
+        drusen_map = drusen(
+            volume.layers[self.rpe].data,
+            volume.layers[self.bm].data,
+            volume.shape,
+            minimum_height=self.minimum_height,
+        )
+        volume.set_volume_map(self.name, drusen_map)
+        return volume
+
+
+class Quantify:
+    def __init__(self, names: Optional[List[str]] = None, space: str = "localizer"):
+        """Quantify volume maps
+
+        Adds a column "<map name> <region>" for every quantified value.
+
+        Args:
+            names: Names of the volume maps to quantify. If None, all volume
+                maps are quantified.
+            space: "localizer" or "oct", see `EyeVolume.quantify`
+        """
+        self.names = names
+        self.space = space
+
+    def __call__(self, volume, row: Dict):
+        results = volume.quantify(self.names, space=self.space)
+        for name, result in results.items():
+            row.update({f"{name} {key}": value for key, value in result.items()})
+        return volume
+
+
+def default_stages() -> List[Callable]:
+    """Import, layer check, drusen and quantification of the drusen"""
+    return [ImportVolume(), CheckLayers(), ComputeDrusen(), Quantify(["drusen"])]
+
+
+def _plain(value):
+    """Convert a row value to a type which can be stored as JSON, CSV or Parquet"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _process(path: str, stages: Sequence[Callable]) -> Dict:
+    """Run the stages for a single file and return its row"""
+    row = {"path": path}
+    data = path
+    try:
+        for stage in stages:
+            data = stage(data, row)
+    except Exception as e:
+        logger.warning(f"Processing {path} failed in {type(stage).__name__}: {e}")
+        row["error"] = repr(e)
+    else:
+        row["error"] = None
+    return {key: _plain(value) for key, value in row.items()}
+
+
+def _expand_inputs(inputs: Union[str, os.PathLike, Iterable]) -> List[Path]:
+    if isinstance(inputs, (str, os.PathLike)):
+        if Path(inputs).is_dir() and not (Path(inputs) / "meta.json").is_file():
+            paths = []
+            for p in Path(inputs).rglob("*"):
+                if p.suffix.lower() in [".vol", ".xml"] and p.is_file():
+                    paths.append(p)
+                elif p.name == "meta.json" and p.is_file():
+                    # An eyepy archive
+                    paths.append(p.parent)
+            if not paths:
+                logger.warning(f"No .vol, .xml or eyepy archives found in {inputs}")
+        elif glob.has_magic(str(inputs)):
+            paths = [Path(p) for p in glob.glob(str(inputs), recursive=True)]
+            if not paths:
+                logger.warning(f"No inputs match {inputs}")
+        else:
+            paths = [Path(inputs)]
+    else:
+        paths = [Path(p) for p in inputs]
+
+    # Resolved paths identify the checkpoints, duplicates are processed once
+    return sorted(set(p.resolve() for p in paths))
+
+
+class _TableWriter(abc.ABC):
+    def __init__(self, path: Path):
+        """Write rows to a table as they arrive
+
+        The columns are the columns of the rows before the first successful
+        row. Columns which only appear later are not written.
+        """
+        self.path = path
+        self.columns = None
+        self._pending = []
+        self._dropped = set()
+
+    def write(self, row: Dict):
+        if self.columns is None:
+            self._pending.append(row)
+            if row.get("error") is None:
+                self._start()
+            return
+        self._write(self._values(row))
+
+    def _start(self):
+        columns = {}
+        for row in self._pending:
+            columns.update(dict.fromkeys(row))
+        columns.pop("path", None)
+        columns.pop("error", None)
+        self.columns = ["path"] + list(columns) + ["error"]
+        self._open()
+        for row in self._pending:
+            self._write(self._values(row))
+        self._pending = []
+
+    def _values(self, row: Dict) -> list:
+        dropped = set(row) - set(self.columns) - self._dropped
+        if dropped:
+            logger.warning(f"Columns {', '.join(sorted(dropped))} are not written.")
+            self._dropped |= dropped
+        return [row.get(column) for column in self.columns]
+
+    def close(self):
+        if self.columns is None:
+            self._start()
+        self._close()
+
+    @abc.abstractmethod
+    def _open(self):
+        """Create the table with `columns`"""
+
+    @abc.abstractmethod
+    def _write(self, values: list):
+        """Write the values of a row in the order of `columns`"""
+
+    @abc.abstractmethod
+    def _close(self):
+        """Write pending rows and close the table"""
+
+
+class _CsvWriter(_TableWriter):
+    def _open(self):
+        self._file = open(self.path, "w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def _write(self, values):
+        self._writer.writerow(["" if v is None else v for v in values])
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
+
+
+class _ParquetWriter(_TableWriter):
+    def __init__(self, path: Path, row_group_size: int = 256):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(
+                "Writing Parquet files requires pyarrow, please install it or "
+                "use a .csv output."
+            ) from e
+        super().__init__(path)
+        self.row_group_size = row_group_size
+        self._rows = []
+
+    def _open(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Column types are taken from the first successful row
+        types = {bool: pa.bool_(), int: pa.int64(), float: pa.float64()}
+        first = next((r for r in self._pending if r.get("error") is None), {})
+        first = self._values(first)
+        self._schema = pa.schema(
+            [
+                (column, types.get(type(value), pa.string()))
+                for column, value in zip(self.columns, first)
+            ]
+        )
+        self._writer = pq.ParquetWriter(str(self.path), self._schema)
+
+    def _write(self, values):
+        self._rows.append(values)
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+
+        if self._rows:
+            columns = [list(column) for column in zip(*self._rows)]
+            self._writer.write_table(pa.Table.from_arrays(columns, schema=self._schema))
+            self._rows = []
+
+    def _close(self):
+        self._flush()
+        self._writer.close()
+
+
+def _table_writer(path: Path) -> _TableWriter:
+    if path.suffix.lower() == ".csv":
+        return _CsvWriter(path)
+    if path.suffix.lower() == ".parquet":
+        return _ParquetWriter(path)
+    raise ValueError("The output has to be a .csv or .parquet file.")
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        output: Union[str, Path],
+        stages: Optional[Sequence[Callable]] = None,
+        checkpoint: Union[str, Path, None] = None,
+        max_workers: Optional[int] = None,
+    ):
+        """Run a chain of stages for many files in a process pool
+
+        A stage is called as `stage(data, row)` and returns the data for the
+        next stage. The first stage receives the path of the file, usually it
+        imports the volume. Stages add their results to the `row` dict. When a
+        stage raises an exception the remaining stages are skipped and the
+        exception is recorded in the "error" column. Stages are sent to the
+        worker processes, hence they have to be picklable.
+
+        Checkpoints are kept per file together with its size and modification
+        time. Files with an unchanged checkpoint are not processed again. When
+        the stages are changed, use a new checkpoint database.
+
+        Args:
+            output: The .csv or .parquet file the rows are written to. It is
+                rewritten on every run, starting with the rows of the
+                checkpointed files.
+            stages: The chain of stages. Defaults to `default_stages()`.
+            checkpoint: Location of the SQLite checkpoint database. Defaults to
+                the output path with the suffix ".checkpoint.sqlite".
+            max_workers: Maximum number of worker processes. With 0 the files
+                are processed in the calling process.
+        """
+        self.output = Path(output)
+        self.stages = default_stages() if stages is None else list(stages)
+        if checkpoint is None:
+            checkpoint = self.output.with_name(self.output.name + ".checkpoint.sqlite")
+        self.checkpoint = Path(checkpoint)
+        self.max_workers = max_workers
+
+        self._connection = sqlite3.connect(str(self.checkpoint))
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, "
+                "error TEXT, row TEXT)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def _checkpoints(self) -> Dict[str, tuple]:
+        rows = self._connection.execute(
+            "SELECT path, size, mtime, error, row FROM checkpoints"
+        )
+        return {
+            path: (size, mtime, error, row) for path, size, mtime, error, row in rows
+        }
+
+    def _save_checkpoint(self, path: Path, stat, row: Dict):
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (path, size, mtime, error, row) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    str(path),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    row["error"],
+                    json.dumps(row),
+                ),
+            )
+
+    def run(
+        self,
+        inputs: Union[str, Path, Iterable[Union[str, Path]]],
+        retry_failed: bool = False,
+    ) -> Dict[str, int]:
+        """Process all inputs which have no checkpoint yet
+
+        Args:
+            inputs: A glob pattern, a directory which is searched recursively
+                for .vol and .xml files and eyepy archives, or an iterable of
+                paths
+            retry_failed: Whether to process files again whose checkpoint
+                records an error
+
+        Returns:
+            The number of processed, failed and skipped files
+        """
+        paths = _expand_inputs(inputs)
+        checkpoints = self._checkpoints()
+
+        writer = _table_writer(self.output)
+        todo = {}
+        skipped = failed = 0
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError as e:
+                # Not checkpointed, the file is tried again in the next run
+                logger.warning(f"Can not access {path}: {e}")
+                writer.write({"path": str(path), "error": repr(e)})
+                failed += 1
+                continue
+            checkpoint = checkpoints.get(str(path))
+            if (
+                checkpoint is not None
+                and checkpoint[:2] == (stat.st_size, stat.st_mtime_ns)
+                and (checkpoint[2] is None or not retry_failed)
+            ):
+                writer.write(json.loads(checkpoint[3]))
+                skipped += 1
+            else:
+                todo[str(path)] = stat
+
+        try:
+            for path, row in self._rows(list(todo)):
+                # The row is written first: if the checkpoint is not saved, the
+                # file is processed again on resume and the output rewritten
+                writer.write(row)
+                self._save_checkpoint(path, todo[path], row)
+                failed += row["error"] is not None
+                logger.info(f"Finished {path}")
+        finally:
+            writer.close()
+
+        return {
+            "processed": len(paths) - skipped - failed,
+            "failed": failed,
+            "skipped": skipped,
+        }
+
+    def _rows(self, paths: List[str]):
+        """Rows of the given files in the order they are finished"""
+        if self.max_workers == 0:
+            for path in paths:
+                yield path, _process(path, self.stages)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(_process, p, self.stages): p for p in paths}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                # Do not start pending files when the run is interrupted
+                for future in futures:
+                    future.cancel()
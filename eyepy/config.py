@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 from collections import defaultdict
 
+# If set, grid masks for quantification are cached in this directory, which can
+# be shared by several processes, for example "~/.cache/eyepy/grids". The least
+# recently used masks are removed when the cache exceeds grid_cache_size bytes.
+# If not set, the masks are cached in memory of every process instead.
+grid_cache_dir = None
+grid_cache_size = 256 * 2 ** 20
+
 # Plotting config
 
 # Line Style for Layers in B-Scan
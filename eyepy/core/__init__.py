@@ -4,3 +4,10 @@ from .eyebscan import EyeBscan
 from .eyedata import EyeData
 from .eyevolume import EyeVolume, EyeVolumeVoxelAnnotation, EyeVolumeLayerAnnotation
 from .eyeenface import EyeEnface
+from .utils import ChunkedIntensityTransform
+from .voxelmaps import (
+    IntervalVoxelMap,
+    LabelVoxelMap,
+    PackedVoxelMap,
+    RunLengthVoxelMap,
+)
@@ -14,7 +14,9 @@ class EyeBscanLayers:
         return self.volume.layers[item].data[-(self.index + 1)]
 
     def __setitem__(self, key, value):
-        self.volume.layers[key].data[-(self.index + 1), :] = value
+        layer = self.volume.layers[key]
+        layer.data[-(self.index + 1), :] = value
+        layer.mark_dirty(self.index)
 
 
 class EyeBscan:
@@ -30,7 +32,7 @@ class EyeBscan:
 
     @property
     def data(self):
-        return self._volume.data[self.index]
+        return self._volume._get_bscan_data(self.index)
 
     @property
     def layers(self):
@@ -49,7 +51,7 @@ class EyeBscan:
 
     @property
     def shape(self):
-        return self.data.shape
+        return self._volume.shape[1:]
 
     def plot(
         self,
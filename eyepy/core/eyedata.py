@@ -2,44 +2,78 @@ import numpy as np
 import matplotlib.pyplot as plt
 from eyepy import config
 from skimage.transform._geometric import GeometricTransform
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class EyeData:
     def __init__(
         self,
         volume: "EyeVolume",
-        localizer: "EyeEnface",
-        transformation: GeometricTransform,
+        localizer: "EyeEnface" = None,
+        transformation: GeometricTransform = None,
     ):
+        """Access to the data of a volume and its localizer
+
+        The localizer and the transformation are those of the volume, the
+        volume is not modified.
+
+        Args:
+            volume: The volume
+            localizer: Deprecated, the localizer of the volume is used
+            transformation: Deprecated, the `localizer_transform` of the volume
+                (from OCT to localizer) is used
+        """
         self.volume = volume
-        self.localizer = localizer
-        self.localizer_transformation = (
-            transformation  # Localizer to OCT transformation
-        )
+        if localizer is not None and localizer is not volume.localizer:
+            logger.warning("The localizer is ignored, the volume localizer is used.")
+        if (
+            transformation is not None
+            and transformation is not volume.localizer_transform
+        ):
+            logger.warning(
+                "The transformation is ignored, the volume localizer_transform "
+                "is used."
+            )
+
+    @property
+    def localizer(self):
+        """The localizer of the volume"""
+        return self.volume.localizer
 
-    def save(self, path):
-        pass
+    @property
+    def localizer_transformation(self):
+        """Transformation from the OCT projection to the localizer
+
+        It is the `localizer_transform` of the volume, such that enface
+        projections use the coordinate maps cached by the volume.
+        """
+        return self.volume.localizer_transform
+
+    def save(self, path, include_raw=False):
+        """Save as eyepy archive."""
+        self.volume.save(path, include_raw=include_raw)
 
     @classmethod
-    def load(cls, path):
-        pass
+    def load(cls, path, mmap_mode="r"):
+        from eyepy.core.eyevolume import EyeVolume
+
+        volume = EyeVolume.load(path, mmap_mode=mmap_mode)
+        return cls(volume, volume.localizer, volume.localizer_transform)
 
     @property
     def drusen_projection(self):
-        # Sum the all B-Scans along their first axis (B-Scan height)
-        # Swap axis such that the volume depth becomes the projections height not width
-        # We want the first B-Scan to be located at the bottom hence flip along axis 0
-        return np.flip(np.swapaxes(np.sum(self.drusen, axis=0), 0, 1), axis=0)
+        """Number of drusen voxels per A-scan, with the first B-scan at the bottom
+
+        The drusen are the "drusen" volume map of the volume.
+        """
+        return self.volume.volume_maps["drusen"].projection
 
     @property
     def drusen_enface(self):
         """Drusen projection warped into the localizer space."""
-        return transform.warp(
-            self.drusen_projection.astype(float),
-            self.tform_oct_to_localizer,
-            output_shape=self.localizer_shape,
-            order=0,
-        )
+        return self.volume.volume_maps["drusen"].enface
 
     # Data Access:
     # Bscans r
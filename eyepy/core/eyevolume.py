@@ -8,9 +8,11 @@ from skimage import transform
 from eyepy.core.eyeenface import EyeEnface
 from eyepy.core.eyebscan import EyeBscan
 from eyepy.core.eyemeta import EyeEnfaceMeta, EyeBscanMeta, EyeVolumeMeta
+from eyepy.core.voxelmaps import VoxelMap
 
 from eyepy import config
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+import threading
 import typing
 from typing import Union, List, Optional, Dict, TypedDict, Tuple, Callable
 from skimage.transform._geometric import GeometricTransform
@@ -50,6 +52,41 @@ class EyeVolumeLayerAnnotation:
         elif type(knots) is dict:
             self.knots = defaultdict(lambda: [], knots)
 
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        # Rows of the height map which changed since the last save
+        self._dirty = np.ones(len(value), dtype=bool)
+        self.volume._notify_layer_change(self)
+
+    def mark_dirty(self, bscan_index=None):
+        """Mark the layer heights of B-scans as changed
+
+        Modifications through `EyeBscan.layers` and replacing `data` are
+        tracked automatically. Call this after modifying `data` in place.
+        Listeners of the volume (e.g. `IncrementalDrusen`) are notified.
+
+        Args:
+            bscan_index: Index or indices of the changed B-scans. If None, all
+                B-scans are marked.
+        """
+        if bscan_index is None:
+            self._dirty[:] = True
+        else:
+            # The first B-scan is the last row of the height map
+            self._dirty[-(np.asarray(bscan_index) + 1)] = True
+        self.volume._notify_layer_change(self, bscan_index)
+
+    @property
+    def dirty_bscans(self) -> List[int]:
+        """Indices of B-scans with changed layer heights since the last save"""
+        rows = np.flatnonzero(self._dirty)
+        return sorted((len(self._dirty) - 1 - rows).tolist())
+
     def layer_indices(self):
         layer = self.data
         nan_indices = np.isnan(layer)
@@ -79,12 +116,53 @@ class EyeVolumeVoxelAnnotation:
         self._offsets = offsets
         self._center = center
 
+        self._grid = None
         self._masks = None
-        self._quantification = None
+        self._mask_matrix = None
+        self._oct_mask_matrix = None
 
     def _reset(self):
+        self._grid = None
         self._masks = None
-        self._quantification = None
+        self._mask_matrix = None
+        self._oct_mask_matrix = None
+        self._cache.pop("quantification", None)
+        self._cache.pop("oct_quantification", None)
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        # Incremented on every change of the data. Cached projections are
+        # only valid for the version they were computed for.
+        self._version = getattr(self, "_version", 0) + 1
+        self._cache = {}
+        # B-scans which changed since the last save
+        self._dirty = np.ones(len(value), dtype=bool)
+
+    def mark_dirty(self, bscan_index=None):
+        """Mark B-scans of the annotation as changed
+
+        Replacing `data` is tracked automatically. Call this after modifying
+        `data` in place, otherwise cached projections are not updated.
+
+        Args:
+            bscan_index: Index or indices of the changed B-scans. If None, all
+                B-scans are marked.
+        """
+        self._version += 1
+        if bscan_index is None:
+            self._dirty[:] = True
+        else:
+            self._dirty[bscan_index] = True
+
+    @property
+    def dirty_bscans(self) -> List[int]:
+        """Indices of B-scans changed since the last save"""
+        return np.flatnonzero(self._dirty).tolist()
 
     @property
     def radii(self):
@@ -122,21 +200,46 @@ class EyeVolumeVoxelAnnotation:
         self._reset()
         self._center = value
 
+    def _cached(self, name, key, func):
+        """Return the cached value of `name` if it was computed for `key`."""
+        try:
+            cached_key, value = self._cache[name]
+            if cached_key == key:
+                return value
+        except KeyError:
+            pass
+        value = func()
+        if isinstance(value, np.ndarray):
+            # Cached arrays are shared between callers
+            value.flags.writeable = False
+        self._cache[name] = (key, value)
+        return value
+
+    def _enface_key(self):
+        return (
+            self._version,
+            self.volume._localizer_transform_version,
+            self.volume.localizer.shape,
+        )
+
     @property
     def projection(self):
-        return np.flip(np.nansum(self.data, axis=1), axis=0)
+        def compute():
+            if isinstance(self.data, VoxelMap):
+                # Compact maps are projected without decoding the full volume
+                projection = self.data.projection()
+            else:
+                projection = np.nansum(self.data, axis=1)
+            return np.flip(projection, axis=0)
+
+        return self._cached("projection", self._version, compute)
 
     @property
     def enface(self):
-        return transform.warp(
-            self.projection,
-            self.volume.localizer_transform.inverse,
-            output_shape=(
-                self.volume.localizer.size_y,
-                self.volume.localizer.size_x,
-            ),
-            order=0,
-        )
+        def compute():
+            return self.volume.warp_projections(self.projection)
+
+        return self._cached("enface", self._enface_key(), compute)
 
     def plot(
         self,
@@ -182,11 +285,12 @@ class EyeVolumeVoxelAnnotation:
         )
 
     @property
-    def masks(self):
-        from eyepy.quantification.utils.grids import grid
+    def grid(self):
+        """Compact, read-only masks of the quantification grid"""
+        from eyepy.quantification.utils.grids import grid_masks
 
-        if self._masks is None:
-            self._masks = grid(
+        if self._grid is None:
+            self._grid = grid_masks(
                 mask_shape=self.volume.localizer.shape,
                 radii=self.radii,
                 laterality=self.volume.laterality,
@@ -195,47 +299,125 @@ class EyeVolumeVoxelAnnotation:
                 radii_scale=self.volume.scale_x,
                 center=self.center,
             )
+        return self._grid
 
+    @property
+    def masks(self):
+        if self._masks is None:
+            self._masks = self.grid.to_masks()
         return self._masks
 
     @property
-    def quantification(self):
-        if self._quantification is None:
-            self._quantification = self._quantify()
+    def mask_matrix(self):
+        """Region names and their masks stacked into a sparse matrix
 
-        return self._quantification
+        The matrix has shape (n_regions, n_pixels) where the pixels are the
+        flattened localizer pixels.
+        """
+        if self._mask_matrix is None:
+            self._mask_matrix = (self.grid.names, self.grid.matrix())
+        return self._mask_matrix
 
-    def _quantify(self):
-        enface_voxel_size_ym3 = (
-            self.volume.localizer.scale_x
-            * 1e3
-            * self.volume.localizer.scale_y
-            * 1e3
-            * self.volume.scale_y
-            * 1e3
-        )
-        oct_voxel_size_ym3 = (
-            self.volume.scale_x
-            * 1e3
-            * self.volume.scale_z
-            * 1e3
-            * self.volume.scale_y
-            * 1e3
-        )
+    @property
+    def oct_mask_matrix(self):
+        """Region names and the weights of the A-scans in the regions
+
+        The grid is mapped to the OCT projection with the localizer transform.
+        The weight of an A-scan is the fraction of its area (between the
+        neighbouring A-scans and B-scans) in the region. It is sampled with
+        about one sample per localizer pixel. The matrix has shape
+        (n_regions, n_ascans) where the A-scans are the flattened pixels of
+        the projection.
+        """
+        from scipy import sparse
 
-        enface_projection = self.enface
+        from eyepy.quantification.utils.grids import grid_regions
 
-        results = {}
-        for name, mask in self.masks.items():
-            results[f"{name} [mm³]"] = (
-                (enface_projection * mask).sum() * enface_voxel_size_ym3 / 1e9
+        key = (
+            self.volume._localizer_transform_version,
+            self.volume.localizer.shape,
+            self.volume.laterality,
+            self.volume.scale_x,
+        )
+        if self._oct_mask_matrix is not None and self._oct_mask_matrix[0] == key:
+            return self._oct_mask_matrix[1]
+
+        tform = self.volume.localizer_transform
+        n_bscans, width = self.volume.size_z, self.volume.size_x
+        # Number of samples per A-scan along and across the B-scans, such that
+        # samples are at most one localizer pixel apart
+        origin, step_x, step_y = tform(np.array([[0, 0], [1, 0], [0, 1]]))
+        n_x = max(1, int(np.ceil(np.linalg.norm(step_x - origin))))
+        n_y = max(1, int(np.ceil(np.linalg.norm(step_y - origin))))
+        offsets_x = (np.arange(n_x) + 0.5) / n_x - 0.5
+        offsets_y = (np.arange(n_y) + 0.5) / n_y - 0.5
+
+        ascans = np.arange(n_bscans * width).reshape(n_bscans, 1, width, 1)
+        # Samples of shape (n_bscans, n_y, width, n_x) in projection coordinates
+        x = np.arange(width)[:, None] + offsets_x
+        y = np.arange(n_bscans)[:, None] + offsets_y
+
+        counts = 0
+        # B-scans are processed in chunks to limit memory usage
+        for chunk in np.array_split(np.arange(n_bscans), max(1, n_bscans // 16)):
+            chunk_x, chunk_y, chunk_ascans = np.broadcast_arrays(
+                x[None, None], y[chunk, :, None, None], ascans[chunk]
+            )
+            points = tform(np.column_stack([chunk_x.ravel(), chunk_y.ravel()]))
+            names, regions = grid_regions(
+                points[:, 0],
+                points[:, 1],
+                mask_shape=self.volume.localizer.shape,
+                radii=self.radii,
+                laterality=self.volume.laterality,
+                n_sectors=self.n_sectors,
+                offsets=self.offsets,
+                radii_scale=self.volume.scale_x,
+                center=self.center,
+            )
+            inside = regions >= 0
+            counts = counts + np.bincount(
+                regions[inside] * n_bscans * width + chunk_ascans.ravel()[inside],
+                minlength=len(names) * n_bscans * width,
             )
 
-        results["Total [mm³]"] = enface_projection.sum() * enface_voxel_size_ym3 / 1e9
-        results["Total [OCT voxels]"] = self.projection.sum()
-        results["OCT Voxel Size [µm³]"] = oct_voxel_size_ym3
-        results["Laterality"] = self.volume.laterality
-        return results
+        weights = counts.reshape(len(names), n_bscans * width) / (n_x * n_y)
+        self._oct_mask_matrix = (key, (names, sparse.csr_matrix(weights)))
+        return self._oct_mask_matrix[1]
+
+    def _grid_key(self):
+        return (self.radii, self.n_sectors, self.offsets, self.center)
+
+    @property
+    def quantification(self):
+        return self._cached("quantification", self._enface_key(), self._quantify)
+
+    def _quantify(self):
+        return _quantify_maps([self])[0]
+
+    def quantify(self, space: str = "localizer") -> Dict:
+        """Quantify the annotation in the regions of the grid
+
+        Args:
+            space: If "localizer", the enface projection is quantified with
+                the grid masks on the localizer (see `quantification`). If
+                "oct", the grid is mapped to the OCT projection and the
+                projection is quantified at its native resolution with the
+                OCT voxel size. This avoids warping the projection.
+
+        Returns:
+            Volume of the annotation in every region, the total volume and
+            the OCT voxel size
+        """
+        if space == "localizer":
+            return self.quantification
+        if space == "oct":
+            return self._cached(
+                "oct_quantification",
+                self._enface_key(),
+                lambda: _quantify_maps([self], space)[0],
+            )
+        raise ValueError('space has to be one of "localizer" and "oct"')
 
     def plot_quantification(
         self,
@@ -282,6 +464,108 @@ class EyeVolumeVoxelAnnotation:
         )
 
 
+def _warp_enfaces(annotations: List[EyeVolumeVoxelAnnotation]):
+    """Compute missing enface projections of voxel annotations of a volume
+
+    The projections are warped to the localizer in a single stacked call and
+    cached in the annotations.
+    """
+    missing = [
+        a for a in annotations if a._cache.get("enface", (None,))[0] != a._enface_key()
+    ]
+    if len(missing) < 2:
+        return
+    volume = missing[0].volume
+    enfaces = volume.warp_projections(np.stack([a.projection for a in missing]))
+    for annotation, enface in zip(missing, enfaces):
+        annotation._cached("enface", annotation._enface_key(), lambda: enface)
+
+
+def _quantify_maps(
+    annotations: List[EyeVolumeVoxelAnnotation], space: str = "localizer"
+) -> List[Dict]:
+    """Quantify voxel annotations of a volume which share the same grid
+
+    The grid masks are stacked into a single sparse matrix, such that all
+    regions of a map are quantified by one product with its flattened enface
+    projection (localizer space) or projection (OCT space).
+    """
+    first = annotations[0]
+    volume = first.volume
+    oct_voxel_size_ym3 = (
+        volume.scale_x * 1e3 * volume.scale_z * 1e3 * volume.scale_y * 1e3
+    )
+
+    if space == "oct":
+        names, matrix = first.oct_mask_matrix
+        voxel_size_ym3 = oct_voxel_size_ym3
+        images = [a.projection for a in annotations]
+    else:
+        names, matrix = first.mask_matrix
+        voxel_size_ym3 = (
+            volume.localizer.scale_x
+            * 1e3
+            * volume.localizer.scale_y
+            * 1e3
+            * volume.scale_y
+            * 1e3
+        )
+        _warp_enfaces(annotations)
+        images = [a.enface for a in annotations]
+
+    results = []
+    for annotation, image in zip(annotations, images):
+        region_sums = matrix @ image.ravel()
+        result = {
+            f"{name} [mm³]": region_sum * voxel_size_ym3 / 1e9
+            for name, region_sum in zip(names, region_sums)
+        }
+        result["Total [mm³]"] = image.sum() * voxel_size_ym3 / 1e9
+        result["Total [OCT voxels]"] = annotation.projection.sum()
+        result["OCT Voxel Size [µm³]"] = oct_voxel_size_ym3
+        result["Laterality"] = volume.laterality
+        results.append(result)
+    return results
+
+
+class _BscanCache:
+    def __init__(self, max_bytes: int):
+        """A least recently used cache for B-scans, bounded by their size in bytes
+
+        Args:
+            max_bytes: Maximum size of all cached B-scans together
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, index):
+        with self._lock:
+            try:
+                self._store.move_to_end(index)
+            except KeyError:
+                return None
+            return self._store[index]
+
+    def put(self, index, data):
+        with self._lock:
+            if index in self._store:
+                self.nbytes -= self._store.pop(index).nbytes
+            if data.nbytes > self.max_bytes:
+                return
+            self._store[index] = data
+            self.nbytes += data.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._store.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self.nbytes = 0
+
+
 class EyeVolume:
     def __init__(
         self,
@@ -290,26 +574,51 @@ class EyeVolume:
         ascan_maps=None,
         localizer: "EyeEnface" = None,
         transformation: GeometricTransform = None,
+        bscan_cache_size: Optional[int] = None,
     ):
+        """
+
+        Args:
+            data: Raw OCT volume
+            meta: Meta data of the volume
+            ascan_maps:
+            localizer: Localizer image associated with the volume
+            transformation: Transformation from OCT projection to localizer space
+            bscan_cache_size: If given, B-scans are decoded individually through
+                the intensity transform when accessed and kept in a least recently
+                used cache of this size in bytes. The complete volume is only
+                transformed when `data` is accessed.
+        """
         self._raw_data = data
         self._data = None
         self.intensity_transform = lambda x: x
 
         self._bscans = {}
+        if bscan_cache_size is None:
+            self._bscan_cache = None
+        else:
+            self._bscan_cache = _BscanCache(bscan_cache_size)
 
         if meta is None:
-            self.meta = self._default_meta(self.data)
+            self.meta = self._default_meta(self._raw_data)
         else:
             self.meta = meta
 
         self.layers = defaultdict(lambda: EyeVolumeLayerAnnotation(self))
         self.volume_maps = {}
+        # Archive the volume was loaded from or saved to. Annotation changes
+        # are tracked relative to this archive.
+        self._archive_path = None
+        # Called with the layer annotation and the changed B-scan indices (None
+        # for all B-scans) when layer heights change
+        self._layer_listeners = []
 
         if ascan_maps is None:
             self.ascan_maps = {}
         else:
             self.ascan_maps = ascan_maps
 
+        self._localizer_transform_version = 0
         if transformation is None:
             self.localizer_transform = self._estimate_transform()
         else:
@@ -320,6 +629,19 @@ class EyeVolume:
         else:
             self.localizer = localizer
 
+    @property
+    def localizer_transform(self):
+        return self._localizer_transform
+
+    @localizer_transform.setter
+    def localizer_transform(self, value):
+        # Enface projections cached by the volume maps depend on the version.
+        # Set a new transform instead of modifying its parameters in place.
+        self._localizer_transform = value
+        self._localizer_transform_version += 1
+        # Coordinate maps of the previous transform, see `warp_projections`
+        self._warp_maps = {}
+
     def _default_meta(self, volume):
         bscan_meta = [
             EyeBscanMeta(
@@ -334,11 +656,8 @@ class EyeVolume:
 
     def _default_localizer(self, data):
         projection = np.flip(np.nanmean(data, axis=1), axis=0)
-        image = transform.warp(
-            projection,
-            self.localizer_transform.inverse,
-            output_shape=(self.size_x, self.size_x),
-            order=1,
+        image = self.warp_projections(
+            projection, order=1, output_shape=(self.size_x, self.size_x)
         )
         localizer = EyeEnface(
             image,
@@ -348,6 +667,80 @@ class EyeVolume:
         )
         return localizer
 
+    def _warp_coordinates(self, output_shape) -> np.ndarray:
+        """Projection coordinates of the localizer pixels, shape (2, *output_shape)"""
+        key = ("coordinates", output_shape)
+        if key not in self._warp_maps:
+            self._warp_maps[key] = transform.warp_coords(
+                self.localizer_transform.inverse, output_shape
+            )
+        return self._warp_maps[key]
+
+    def _warp_indices(self, output_shape) -> np.ndarray:
+        """Flat index of the nearest projection pixel for every localizer pixel
+
+        Localizer pixels outside of the projection have index -1.
+        """
+        key = ("indices", output_shape)
+        if key not in self._warp_maps:
+            # Warping the pixel indices selects the same pixels as warping a
+            # projection with nearest neighbour interpolation
+            n_pixels = self.size_z * self.size_x
+            indices = np.arange(n_pixels, dtype=float).reshape(self.size_z, -1)
+            warped = transform.warp(
+                indices, self._warp_coordinates(output_shape), order=0, cval=-1
+            )
+            self._warp_maps[key] = warped.astype(np.int64)
+        return self._warp_maps[key]
+
+    def warp_projections(
+        self,
+        projections: np.ndarray,
+        order: int = 0,
+        output_shape: Optional[Tuple[int, int]] = None,
+    ) -> np.ndarray:
+        """Warp projections of the volume to the localizer
+
+        The coordinate maps of the localizer transform are computed once and
+        reused until the transform changes. Several stacked projections are
+        warped at once.
+
+        Args:
+            projections: Projection of shape (n_bscans, n_ascans) with the
+                first B-scan at the bottom, or stacked projections of shape
+                (n_projections, n_bscans, n_ascans)
+            order: Interpolation order, 0 (nearest neighbour) or 1 (bilinear)
+            output_shape: Shape of the warped projections. Defaults to the
+                localizer shape.
+
+        Returns:
+            The warped projection(s). Pixels outside of the projection are 0.
+        """
+        if output_shape is None:
+            output_shape = self.localizer.shape
+        output_shape = tuple(int(s) for s in output_shape)
+        projections = np.asarray(projections)
+
+        if order == 0:
+            indices = self._warp_indices(output_shape)
+            flat = projections.reshape(projections.shape[:-2] + (-1,))
+            warped = np.take(flat, np.maximum(indices, 0), axis=-1)
+            warped[..., indices < 0] = 0
+            return warped
+        if order == 1:
+            coordinates = self._warp_coordinates(output_shape)
+            if projections.ndim == 2:
+                return transform.warp(
+                    projections, coordinates, order=1, preserve_range=True
+                )
+            return np.stack(
+                [
+                    transform.warp(p, coordinates, order=1, preserve_range=True)
+                    for p in projections
+                ]
+            )
+        raise ValueError("order has to be 0 or 1")
+
     def _estimate_transform(self):
         """Compute a transform to map a 2D projection of the volume to a square"""
         # Points in oct space
@@ -396,22 +789,96 @@ class EyeVolume:
         """The number of B-Scans."""
         return self.shape[0]
 
+    def save(self, path, include_raw=False):
+        """Save the volume with all annotations as eyepy archive
+
+        Args:
+            path: Location of the archive directory
+            include_raw: Whether to save the raw volume in addition to the
+                intensity transformed volume
+        """
+        from eyepy.io.native import save_eyevolume
+
+        save_eyevolume(self, path, include_raw=include_raw)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Load a volume from an eyepy archive
+
+        B-scans are memory mapped and only read from disk when accessed.
+
+        Args:
+            path: Location of the archive directory
+            mmap_mode: Memory map mode of the volume (see `numpy.load`)
+        """
+        from eyepy.io.native import load_eyevolume
+
+        return load_eyevolume(path, mmap_mode=mmap_mode)
+
+    def save_annotations(self, path=None):
+        """Save changed annotations to the archive of the volume
+
+        Only B-scans of layers and volume maps which changed since the volume
+        was loaded or saved are rewritten.
+
+        Args:
+            path: Location of the archive. Defaults to the archive the volume
+                was loaded from or saved to.
+        """
+        from eyepy.io.native import save_annotations
+
+        save_annotations(self, path)
+
     def add_layer(self, name, height_map):
         self.layers[name] = EyeVolumeLayerAnnotation(self, height_map)
+        self._notify_layer_change(self.layers[name])
+
+    def _notify_layer_change(self, layer, bscan_index=None):
+        for listener in list(self._layer_listeners):
+            listener(layer, bscan_index)
 
     def set_intensity_transform(self, func: Callable):
         self.intensity_transform = func
         self._data = None
+        if self._bscan_cache is not None:
+            self._bscan_cache.clear()
+
+    def _apply_intensity_transform(self, raw_data):
+        # Read-only data (e.g. memory mapped from a file) can not be modified
+        # by the intensity transform and does not need to be copied
+        if not isinstance(raw_data, np.ndarray) or raw_data.flags.writeable:
+            raw_data = np.copy(raw_data)
+        return self.intensity_transform(raw_data)
 
     @property
     def data(self):
         if self._data is None:
-            self._data = self.intensity_transform(np.copy(self._raw_data))
+            self._data = self._apply_intensity_transform(self._raw_data)
+            if self._bscan_cache is not None:
+                self._bscan_cache.clear()
         return self._data
 
+    def _get_bscan_data(self, index):
+        """The intensity transformed data of a single B-scan.
+
+        Without a B-scan cache this is a view into `data`. Otherwise, as long
+        as the complete volume has not been transformed, only the requested
+        B-scan is transformed and cached.
+        """
+        if self._data is not None or self._bscan_cache is None:
+            return self.data[index]
+
+        bscan_data = self._bscan_cache.get(index)
+        if bscan_data is None:
+            bscan_data = self._apply_intensity_transform(self._raw_data[index])
+            self._bscan_cache.put(index, bscan_data)
+        return bscan_data
+
     @property
     def shape(self):
-        return self.data.shape
+        # The intensity transform does not change the shape, hence the raw
+        # data shape can be used without transforming the volume
+        return np.shape(self._raw_data)
 
     @property
     def scale(self):
@@ -446,8 +913,53 @@ class EyeVolume:
         return self.meta["laterality"]
 
     def set_volume_map(self, name, value):
+        """Set a voxel annotation
+
+        Args:
+            name: Name of the annotation
+            value: Boolean array of the volume shape or a compact map from
+                `eyepy.core.voxelmaps`
+        """
         self.volume_maps[name] = EyeVolumeVoxelAnnotation(value, name, self)
 
+    def quantify(
+        self, names: Optional[List[str]] = None, space: str = "localizer"
+    ) -> Dict[str, Dict]:
+        """Quantify several voxel annotations at once
+
+        Annotations with the same grid settings share the grid masks, which
+        are applied to every annotation by a single sparse matrix product.
+        The results are identical to `EyeVolumeVoxelAnnotation.quantify` and
+        are cached in the annotations.
+
+        Args:
+            names: Names of the voxel annotations to quantify. If None, all
+                `volume_maps` are quantified.
+            space: "localizer" or "oct", see `EyeVolumeVoxelAnnotation.quantify`
+
+        Returns:
+            The quantification of every annotation by name
+        """
+        if names is None:
+            names = list(self.volume_maps.keys())
+        if space not in ["localizer", "oct"]:
+            raise ValueError('space has to be one of "localizer" and "oct"')
+        cache_name = "quantification" if space == "localizer" else "oct_quantification"
+
+        groups = defaultdict(list)
+        for name in names:
+            annotation = self.volume_maps[name]
+            cached = annotation._cache.get(cache_name)
+            if cached is None or cached[0] != annotation._enface_key():
+                groups[annotation._grid_key()].append(annotation)
+
+        for annotations in groups.values():
+            results = _quantify_maps(annotations, space)
+            for annotation, result in zip(annotations, results):
+                annotation._cache[cache_name] = (annotation._enface_key(), result)
+
+        return {name: self.volume_maps[name].quantify(space) for name in names}
+
     def plot(
         self,
         ax=None,
@@ -489,6 +1001,7 @@ class EyeVolume:
 
         if projection_kwargs is None:
             projection_kwargs = defaultdict(lambda: {})
+        _warp_enfaces([self.volume_maps[name] for name in projections])
         for name in projections:
             if not name in projection_kwargs.keys():
                 projection_kwargs[name] = {}
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedIntensityTransform:
+    def __init__(
+        self,
+        func: Callable,
+        dtype=np.uint8,
+        chunk_size: int = 8,
+        max_workers: Optional[int] = None,
+    ):
+        """An intensity transform applied to chunks of B-scans in a thread pool
+
+        Every chunk is transformed by `func` and written to a preallocated output
+        array, so temporary arrays never exceed the size of a chunk. NumPy
+        releases the GIL for most ufuncs, hence chunks are transformed in
+        parallel. Instances can be set with `EyeVolume.set_intensity_transform`.
+
+        Args:
+            func: Intensity transform for a chunk of B-scans. It must not modify
+                its input and has to return an array of the input shape.
+            dtype: dtype of the transformed volume
+            chunk_size: Number of B-scans transformed at once
+            max_workers: Maximum number of threads. Defaults to the default of
+                `concurrent.futures.ThreadPoolExecutor`
+        """
+        self.func = func
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+
+    def __call__(self, data):
+        # A single B-scan is transformed directly
+        if data.ndim < 3:
+            return np.asarray(self.func(data), dtype=self.dtype)
+
+        out = np.empty(data.shape, dtype=self.dtype)
+
+        def transform_chunk(start):
+            chunk = np.s_[start : start + self.chunk_size]
+            out[chunk] = self.func(data[chunk])
+
+        starts = range(0, len(data), self.chunk_size)
+        if len(starts) == 1 or self.max_workers == 1:
+            for start in starts:
+                transform_chunk(start)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # Consume the results to raise exceptions from the workers
+                list(executor.map(transform_chunk, starts))
+        return out
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Compact storage for boolean voxel annotations.
+
+The maps in this module can be used instead of dense boolean arrays as data of
+an `EyeVolumeVoxelAnnotation` (see `EyeVolume.set_volume_map`). They support
+indexing, where B-scans are decoded individually, and compute the projection
+of the annotation without decoding the complete volume.
+"""
+import abc
+import logging
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Number of set bits for every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class VoxelMap(abc.ABC):
+    """Base class for boolean maps of shape (n_bscans, height, width)
+
+    Subclasses implement `_bscan` and `projection`.
+    """
+
+    dtype = np.dtype(bool)
+    ndim = 3
+
+    def __init__(self, shape: Tuple[int, int, int]):
+        self.shape = tuple(int(s) for s in shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @abc.abstractmethod
+    def _bscan(self, index: int) -> np.ndarray:
+        """The dense (height, width) map of a single B-scan."""
+
+    @abc.abstractmethod
+    def projection(self) -> np.ndarray:
+        """Number of annotated voxels per A-scan, shape (n_bscans, width)."""
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        first, rest = index[0], index[1:]
+        if first is Ellipsis:
+            return np.asarray(self)[index]
+        if isinstance(first, (int, np.integer)):
+            if first < 0:
+                first += len(self)
+            return self._bscan(int(first))[rest]
+
+        indices = np.arange(len(self))[first]
+        out = np.empty((len(indices),) + self.shape[1:], dtype=bool)
+        for i, bscan_index in enumerate(indices):
+            out[i] = self._bscan(bscan_index)
+        return out[(slice(None),) + rest]
+
+    def __array__(self, dtype=None):
+        out = np.empty(self.shape, dtype=bool)
+        for i in range(len(self)):
+            out[i] = self._bscan(i)
+        return out if dtype is None else out.astype(dtype)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._bscan(i)
+
+
+class PackedVoxelMap(VoxelMap):
+    def __init__(self, data):
+        """A boolean map stored with 1 bit per voxel
+
+        Bits are packed along the A-scans, hence the projection is computed
+        from the packed bytes directly.
+
+        Args:
+            data: Boolean array of shape (n_bscans, height, width). It is packed
+                B-scan by B-scan, hence memory maps or other VoxelMaps can be
+                used without creating a dense copy.
+        """
+        super().__init__(np.shape(data))
+        n_bscans, height, width = self.shape
+        self.packed = np.empty((n_bscans, (height + 7) // 8, width), dtype=np.uint8)
+        for i in range(n_bscans):
+            self.packed[i] = np.packbits(np.asarray(data[i], dtype=bool), axis=0)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def _bscan(self, index):
+        return np.unpackbits(self.packed[index], axis=0, count=self.shape[1]).view(bool)
+
+    def projection(self):
+        # Padding bits of the packed A-scans are 0 and do not contribute
+        return _POPCOUNT[self.packed].sum(axis=1, dtype=np.int64)
+
+
+class RunLengthVoxelMap(VoxelMap):
+    def __init__(self, data):
+        """A boolean map stored as runs of annotated voxels per A-scan
+
+        Runs are stored in A-scan order as start and (exclusive) end rows
+        together with the A-scan they belong to. This is compact for maps
+        with few contiguous regions per A-scan such as fluid or drusen.
+
+        Args:
+            data: Boolean array of shape (n_bscans, height, width). It is
+                encoded B-scan by B-scan.
+        """
+        super().__init__(np.shape(data))
+        n_bscans, height, width = self.shape
+        ascans, starts, ends = [], [], []
+        for i in range(n_bscans):
+            bscan = np.asarray(data[i], dtype=np.int8).T  # (width, height)
+            edges = np.diff(bscan, axis=1, prepend=0, append=0)
+            # Rising and falling edges alternate within every A-scan
+            cols, rows = np.nonzero(edges)
+            ascans.append(cols[::2] + i * width)
+            starts.append(rows[::2])
+            ends.append(rows[1::2])
+
+        self.ascans = np.concatenate(ascans).astype(np.int64)
+        self.starts = np.concatenate(starts).astype(np.int32)
+        self.ends = np.concatenate(ends).astype(np.int32)
+        # Runs of A-scan k are at offsets[k]:offsets[k + 1]
+        counts = np.bincount(self.ascans, minlength=n_bscans * width)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def nbytes(self):
+        return (
+            self.ascans.nbytes
+            + self.starts.nbytes
+            + self.ends.nbytes
+            + self.offsets.nbytes
+        )
+
+    def _bscan(self, index):
+        height, width = self.shape[1:]
+        runs = slice(self.offsets[index * width], self.offsets[(index + 1) * width])
+        cols = self.ascans[runs] - index * width
+        delta = np.zeros((height + 1, width), dtype=np.int32)
+        np.add.at(delta, (self.starts[runs], cols), 1)
+        np.add.at(delta, (self.ends[runs], cols), -1)
+        return np.cumsum(delta[:-1], axis=0) > 0
+
+    def projection(self):
+        n_bscans, _, width = self.shape
+        lengths = self.ends - self.starts
+        projection = np.bincount(
+            self.ascans, weights=lengths, minlength=n_bscans * width
+        )
+        return projection.astype(np.int64).reshape(n_bscans, width)
+
+
+class LabelVoxelMap(VoxelMap):
+    def __init__(self, labels, label: int, chunk_size: int = 16):
+        """A boolean map given by a single label of a label volume
+
+        Several maps can share the same label volume, e.g. one map per fluid
+        type. The label volume is not copied.
+
+        Args:
+            labels: Integer array of shape (n_bscans, height, width)
+            label: Label of the voxels which belong to the map
+            chunk_size: Number of B-scans compared at once when computing the
+                projection
+        """
+        super().__init__(np.shape(labels))
+        self.labels = labels
+        self.label = label
+        self.chunk_size = chunk_size
+
+    @property
+    def nbytes(self):
+        # The label volume is shared and not counted
+        return 0
+
+    def _bscan(self, index):
+        return np.equal(self.labels[index], self.label)
+
+    def projection(self):
+        projection = np.empty((self.shape[0], self.shape[2]), dtype=np.int64)
+        for start in range(0, len(self), self.chunk_size):
+            chunk = np.s_[start : start + self.chunk_size]
+            projection[chunk] = np.count_nonzero(
+                np.equal(self.labels[chunk], self.label), axis=1
+            )
+        return projection
+
+
+class IntervalVoxelMap(VoxelMap):
+    def __init__(self, top, bottom, height: int):
+        """A boolean map with a single interval of voxels per A-scan
+
+        Voxel (i, row, col) is annotated if top[i, col] <= row < bottom[i, col].
+        This is the case for drusen, which are bounded by the RPE and the ideal
+        RPE. Heights and projection are available per A-scan without decoding
+        any B-scan.
+
+        Args:
+            top: First annotated row of every A-scan, shape (n_bscans, width)
+            bottom: Row after the last annotated row of every A-scan. A-scans
+                with bottom <= top are not annotated.
+            height: Height of the B-scans
+        """
+        top = np.clip(np.asarray(top, dtype=np.int64), 0, height)
+        bottom = np.clip(np.asarray(bottom, dtype=np.int64), 0, height)
+        super().__init__((top.shape[0], height, top.shape[1]))
+        self.top = top
+        self.bottom = np.maximum(bottom, top)
+
+    @property
+    def nbytes(self):
+        return self.top.nbytes + self.bottom.nbytes
+
+    def _fill(self, index, out):
+        # Compare row indices against the bounds of the selected A-scans. Only
+        # rows between the lowest top and the highest bottom are compared and
+        # small integers are used, since this is memory bound.
+        top, bottom = self.top[index], self.bottom[index]
+        out[...] = False
+        if top.size == 0:
+            return out
+        start, stop = top.min(), bottom.max()
+        if start >= stop:
+            return out
+        dtype = np.int16 if stop < 2 ** 15 else np.int32
+        rows = np.arange(start, stop, dtype=dtype)[:, np.newaxis]
+        band = out[..., start:stop, :]
+        np.greater_equal(rows, top[..., np.newaxis, :].astype(dtype), out=band)
+        band &= rows < bottom[..., np.newaxis, :].astype(dtype)
+        return out
+
+    def _bscan(self, index):
+        return self._fill(index, np.empty(self.shape[1:], dtype=bool))
+
+    def __array__(self, dtype=None, chunk_size=16):
+        # Chunks of B-scans limit the size of temporary arrays
+        out = np.empty(self.shape, dtype=bool)
+        for start in range(0, len(self), chunk_size):
+            chunk = np.s_[start : start + chunk_size]
+            self._fill(chunk, out[chunk])
+        return out if dtype is None else out.astype(dtype)
+
+    def projection(self):
+        return self.bottom - self.top
+
+    def masked(self, mask) -> "IntervalVoxelMap":
+        """A copy where A-scans outside of the (n_bscans, width) mask are empty"""
+        return IntervalVoxelMap(
+            self.top, np.where(mask, self.bottom, self.top), self.shape[1]
+        )
@@ -9,22 +9,31 @@ from eyepy import (
     EyeVolumeVoxelAnnotation,
 )
 from eyepy.core import EyeVolumeLayerAnnotation
+from eyepy.core.voxelmaps import LabelVoxelMap
+from eyepy.core.utils import ChunkedIntensityTransform
 from eyepy.io.utils import (
     _compute_localizer_oct_transform,
     _get_enface_meta,
     _get_volume_meta,
+    _read_images,
 )
 from eyepy.io.lazy import LazyVolume
 
-import imageio
 import numpy as np
 import logging
 
 logger = logging.getLogger("eyepy.io")
 
 
-def import_heyex_xml(path):
+def import_heyex_xml(path, max_workers=None):
+    """Import a HEYEX XML export.
+
+    Args:
+        path: Path to the .xml file or the folder containing it
+        max_workers: Maximum number of threads decoding B-scan images
+    """
     from eyepy.io.heyex import HeyexXmlReader
+    from skimage import img_as_ubyte
 
     reader = HeyexXmlReader(path)
 
@@ -53,7 +62,9 @@ def import_heyex_xml(path):
 
     enface = EyeEnface(data=localizer, meta=enface_meta)
     volume = EyeVolume(
-        data=l_volume.volume,
+        data=_read_images(
+            reader.bscan_paths, transform=img_as_ubyte, max_workers=max_workers
+        ),
         meta=volume_meta,
         localizer=enface,
         transformation=transformation,
@@ -61,14 +72,23 @@ def import_heyex_xml(path):
 
     layer_height_maps = l_volume.layers
     for key, val in layer_height_maps.items():
-        volume.add_layer(key, val)
+        # The lazy height maps are read-only, the volume layers are editable
+        volume.add_layer(key, np.array(val))
 
     return volume
 
 
-def import_heyex_vol(path):
+def import_heyex_vol(path, bscan_cache_size=None, max_workers=None):
+    """Import a HEYEX .vol export.
+
+    Args:
+        path: Path to the .vol file
+        bscan_cache_size: If given, B-scans are intensity transformed on access
+            and kept in a cache of this size in bytes (see EyeVolume)
+        max_workers: Maximum number of threads for the intensity transform
+    """
     from eyepy.io.heyex import HeyexVolReader
-    from skimage import img_as_ubyte
+    from eyepy.io.heyex.vol_export import vol_intensity_transform
 
     reader = HeyexVolReader(path)
     l_volume = LazyVolume(
@@ -84,41 +104,39 @@ def import_heyex_vol(path):
         logger.warning(msg)
 
     enface_meta = _get_enface_meta(l_volume)
-    volume_meta = _get_volume_meta(l_volume)
+    volume_meta = _get_volume_meta(l_volume, reader.bscan_headers)
     transformation = _compute_localizer_oct_transform(
         volume_meta, enface_meta, l_volume.shape
     )
 
     enface = EyeEnface(data=l_volume.localizer, meta=enface_meta)
     volume = EyeVolume(
-        data=l_volume.volume_raw,
+        data=reader.volume_raw,
         meta=volume_meta,
         localizer=enface,
         transformation=transformation,
+        bscan_cache_size=bscan_cache_size,
     )
 
-    def vol_intensity_transform(data):
-        selection_0 = data == np.finfo(np.float32).max
-        selection_data = data <= 1
-
-        new = np.log(data[selection_data] + 2.44e-04)
-        new = (new + 8.3) / 8.285
-
-        data[selection_data] = new
-        data[selection_0] = 0
-        data = np.clip(data, 0, 1)
-        return img_as_ubyte(data)
-
-    volume.set_intensity_transform(vol_intensity_transform)
+    volume.set_intensity_transform(
+        ChunkedIntensityTransform(vol_intensity_transform, max_workers=max_workers)
+    )
 
     layer_height_maps = l_volume.layers
     for key, val in layer_height_maps.items():
-        volume.add_layer(key, val)
+        # The lazy height maps are read-only, the volume layers are editable
+        volume.add_layer(key, np.array(val))
 
     return volume
 
 
-def import_bscan_folder(path):
+def import_bscan_folder(path, max_workers=None):
+    """Import B-scans from a folder.
+
+    Args:
+        path: Folder holding the B-scan images in alphabetical order
+        max_workers: Maximum number of threads decoding B-scan images
+    """
     path = Path(path)
     img_paths = sorted(list(path.iterdir()))
     img_paths = [
@@ -128,14 +146,7 @@ def import_bscan_folder(path):
         and p.suffix.lower() in [".jpg", ".jpeg", ".tiff", ".tif", ".png"]
     ]
 
-    images = []
-    for p in img_paths:
-        image = imageio.imread(p)
-        if len(image.shape) == 3:
-            image = image[..., 0]
-        images.append(image)
-
-    volume = np.stack(images, axis=0)
+    volume = _read_images(img_paths, max_workers=max_workers)
     bscan_meta = [
         EyeBscanMeta(
             start_pos=(0, i), end_pos=(volume.shape[2] - 1, i), pos_unit="pixel"
@@ -206,8 +217,10 @@ def import_retouch(path):
     )
 
     eye_volume = EyeVolume(data=data[...], meta=meta)
-    eye_volume.set_volume_map("IRF", np.equal(annotation, 1))
-    eye_volume.set_volume_map("SRF", np.equal(annotation, 2))
-    eye_volume.set_volume_map("PED", np.equal(annotation, 3))
+    # The fluid maps share the label volume instead of holding dense copies
+    labels = np.asarray(annotation)
+    eye_volume.set_volume_map("IRF", LabelVoxelMap(labels, 1))
+    eye_volume.set_volume_map("SRF", LabelVoxelMap(labels, 2))
+    eye_volume.set_volume_map("PED", LabelVoxelMap(labels, 3))
 
     return eye_volume
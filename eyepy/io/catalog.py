@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""A header-only index of HEYEX exports.
+
+Only the 2048 byte file header of .vol exports and the top-level fields of XML
+exports are read, which makes it possible to index thousands of exports
+without decoding any image data. The index is stored in a local SQLite
+database and can be refreshed incrementally.
+"""
+import json
+import logging
+import os
+import sqlite3
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from eyepy.io.heyex.specification.vol_export import HEVOL_VERSIONS, spec_dtype
+from eyepy.io.heyex.specification.xml_export import HEXML_VERSIONS
+from eyepy.io.heyex.vol_export import _as_unpacked
+from eyepy.io.utils import _clean_ascii
+
+logger = logging.getLogger(__name__)
+
+VOL_HEADER_SIZE = 2048
+
+_COLUMNS = [
+    "format",
+    "version",
+    "patient_id",
+    "visit_date",
+    "laterality",
+    "scan_pattern",
+    "n_bscans",
+    "size_x",
+    "size_y",
+    "header",
+    "error",
+]
+
+
+def read_heyex_vol_header(path: Union[str, Path]) -> Dict:
+    """Read the file header of a HEYEX .vol export.
+
+    Only the first 2048 bytes of the file are read.
+    """
+    with open(path, "rb") as f:
+        content = f.read(VOL_HEADER_SIZE)
+    version = _clean_ascii((content[:12],))
+    specification = HEVOL_VERSIONS(version)
+    record = np.frombuffer(content, dtype=spec_dtype(specification), count=1)[0]
+    return {
+        field: func(_as_unpacked(record[field]))
+        for field, _, func in specification
+        if field != "__empty"
+    }
+
+
+def read_heyex_xml_header(path: Union[str, Path]) -> Dict:
+    """Read the top-level fields of a HEYEX XML export.
+
+    The document is only parsed up to the end of the first OCT image, which
+    holds the B-scan size. The remaining B-scans are not read, hence
+    NumBScans is None.
+    """
+    root = None
+    with open(path, "rb") as f:
+        for event, element in ElementTree.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = element
+            if event == "end" and element.tag == "Image":
+                if element.findtext("./ImageType/Type") == "OCT":
+                    break
+
+    body = root[0]
+    version = body.find("SWVersion")[1].text
+    header = {
+        field: func(body.findall(loc)) for field, loc, func in HEXML_VERSIONS(version)
+    }
+    header["NumBScans"] = None
+    return header
+
+
+def _read_header(path: Path) -> Dict:
+    """Read a header and convert it to a catalog row."""
+    stat = path.stat()
+    row = {"path": str(path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    row.update({column: None for column in _COLUMNS})
+    row["format"] = path.suffix.lower()[1:]
+    try:
+        if row["format"] == "vol":
+            header = read_heyex_vol_header(path)
+        else:
+            header = read_heyex_xml_header(path)
+    except Exception as e:
+        logger.warning(f"Could not read the header of {path}: {e}")
+        row["error"] = repr(e)
+        return row
+
+    visit_date = header.get("VisitDate")
+    if isinstance(visit_date, datetime):
+        visit_date = visit_date.date()
+    row.update(
+        version=header.get("Version"),
+        patient_id=header.get("PatientID"),
+        visit_date=None if visit_date is None else visit_date.isoformat(),
+        laterality=header.get("ScanPosition"),
+        scan_pattern=header.get("ScanPattern"),
+        n_bscans=header.get("NumBScans"),
+        size_x=header.get("SizeX"),
+        size_y=header.get("SizeY"),
+        header=json.dumps(header, default=str),
+    )
+    return row
+
+
+class Catalog:
+    def __init__(self, db_path: Union[str, Path]):
+        """An SQLite index of HEYEX export headers
+
+        Args:
+            db_path: Location of the SQLite database. It is created if it does
+                not exist.
+        """
+        self.db_path = Path(db_path)
+        self._connection = sqlite3.connect(str(self.db_path))
+        self._connection.row_factory = sqlite3.Row
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS headers ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, "
+                "format TEXT, version TEXT, patient_id TEXT, visit_date TEXT, "
+                "laterality TEXT, scan_pattern INTEGER, n_bscans INTEGER, "
+                "size_x INTEGER, size_y INTEGER, header TEXT, error TEXT)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS patient_visit "
+                "ON headers (patient_id, visit_date, laterality)"
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM headers").fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    def refresh(
+        self,
+        paths: Union[str, Path, Iterable[Union[str, Path]]],
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """Index new and changed exports and remove deleted ones.
+
+        Files with unchanged size and modification time are not read again.
+
+        Args:
+            paths: A directory which is searched recursively for .vol and .xml
+                files, a single file or an iterable of files
+            max_workers: Maximum number of threads reading headers
+
+        Returns:
+            The number of added, updated, removed and unchanged files
+
+        Raises:
+            FileNotFoundError: If a given file or directory does not exist
+        """
+        if isinstance(paths, (str, os.PathLike)) and not Path(paths).is_dir():
+            paths = [paths]
+        if isinstance(paths, (str, os.PathLike)):
+            root = Path(paths).resolve()
+            files = [
+                p
+                for p in root.rglob("*")
+                if p.suffix.lower() in [".vol", ".xml"] and p.is_file()
+            ]
+            # Only forget removed files from the refreshed directory
+            prefix = os.path.join(str(root), "")
+            considered = lambda path: path.startswith(prefix)
+        else:
+            files = [Path(p).resolve() for p in paths]
+            missing = [str(p) for p in files if not p.exists()]
+            if missing:
+                raise FileNotFoundError(f"No such files: {', '.join(missing)}")
+            # Without a directory only the given files are considered
+            given = {str(p) for p in files}
+            considered = lambda path: path in given
+
+        rows = self._connection.execute("SELECT path, size, mtime FROM headers")
+        known = {
+            row["path"]: (row["size"], row["mtime"])
+            for row in rows
+            if considered(row["path"])
+        }
+        present = {str(p) for p in files}
+        removed = [path for path in known if path not in present]
+
+        changed = []
+        for p in files:
+            stat = p.stat()
+            if known.get(str(p)) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(p)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(_read_header, changed))
+
+        columns = ["path", "size", "mtime"] + _COLUMNS
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO headers ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                [[row[c] for c in columns] for row in rows],
+            )
+            self._connection.executemany(
+                "DELETE FROM headers WHERE path = ?", [(p,) for p in removed]
+            )
+
+        n_updated = sum(str(p) in known for p in changed)
+        return {
+            "added": len(changed) - n_updated,
+            "updated": n_updated,
+            "removed": len(removed),
+            "unchanged": len(files) - len(changed),
+        }
+
+    def query(self, **conditions) -> List[Dict]:
+        """Return all indexed exports matching the given column values.
+
+        For example `catalog.query(patient_id="123", laterality="OD")`
+        """
+        unknown = set(conditions) - set(["path", "size", "mtime"] + _COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown catalog columns: {', '.join(unknown)}")
+        where = " AND ".join(f"{column} = ?" for column in conditions)
+        statement = "SELECT * FROM headers" + (f" WHERE {where}" if where else "")
+        rows = self._connection.execute(statement, list(conditions.values()))
+        return [dict(row) for row in rows]
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""A store for many EyeVolumes in few large files.
+
+Volumes are appended to shard files which are never modified afterwards. The
+arrays of a volume are written one after another, in the same layout as the
+.npy files of an eyepy archive (see `eyepy.io.native`). Their offsets are kept
+together with the archive meta data in an SQLite index. Volumes are
+reconstructed from memory maps of their shard, so only the data which is
+accessed is read from disk.
+"""
+import json
+import logging
+import sqlite3
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+from eyepy.core.eyevolume import EyeVolume
+from eyepy.io.native import _build_volume, _describe_volume
+
+logger = logging.getLogger(__name__)
+
+# Arrays are aligned in the shards to allow for efficient memory mapping
+ALIGNMENT = 64
+
+
+def _normalize_date(visit_date) -> Optional[str]:
+    if visit_date is None:
+        return None
+    if isinstance(visit_date, datetime):
+        visit_date = visit_date.date()
+    if isinstance(visit_date, date):
+        return visit_date.isoformat()
+    return str(visit_date)
+
+
+def _write_array(f, array) -> dict:
+    """Append an array to an open file one chunk along the first axis at a time."""
+    padding = -f.tell() % ALIGNMENT
+    f.write(b"\0" * padding)
+    offset = f.tell()
+
+    array_shape = tuple(np.shape(array))
+    if len(array_shape) == 0 or array_shape[0] == 0:
+        array = np.asarray(array)
+        f.write(np.ascontiguousarray(array).tobytes())
+        dtype = array.dtype
+    else:
+        first = np.asarray(array[0])
+        dtype = first.dtype
+        f.write(np.ascontiguousarray(first).tobytes())
+        for i in range(1, array_shape[0]):
+            f.write(np.ascontiguousarray(array[i], dtype=dtype).tobytes())
+    return {"offset": offset, "dtype": dtype.str, "shape": list(array_shape)}
+
+
+class CohortStore:
+    def __init__(self, path: Union[str, Path], shard_size: int = 4 * 2 ** 30):
+        """Append-only storage for the volumes of a cohort
+
+        Volumes are indexed by patient ID, visit date and laterality. Only a
+        single process should append to a store at a time.
+
+        Args:
+            path: Directory of the store. It is created if it does not exist.
+            shard_size: A new shard file is started when the current shard
+                reaches this size in bytes
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+
+        self._connection = sqlite3.connect(str(self.path / "index.sqlite"))
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS volumes ("
+                "id INTEGER PRIMARY KEY, patient_id TEXT, visit_date TEXT, "
+                "laterality TEXT, shard INTEGER, meta TEXT)"
+            )
+
+        # Record IDs by key, kept in memory for constant time lookups
+        self._index = defaultdict(list)
+        self._shard = 0
+        rows = self._connection.execute(
+            "SELECT id, patient_id, visit_date, laterality, shard FROM volumes "
+            "ORDER BY id"
+        )
+        for record_id, patient_id, visit_date, laterality, shard in rows:
+            self._index[(patient_id, visit_date, laterality)].append(record_id)
+            self._shard = max(self._shard, shard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._index.values())
+
+    def __contains__(self, key):
+        return self._key(*key) in self._index
+
+    def __getitem__(self, key) -> EyeVolume:
+        """The most recently appended volume for (patient_id, visit_date, laterality)"""
+        ids = self.lookup(*key)
+        if not ids:
+            raise KeyError(key)
+        return self.load(ids[-1])
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def _key(patient_id, visit_date, laterality):
+        # Patient ids are stored as text
+        return (str(patient_id), _normalize_date(visit_date), laterality)
+
+    def _shard_path(self, shard: int) -> Path:
+        return self.path / f"shard-{shard:05d}.bin"
+
+    def keys(self) -> List[tuple]:
+        """All (patient_id, visit_date, laterality) keys of the store"""
+        return list(self._index.keys())
+
+    def lookup(self, patient_id, visit_date, laterality) -> List[int]:
+        """IDs of all volumes appended for the key, oldest first"""
+        return list(self._index.get(self._key(patient_id, visit_date, laterality), []))
+
+    def append(
+        self,
+        volume: EyeVolume,
+        patient_id: Optional[str] = None,
+        visit_date: Union[str, date, None] = None,
+        laterality: Optional[str] = None,
+        include_raw: bool = False,
+    ) -> int:
+        """Append a volume to the store
+
+        Args:
+            volume: The volume to append
+            patient_id: Defaults to the `patient_id` of the volume meta
+            visit_date: Defaults to the `visit_date` of the volume meta
+            laterality: Defaults to the `laterality` of the volume meta
+            include_raw: Whether to store the raw volume in addition to the
+                intensity transformed volume
+
+        Returns:
+            The ID of the stored volume
+        """
+        if patient_id is None:
+            patient_id = volume.meta.get("patient_id")
+        if patient_id is None:
+            raise ValueError("The volume meta has no patient_id, please provide it.")
+        if visit_date is None:
+            visit_date = volume.meta.get("visit_date")
+        if laterality is None:
+            laterality = volume.meta.get("laterality")
+        key = self._key(patient_id, visit_date, laterality)
+
+        shard_path = self._shard_path(self._shard)
+        if shard_path.exists() and shard_path.stat().st_size >= self.shard_size:
+            self._shard += 1
+            shard_path = self._shard_path(self._shard)
+
+        meta, arrays = _describe_volume(volume, include_raw)
+        # The data is written before the index is updated. An interrupted
+        # append leaves unreferenced bytes in the shard, but no broken entry.
+        with open(shard_path, "ab") as f:
+            meta["arrays"] = {name: _write_array(f, a) for name, a in arrays.items()}
+
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO volumes (patient_id, visit_date, laterality, shard, meta) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, self._shard, json.dumps(meta)),
+            )
+        self._index[key].append(cursor.lastrowid)
+        return cursor.lastrowid
+
+    def load(self, record_id: int) -> EyeVolume:
+        """Reconstruct a volume from memory maps of its shard
+
+        Annotations are memory mapped copy-on-write, they can be modified but
+        changes are not written to the store.
+        """
+        row = self._connection.execute(
+            "SELECT shard, meta FROM volumes WHERE id = ?", (record_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(record_id)
+        shard_path = self._shard_path(row[0])
+        meta = json.loads(row[1])
+
+        def load_array(name, annotation):
+            if name not in meta["arrays"]:
+                return None
+            info = meta["arrays"][name]
+            shape = tuple(info["shape"])
+            if np.prod(shape) == 0:
+                return np.empty(shape, dtype=info["dtype"])
+            return np.memmap(
+                shard_path,
+                dtype=info["dtype"],
+                mode="c" if annotation else "r",
+                offset=info["offset"],
+                shape=shape,
+            )
+
+        return _build_volume(meta, load_array)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from .v103 import bscan_spec as v103_bscan
 from .v103 import oct_spec as v103_oct
+from .base import spec_dtype
 
 
 def HEVOL_VERSIONS(version):
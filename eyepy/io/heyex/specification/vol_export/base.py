@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
+import re
 from datetime import datetime
 
+import numpy as np
+
 from eyepy.io.utils import _clean_ascii, _date_from_seconds, _get_first
 
 
@@ -138,3 +141,43 @@ def bscan_base_spec():
         # Spare bytes for future use.
         "__empty": ("168s", _get_first),
     }
+
+
+# Map struct format characters to little-endian NumPy types
+_STRUCT_TO_NUMPY = {
+    "i": "<i4",
+    "I": "<u4",
+    "q": "<i8",
+    "Q": "<u8",
+    "f": "<f4",
+    "d": "<f8",
+}
+
+
+def spec_dtype(specification):
+    """Compile a header specification to a NumPy structured dtype.
+
+    The struct format of every field is translated to the equivalent NumPy
+    type. Fields are packed without padding, as they are stored in the file.
+    Repeated formats like "ffffff" become sub-arrays of shape (6,).
+
+    Args:
+        specification: A list of (name, struct format, function) tuples
+
+    Returns:
+        A structured dtype with one field per specification entry
+    """
+    fields = []
+    for name, fmt, _ in specification:
+        tokens = re.findall(r"(\d*)([a-zA-Z])", fmt)
+        chars = {char for _, char in tokens}
+        count = sum(int(n) if n else 1 for n, _ in tokens)
+        if chars == {"s"}:
+            fields.append((name, f"S{count}"))
+        elif len(chars) == 1 and count > 1:
+            fields.append((name, _STRUCT_TO_NUMPY[chars.pop()], (count,)))
+        elif len(chars) == 1:
+            fields.append((name, _STRUCT_TO_NUMPY[chars.pop()]))
+        else:
+            raise ValueError(f"Mixed struct formats are not supported: {fmt}")
+    return np.dtype(fields)
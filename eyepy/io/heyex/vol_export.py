@@ -23,7 +23,11 @@ from eyepy.io.lazy import (
 )
 from eyepy.io.utils import _clean_ascii
 
-from .specification.vol_export import HEVOL_BSCAN_VERSIONS, HEVOL_VERSIONS
+from .specification.vol_export import (
+    HEVOL_BSCAN_VERSIONS,
+    HEVOL_VERSIONS,
+    spec_dtype,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -59,49 +63,89 @@ class HeyexVolReader:
         self.bscan_version = version.replace("OCT", "BS")
 
         self._bscans = None
+        self._bscan_headers = None
+        self._volume_raw = None
         self._localizer = None
         self._oct_meta = None
 
     @property
     def bscans(self):
         if self._bscans is None:
-            oct_header_size = 2048
-            slo_size = self.oct_meta["SizeXSlo"] * self.oct_meta["SizeYSlo"]
-            bscan_size = self.oct_meta["SizeX"] * self.oct_meta["SizeY"]
-            shape = (self.oct_meta["SizeY"], self.oct_meta["SizeX"])
+            specification = HEVOL_BSCAN_VERSIONS(self.bscan_version)
 
-            def bscan_builder(d, a, bmeta, p):
-                return lambda: LazyBscan(d, a, bmeta, p)
+            def bscan_builder(d, a, bmeta, p, i):
+                return lambda: LazyBscan(d, a, bmeta, p, index=i)
 
             self._bscans = []
             for index in range(self.oct_meta["NumBScans"]):
-                startpos = (
-                    oct_header_size
-                    + slo_size
-                    + index * (4 * bscan_size)
-                    + ((index) * self.oct_meta["BScanHdrSize"])
-                )
-                data = np.ndarray(
-                    buffer=self.memmap,
-                    dtype="float32",
-                    offset=startpos + self.oct_meta["BScanHdrSize"],
-                    shape=shape,
-                )
+                startpos = self._bscan_offset + index * self._bscan_stride
+                data = self.volume_raw[index]
 
                 bscan_meta = LazyMeta(
                     **self.create_meta_retrieve_funcs_heyex_vol(
-                        HEVOL_BSCAN_VERSIONS(self.bscan_version), startpos
+                        specification, self.bscan_headers[index]
                     )
                 )
 
                 annotation = LazyAnnotation(**self.create_annotation_dict(startpos))
 
                 self._bscans.append(
-                    bscan_builder(data, annotation, bscan_meta, self._data_processing)
+                    bscan_builder(
+                        data, annotation, bscan_meta, self._data_processing, index
+                    )
                 )
 
         return self._bscans
 
+    @property
+    def bscan_headers(self):
+        """All B-scan headers as a single structured array.
+
+        The array is a strided view into the memory mapped file. Every field
+        of the B-scan specification can be accessed for all B-scans at once,
+        e.g. `reader.bscan_headers["StartX"]`.
+        """
+        if self._bscan_headers is None:
+            self._bscan_headers = np.ndarray(
+                buffer=self.memmap,
+                dtype=spec_dtype(HEVOL_BSCAN_VERSIONS(self.bscan_version)),
+                offset=self._bscan_offset,
+                shape=(self.oct_meta["NumBScans"],),
+                strides=(self._bscan_stride,),
+            )
+        return self._bscan_headers
+
+    @property
+    def volume_raw(self):
+        """All B-scans as a single float32 array of shape (NumBScans, SizeY, SizeX).
+
+        The array is a strided view into the memory mapped file which skips the
+        B-scan headers. No data is copied and the array is read-only.
+        """
+        if self._volume_raw is None:
+            size_x, size_y = self.oct_meta["SizeX"], self.oct_meta["SizeY"]
+            self._volume_raw = np.ndarray(
+                buffer=self.memmap,
+                dtype="float32",
+                offset=self._bscan_offset + self.oct_meta["BScanHdrSize"],
+                shape=(self.oct_meta["NumBScans"], size_y, size_x),
+                strides=(self._bscan_stride, 4 * size_x, 4),
+            )
+        return self._volume_raw
+
+    @property
+    def _bscan_offset(self):
+        """Position of the first B-scan header in the file."""
+        oct_header_size = 2048
+        slo_size = self.oct_meta["SizeXSlo"] * self.oct_meta["SizeYSlo"]
+        return oct_header_size + slo_size
+
+    @property
+    def _bscan_stride(self):
+        """Distance in bytes between two consecutive B-scan headers."""
+        bscan_size = self.oct_meta["SizeX"] * self.oct_meta["SizeY"]
+        return self.oct_meta["BScanHdrSize"] + 4 * bscan_size
+
     @property
     def localizer(self):
         if self._localizer is None:
@@ -116,8 +160,12 @@ class HeyexVolReader:
     @property
     def oct_meta(self):
         if self._oct_meta is None:
+            specification = HEVOL_VERSIONS(self.version)
+            header = np.ndarray(
+                buffer=self.memmap, dtype=spec_dtype(specification), shape=(1,)
+            )
             retrieve_dict = self.create_meta_retrieve_funcs_heyex_vol(
-                HEVOL_VERSIONS(self.version)
+                specification, header[0]
             )
             self._oct_meta = LazyMeta(**retrieve_dict)
         return self._oct_meta
@@ -152,26 +200,39 @@ class HeyexVolReader:
             "layers": layers_dict,
         }
 
-    def create_meta_retrieve_funcs_heyex_vol(self, specification, offset=0):
-        """For every meta field, create a function to read it from the file.
+    def create_meta_retrieve_funcs_heyex_vol(self, specification, record):
+        """For every meta field, create a function to read it from the record.
+
+        The record is an element of a structured array viewing the file. Its
+        fields are passed to the specification functions as the tuple
+        `struct.unpack` would return.
 
         Return all functions in a dict name: func
         """
-        fields = [entry[0] for entry in specification]
-        fmts = [entry[1] for entry in specification]
-        funcs = [entry[2] for entry in specification]
 
-        def func_builder(fnctn, frmt, startpos):
-            def retrieve_func():
-                self.memmap.seek(startpos, 0)
-                content = self.memmap.read(calcsize(frmt))
-                return fnctn(unpack(frmt, content))
+        def func_builder(fnctn, field):
+            return lambda: fnctn(_as_unpacked(record[field]))
+
+        return {field: func_builder(func, field) for field, _, func in specification}
+
 
-            return retrieve_func
+def _as_unpacked(value):
+    """Convert a structured array field to the tuple `struct.unpack` returns."""
+    value = np.asarray(value).tolist()
+    if isinstance(value, list):
+        return tuple(value)
+    return (value,)
 
-        func_dict = {}
-        for index, (field, func, fmt) in enumerate(zip(fields, funcs, fmts)):
-            startpos = offset + calcsize("=" + "".join(fmts[:index]))
-            func_dict[field] = func_builder(func, fmt, startpos)
 
-        return func_dict
+def vol_intensity_transform(data):
+    """Transform raw .vol B-scans to the commonly used contrast as uint8.
+
+    The raw data is a read-only view into the file and is not modified.
+    """
+    selection_0 = data == np.finfo(np.float32).max
+    selection_data = data <= 1
+
+    new = np.where(selection_0, 0, data)
+    new[selection_data] = (np.log(data[selection_data] + 2.44e-04) + 8.3) / 8.285
+    np.clip(new, 0, 1, out=new)
+    return img_as_ubyte(new)
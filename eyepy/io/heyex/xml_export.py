@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import functools
 import logging
 import xml.etree.ElementTree as ElementTree
 from pathlib import Path
@@ -20,11 +19,15 @@ from eyepy.io.heyex.specification.xml_export import HEXML_BSCAN_VERSIONS, HEXML_
 
 logger = logging.getLogger(__name__)
 
+# Children of image elements which are read by the OCT meta specification
+_META_IMAGE_TAGS = {"ImageType", "OphthalmicAcquisitionContext", "AcquisitionTime"}
 
-@functools.lru_cache(maxsize=4, typed=False)
-def get_xml_root(filepath):
-    tree = ElementTree.parse(filepath)
-    return tree.getroot()
+
+def _raiser(error):
+    def read():
+        raise error
+
+    return read
 
 
 class HeyexXmlReader:
@@ -54,112 +57,170 @@ class HeyexXmlReader:
                 )
             path = xmls[0]
         self.path = path
-        self.xml_root = get_xml_root(self.path)
-        self.version = self.xml_root[0].find("SWVersion")[1].text
 
+        self._bscan_index = []
+        self._localizer_name = None
+        self._bscans = None
+        self._localizer = None
         self._oct_meta = None
 
-    @property
-    def bscans(self):
-        bscans = []
+        self._build_index()
 
-        def bscan_builder(d, a, bmeta, p, n):
-            return lambda: LazyBscan(d, a, bmeta, p, name=n)
+    def _build_index(self):
+        """Walk the document once and index everything needed later.
 
-        def scan_reader(path):
-            return lambda: imageio.imread(path)
+        For every OCT image the image name, the B-scan meta and the SegLines are
+        stored. Afterwards only the image elements read by the OCT meta
+        specification are kept in the tree. The OCT meta data is read from this
+        reduced tree and the tree is dropped. Finally all SegLines are parsed
+        into a single array.
+        """
+        self.version = None
+        deferred = []
+        depth = 0
+        context = ElementTree.iterparse(self.path, events=("start", "end"))
+        for event, element in context:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            # The version is given in the SWVersion element of the body
+            if element.tag == "SWVersion" and depth == 2:
+                self.version = element[1].text
+            elif element.tag == "Image":
+                if self.version is None:
+                    # The B-scan specification depends on the version
+                    deferred.append(element)
+                else:
+                    self._index_image(element)
+
+        body = context.root[0]
+        if self.version is None:
+            self.version = body.find("SWVersion")[1].text
+        for element in deferred:
+            self._index_image(element)
+
+        self._oct_meta = LazyMeta(**self._read_meta(body, HEXML_VERSIONS(self.version)))
+        self._parse_seglines()
+
+    def _index_image(self, image):
+        image_type = image.findtext("./ImageType/Type")
+        name = image.findtext("./ImageData/ExamURL").split("\\")[-1]
+        if image_type == "LOCALIZER":
+            if self._localizer_name is None:
+                self._localizer_name = name
+        elif image_type == "OCT":
+            meta = {
+                field: func(image.findall(loc))
+                for field, loc, func in HEXML_BSCAN_VERSIONS(self.version)
+            }
+            seglines = [
+                (segline.findtext("./Name"), segline.findtext("./Array"))
+                for segline in image.iterfind(".//SegLine")
+            ]
+            self._bscan_index.append({"name": name, "meta": meta, "seglines": seglines})
+
+        for child in list(image):
+            if child.tag not in _META_IMAGE_TAGS:
+                image.remove(child)
+
+    def _parse_seglines(self):
+        """Parse the indexed SegLines of all B-scans into a single array.
+
+        The layer heights are stored in `layers` with shape
+        (17, NumBScans, SizeX) in B-scan order. Layers without SegLine are NaN
+        and B-scans without any segmentation are 0.
+        """
+        n_layers = max(SEG_MAPPING.values()) + 1
+        size_x = self.oct_meta["SizeX"] if self._bscan_index else 0
+        self.layers = np.full(
+            (n_layers, len(self._bscan_index), size_x), np.nan, dtype="float32"
+        )
+        for index, entry in enumerate(self._bscan_index):
+            seglines = entry.pop("seglines")
+            if not seglines:
+                self.layers[:, index] = 0
+            for name, text in seglines:
+                self.layers[SEG_MAPPING[name], index] = np.fromstring(text, sep=" ")
 
-        for bscan in self.xml_root[0].findall(".//ImageType[Type='OCT'].."):
-            scan_name = bscan.find("./ImageData/ExamURL").text.split("\\")[-1]
-            data = scan_reader(self.path.parent / scan_name)
-            annotation = LazyAnnotation(**self.create_annotation_dict(bscan))
-            bscan_meta = LazyMeta(
-                **self.create_meta_retrieve_funcs_heyex_xml(
-                    bscan, HEXML_BSCAN_VERSIONS(self.version)
+    @property
+    def bscans(self):
+        if self._bscans is None:
+
+            def bscan_builder(d, a, bmeta, p, n, i):
+                return lambda: LazyBscan(d, a, bmeta, p, name=n, index=i)
+
+            def scan_reader(path):
+                return lambda: imageio.imread(path)
+
+            self._bscans = []
+            for index, entry in enumerate(self._bscan_index):
+                data = scan_reader(self.path.parent / entry["name"])
+                annotation = LazyAnnotation(**self.create_annotation_dict(index))
+                bscan_meta = LazyMeta(**entry["meta"])
+
+                self._bscans.append(
+                    bscan_builder(
+                        data,
+                        annotation,
+                        bscan_meta,
+                        self._data_processing,
+                        entry["name"],
+                        index,
+                    )
                 )
-            )
 
-            bscans.append(
-                bscan_builder(
-                    data, annotation, bscan_meta, self._data_processing, scan_name
-                )
-            )
+        return self._bscans
 
-        return bscans
+    @property
+    def bscan_paths(self):
+        """Paths of the B-scan images in the order of the B-scans."""
+        return [self.path.parent / entry["name"] for entry in self._bscan_index]
 
     @property
     def localizer(self):
-        localizer_pattern = ".//ImageType[Type='LOCALIZER']../ImageData/ExamURL"
-        localizer_name = self.xml_root[0].find(localizer_pattern).text.split("\\")[-1]
-        return LazyEnfaceImage(
-            data=lambda: imageio.imread(self.path.parent / localizer_name),
-            name=localizer_name,
-        )
+        if self._localizer is None:
+            self._localizer = LazyEnfaceImage(
+                data=lambda: imageio.imread(self.path.parent / self._localizer_name),
+                name=self._localizer_name,
+            )
+        return self._localizer
 
     @property
     def oct_meta(self):
-        if self._oct_meta is None:
-            retrieve_dict = self.create_meta_retrieve_funcs_heyex_xml(
-                self.xml_root[0], HEXML_VERSIONS(self.version)
-            )
-            self._oct_meta = LazyMeta(**retrieve_dict)
-
         return self._oct_meta
 
+    @staticmethod
+    def _read_meta(xml_root, specification):
+        """Read all meta fields of the specification from the element.
+
+        Fields which can not be read raise their error when they are accessed.
+        """
+        meta = {}
+        for field, loc, func in specification:
+            try:
+                meta[field] = func(xml_root.findall(loc))
+            except Exception as e:
+                meta[field] = _raiser(e)
+        return meta
+
     def _data_processing(self, data):
         """How to process the loaded B-Scans."""
         if data.ndim == 3:
             return img_as_ubyte(data[..., 0])
         return img_as_ubyte(data)
 
-    def create_meta_retrieve_funcs_heyex_xml(self, xml_root, specification):
-        """For every meta field, create a function to read it from the file.
-
-        Return all functions in a dict name: func
-        """
-        fields = [entry[0] for entry in specification]
-        locs = [entry[1] for entry in specification]
-        funcs = [entry[2] for entry in specification]
-
-        func_dict = {}
-
-        def func_builder(xml, f, lo):
-            return lambda: f(xml.findall(lo))
-
-        for field, func, loc in zip(fields, funcs, locs):
-            func_dict[field] = func_builder(xml_root, func, loc)
-
-        return func_dict
-
-    def create_annotation_dict(self, bscan_root):
+    def create_annotation_dict(self, index):
         """For every Annotation create a function to read it.
 
         Currently only a function to read the layer segmentaton is
-        returned.
+        returned. The layer heights are a view into `layers`.
         """
 
         def layers_dict(bscan_obj):
-
-            seglines = bscan_root.findall(".//SegLine")
-
-            if seglines:
-                data = np.full(
-                    shape=(17, bscan_obj.oct_obj.SizeX),
-                    fill_value=np.nan,
-                    dtype="float32",
-                )
-                for segline in seglines:
-                    name = segline.find("./Name").text
-                    data[SEG_MAPPING[name], :] = [
-                        float(x) for x in segline.find("./Array").text.split()
-                    ]
-                return LazyLayerAnnotation(data, max_height=bscan_obj.oct_obj.SizeY)
-            else:
-                # warnings.warn(f"{bscan_obj} contains no segmentation", UserWarning)
-                data = np.zeros(
-                    (max(SEG_MAPPING.values()) + 1, bscan_obj.oct_obj.SizeX)
-                )
-                return LazyLayerAnnotation(data, max_height=bscan_obj.oct_obj.SizeY)
+            return LazyLayerAnnotation(
+                self.layers[:, index], max_height=bscan_obj.oct_obj.SizeY
+            )
 
         return {
             "layers": layers_dict,
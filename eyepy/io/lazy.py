@@ -31,6 +31,12 @@ SEG_MAPPING = {
 }
 
 
+def _mask_invalid_heights(data, max_height):
+    """Set layer heights outside of [0, max_height] to NaN in place."""
+    with np.errstate(invalid="ignore"):
+        data[np.logical_or(data < 0, data > max_height)] = np.nan
+
+
 class LazyMeta(EyeMeta):
     def __init__(self, *args, **kwargs):
         """The Meta object is a dict with additional functionalities.
@@ -108,6 +114,8 @@ class LazyAnnotation(MutableMapping):
 class LazyLayerAnnotation(MutableMapping):
     def __init__(self, data, layername_mapping=None, max_height=2000):
         self._data = data
+        self._masked_data = None
+        self._has_data = None
         self.max_height = max_height
         if layername_mapping is None:
             self.mapping = SEG_MAPPING
@@ -120,27 +128,35 @@ class LazyLayerAnnotation(MutableMapping):
             self._data = self._data()
         return self._data
 
+    @property
+    def _masked(self):
+        """Layer heights with values outside of [0, max_height] set to NaN.
+
+        Computed once for all layers and cached until the data is changed. The
+        cached heights are shared, hence read-only.
+        """
+        if self._masked_data is None:
+            data = np.array(self.data)
+            _mask_invalid_heights(data, self.max_height)
+            data.flags.writeable = False
+            self._masked_data = data
+            self._has_data = np.nansum(data, axis=-1) > 0
+        return self._masked_data
+
     def __getitem__(self, key):
-        data = self.data[self.mapping[key]]
-        nans = np.isnan(data)
-        empty = np.nonzero(
-            np.logical_or(
-                np.less(data, 0, where=~nans),
-                np.greater(data, self.max_height, where=~nans),
-            )
-        )
-        data = np.copy(data)
-        data[empty] = np.nan
-        if np.nansum(data) > 0:
+        data = self._masked[self.mapping[key]]
+        if self._has_data[self.mapping[key]]:
             return data
         else:
             raise KeyError(f"There is no data given for the {key} layer")
 
     def __setitem__(self, key, value):
         self.data[self.mapping[key]] = value
+        self._masked_data = None
 
     def __delitem__(self, key):
         self.data[self.mapping[key], :] = np.nan
+        self._masked_data = None
 
     def __iter__(self):
         inv_map = {v: k for k, v in self.mapping.items()}
@@ -179,26 +195,16 @@ class LazyEnfaceImage:
 
 
 class LazyBscan:
-    def __new__(
-        cls,
-        data,
-        annotation=None,
-        meta=None,
-        data_processing=None,
-        oct_obj=None,
-        name=None,
-        *args,
-        **kwargs,
-    ):
-        # Make all meta fields accessible as attributes of the BScan without
-        # reading them. Set a property instead
-        def meta_func_builder(x):
-            return lambda self: self.meta[x]
-
-        if meta is not None:
-            for key in meta:
-                setattr(cls, key, property(meta_func_builder(key)))
-        return object.__new__(cls, *args, **kwargs)
+    __slots__ = (
+        "_scan_raw",
+        "_scan",
+        "_meta",
+        "_oct_obj",
+        "_annotation",
+        "_data_processing",
+        "_name",
+        "_index",
+    )
 
     def __init__(
         self,
@@ -208,9 +214,12 @@ class LazyBscan:
         data_processing: Optional[Callable] = None,
         oct_obj: Optional["Oct"] = None,
         name: Optional[str] = None,
+        index: Optional[int] = None,
     ):
         """
 
+        All meta fields are accessible as attributes of the B-Scan.
+
         Parameters
         ----------
         data : A numpy array holding the raw B-Scan data or a callable which
@@ -221,6 +230,7 @@ class LazyBscan:
         meta : A dictionary holding the B-Scans meta informations or
         oct_obj : Reference to the OCT Volume holding the B-Scan
         name : Filename of the B-Scan if B-Scan is save as individual file
+        index : Position of the B-Scan in the OCT Volume
         """
         self._scan_raw = data
         self._scan = None
@@ -235,6 +245,18 @@ class LazyBscan:
             self._data_processing = data_processing
 
         self._name = name
+        self._index = index
+
+    def __getattr__(self, key):
+        # Only called if the regular attribute lookup fails. Meta fields are
+        # read from the meta object instead of being set on the class.
+        try:
+            meta = object.__getattribute__(self, "_meta")
+        except AttributeError:
+            meta = None
+        if meta is not None and key in meta:
+            return meta[key]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{key}'")
 
     @property
     def oct_obj(self):
@@ -254,7 +276,9 @@ class LazyBscan:
 
     @property
     def index(self):
-        return self.oct_obj.bscans.index(self)
+        if self._index is None:
+            self._index = self.oct_obj.bscans.index(self)
+        return self._index
 
     @property
     def meta(self):
@@ -382,6 +406,7 @@ class LazyVolume:
         self._localizer = localizer
         self._meta = meta
         self._tform_localizer_to_oct = None
+        self._layers = None
 
         self._eyepy_id = None
         if data_path is None:
@@ -395,9 +420,12 @@ class LazyVolume:
         else:
             bscan = self.bscans[index]
             if callable(bscan):
-                self.bscans[index] = bscan()
-            self.bscans[index].oct_obj = self
-            return self.bscans[index]
+                bscan = bscan()
+                self.bscans[index] = bscan
+            bscan.oct_obj = self
+            if bscan._index is None:
+                bscan._index = index % len(self)
+            return bscan
 
     def __len__(self):
         """The number of B-Scans."""
@@ -424,7 +452,7 @@ class LazyVolume:
         the unprocessed output of the OCT device. In any case this is
         the unprocessed data imported by eyepy.
         """
-        return np.stack([x.scan_raw for x in self.bscans], axis=0)
+        return np.stack([x.scan_raw for x in self], axis=0)
 
     @property
     def volume(self):
@@ -433,7 +461,18 @@ class LazyVolume:
         The array is of dtype <ubyte> and encodes the intensities as
         values between 0 and 255.
         """
-        return np.stack([x.scan for x in self.bscans], axis=0)
+        return np.stack([x.scan for x in self], axis=0)
+
+    def _assemble_layers(self):
+        """Copy the layers of all B-scans into a single preallocated array."""
+        first = self[0].layers.data
+        layers = np.empty(
+            (first.shape[0], len(self), first.shape[1]), dtype=first.dtype
+        )
+        for index, bscan in enumerate(self):
+            # The first B-scan is located at the bottom of the height map
+            layers[:, len(self) - 1 - index] = bscan.layers.data
+        return layers
 
     @property
     def layers_raw(self):
@@ -446,26 +485,25 @@ class LazyVolume:
         A flip on the B-Scan axis is needed to locate the first B-Scan at the
         bottom of the height map.
         """
-        return np.flip(np.stack([x.layers.data for x in self], axis=1), axis=1)
+        return self._assemble_layers()
 
     @property
     def layers(self):
-        """Height maps for all layers accessible by the layers name."""
-        nans = np.isnan(self.layers_raw)
-        empty = np.nonzero(
-            np.logical_or(
-                np.less(self.layers_raw, 0, where=~nans),
-                np.greater(self.layers_raw, self.meta["SizeY"], where=~nans),
-            )
-        )
+        """Height maps for all layers accessible by the layers name.
 
-        data = self.layers_raw.copy()
-        data[empty] = np.nan
-        return {
-            name: data[i, ...]
-            for name, i in self[0].layers.mapping.items()
-            if np.nansum(data[i, ...]) != 0
-        }
+        The height maps are computed once and are read-only views into a
+        single array.
+        """
+        if self._layers is None:
+            data = self._assemble_layers()
+            _mask_invalid_heights(data, self.meta["SizeY"])
+            data.flags.writeable = False
+            self._layers = {
+                name: data[i, ...]
+                for name, i in self[0].layers.mapping.items()
+                if np.nansum(data[i, ...]) != 0
+            }
+        return self._layers
 
     @property
     def meta(self):
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""The eyepy archive format.
+
+An archive is a directory holding a `meta.json` and one `.npy` file per
+array:
+
+    meta.json           Format version, meta data, localizer transform and
+                        the names and parameters of all annotations
+    data.npy            Intensity transformed volume (n_bscans, height, width)
+    raw.npy             Raw volume, optional
+    localizer.npy       Localizer image
+    layers/<i>.npy      Layer height maps (n_bscans, width)
+    volume_maps/<i>.npy Voxel annotations (n_bscans, height, width)
+    ascan_maps/<i>.npy  A-scan annotations
+
+Arrays are stored in C order, so every B-scan of a volume and every row of a
+layer height map is a contiguous chunk of its file. Archives are loaded as
+memory maps and only the chunks which are accessed are read from disk. Changed
+annotations can be saved by rewriting only the changed chunks (see
+`save_annotations`).
+"""
+import json
+import logging
+import os
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Union
+
+import numpy as np
+from skimage import transform
+
+from eyepy.core import eyemeta
+from eyepy.core.eyeenface import EyeEnface
+from eyepy.core.eyevolume import EyeVolume, EyeVolumeVoxelAnnotation
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "eyepy"
+FORMAT_VERSION = 1
+
+
+def _encode(obj):
+    """Convert meta data to JSON serializable objects.
+
+    Types which JSON does not preserve are tagged with `__type__`.
+    """
+    if isinstance(obj, eyemeta.EyeMeta):
+        return {
+            "__type__": type(obj).__name__,
+            "items": {key: _encode(value) for key, value in obj.items()},
+        }
+    if isinstance(obj, dict):
+        return {
+            "__type__": "dict",
+            "items": [[_encode(k), _encode(v)] for k, v in obj.items()],
+        }
+    if isinstance(obj, tuple):
+        return {"__type__": "tuple", "items": [_encode(v) for v in obj]}
+    if isinstance(obj, list):
+        return [_encode(v) for v in obj]
+    if isinstance(obj, datetime):
+        return {"__type__": "datetime", "value": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"__type__": "date", "value": obj.isoformat()}
+    if isinstance(obj, np.ndarray):
+        return {
+            "__type__": "ndarray",
+            "dtype": obj.dtype.str,
+            "value": obj.tolist(),
+        }
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    raise TypeError(f"Objects of type {type(obj).__name__} can not be saved.")
+
+
+def _decode(obj):
+    """Inverse of `_encode`."""
+    if isinstance(obj, list):
+        return [_decode(v) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+
+    kind = obj["__type__"]
+    if kind == "dict":
+        return {_decode(k): _decode(v) for k, v in obj["items"]}
+    if kind == "tuple":
+        return tuple(_decode(v) for v in obj["items"])
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["value"])
+    if kind == "date":
+        return date.fromisoformat(obj["value"])
+    if kind == "ndarray":
+        return np.array(obj["value"], dtype=obj["dtype"])
+    meta_class = getattr(eyemeta, kind)
+    return meta_class(**{key: _decode(v) for key, v in obj["items"].items()})
+
+
+def _encode_transform(tform):
+    return {"type": type(tform).__name__, "params": tform.params.tolist()}
+
+
+def _decode_transform(value):
+    tform = getattr(transform, value["type"])()
+    tform.params = np.array(value["params"])
+    return tform
+
+
+def _save_array(path: Path, array):
+    """Write an array to a .npy file one chunk along the first axis at a time."""
+    array_shape = tuple(array.shape)
+    if len(array_shape) == 0 or array_shape[0] == 0:
+        np.save(path, np.asarray(array))
+        return
+    first = np.asarray(array[0])
+    out = np.lib.format.open_memmap(
+        path, mode="w+", dtype=first.dtype, shape=array_shape
+    )
+    out[0] = first
+    for i in range(1, array_shape[0]):
+        out[i] = array[i]
+    out.flush()
+    del out
+
+
+def _layer_entry(name, layer, file):
+    knots = {key: value for key, value in layer.knots.items() if value}
+    return {"name": name, "file": file, "knots": _encode(knots)}
+
+
+def _voxel_map_entry(name, voxel_map, file):
+    return {
+        "name": name,
+        "file": file,
+        "radii": _encode(voxel_map.radii),
+        "n_sectors": _encode(voxel_map.n_sectors),
+        "offsets": _encode(voxel_map.offsets),
+        "center": _encode(voxel_map.center),
+    }
+
+
+def _set_saved(volume: EyeVolume, path: Path):
+    # Annotation changes are tracked relative to the archive at `path`
+    volume._archive_path = path
+    for annotation in list(volume.layers.values()) + list(volume.volume_maps.values()):
+        annotation._dirty[:] = False
+
+
+def _new_file(folder: Path) -> str:
+    # Files of memory mapped annotations must not be overwritten, hence new
+    # files get a name which is not used yet.
+    i = 0
+    while (folder / f"{i}.npy").exists():
+        i += 1
+    return f"{i}.npy"
+
+
+def _write_rows(path: Path, data, rows) -> bool:
+    """Write the given rows of `data` into an existing .npy file in place.
+
+    Returns False if the file does not match the shape and dtype of `data`.
+    """
+    out = np.load(path, mmap_mode="r+")
+    if out.shape != np.shape(data) or out.dtype != data.dtype:
+        return False
+    for row in rows:
+        out[row] = data[row]
+    out.flush()
+    return True
+
+
+def _update_annotations(folder: Path, entries, annotations, make_entry, save):
+    """Update the files of layers or volume maps, return the new entries."""
+    old_entries = {entry["name"]: entry for entry in entries}
+    new_entries = []
+    for name, annotation in annotations.items():
+        entry = old_entries.pop(name, None)
+        rows = np.flatnonzero(annotation._dirty)
+        if entry is None or not _write_rows(
+            folder / entry["file"], annotation.data, rows
+        ):
+            file = _new_file(folder)
+            save(folder / file, annotation.data)
+            if entry is not None:
+                (folder / entry["file"]).unlink()
+            entry = {"file": file}
+            logger.debug(f"Wrote {folder.name} '{name}' to {file}")
+        elif len(rows):
+            logger.debug(f"Rewrote {len(rows)} rows of {folder.name} '{name}'")
+        new_entries.append(make_entry(name, annotation, entry["file"]))
+
+    for entry in old_entries.values():
+        (folder / entry["file"]).unlink()
+    return new_entries
+
+
+def save_annotations(volume: EyeVolume, path: Union[str, Path, None] = None):
+    """Save changed annotations to an existing eyepy archive.
+
+    Only rows of layer height maps and B-scans of volume maps which changed
+    since the volume was loaded from or saved to the archive are written.
+    Added annotations are written completely and files of removed annotations
+    are deleted. A-scan maps are rewritten if they differ from the archive.
+
+    Args:
+        volume: A volume loaded from or saved to the archive
+        path: Location of the archive directory. Defaults to the archive the
+            volume was loaded from or saved to.
+    """
+    if volume._archive_path is None:
+        raise ValueError(
+            "The volume was neither loaded from nor saved to an archive. Save it"
+            " with `save_eyevolume` first."
+        )
+    path = volume._archive_path if path is None else Path(path)
+    if path.resolve() != volume._archive_path.resolve():
+        raise ValueError(
+            f"Annotation changes are tracked relative to {volume._archive_path}"
+            f" and can not be saved to {path}."
+        )
+
+    with open(path / "meta.json", "r") as f:
+        meta = json.load(f)
+
+    meta["layers"] = _update_annotations(
+        path / "layers",
+        meta["layers"],
+        volume.layers,
+        _layer_entry,
+        lambda p, data: np.save(p, np.asarray(data)),
+    )
+    meta["volume_maps"] = _update_annotations(
+        path / "volume_maps",
+        meta["volume_maps"],
+        volume.volume_maps,
+        _voxel_map_entry,
+        _save_array,
+    )
+
+    old_ascan_maps = {
+        _decode(entry["name"]): entry["file"] for entry in meta["ascan_maps"]
+    }
+    meta["ascan_maps"] = []
+    for name, ascan_map in volume.ascan_maps.items():
+        file = old_ascan_maps.pop(name, None)
+        if file is None or not np.array_equal(
+            np.load(path / "ascan_maps" / file), ascan_map
+        ):
+            if file is not None:
+                (path / "ascan_maps" / file).unlink()
+            file = _new_file(path / "ascan_maps")
+            np.save(path / "ascan_maps" / file, np.asarray(ascan_map))
+        meta["ascan_maps"].append({"name": _encode(name), "file": file})
+    for file in old_ascan_maps.values():
+        (path / "ascan_maps" / file).unlink()
+
+    with open(path / "meta.json.tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(path / "meta.json.tmp", path / "meta.json")
+    _set_saved(volume, path)
+
+
+class _VolumeData:
+    # Yields the transformed B-scans of a volume without transforming the
+    # complete volume if it uses a B-scan cache
+    def __init__(self, volume: EyeVolume):
+        self.volume = volume
+
+    def __getitem__(self, index):
+        return self.volume._get_bscan_data(index)
+
+    @property
+    def shape(self):
+        return self.volume.shape
+
+
+def _describe_volume(volume: EyeVolume, include_raw: bool = False):
+    """Split a volume into the archive meta data and its arrays.
+
+    Arrays are returned by their path relative to the archive directory.
+    """
+    arrays = {"data.npy": _VolumeData(volume)}
+    if include_raw:
+        arrays["raw.npy"] = volume._raw_data
+    arrays["localizer.npy"] = np.asarray(volume.localizer.data)
+
+    layers = []
+    for i, (name, layer) in enumerate(volume.layers.items()):
+        arrays[f"layers/{i}.npy"] = np.asarray(layer.data)
+        layers.append(_layer_entry(name, layer, f"{i}.npy"))
+
+    volume_maps = []
+    for i, (name, voxel_map) in enumerate(volume.volume_maps.items()):
+        arrays[f"volume_maps/{i}.npy"] = voxel_map.data
+        volume_maps.append(_voxel_map_entry(name, voxel_map, f"{i}.npy"))
+
+    ascan_maps = []
+    for i, (name, ascan_map) in enumerate(volume.ascan_maps.items()):
+        arrays[f"ascan_maps/{i}.npy"] = np.asarray(ascan_map)
+        ascan_maps.append({"name": _encode(name), "file": f"{i}.npy"})
+
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "meta": _encode(volume.meta),
+        "localizer_meta": _encode(volume.localizer.meta),
+        "localizer_transform": _encode_transform(volume.localizer_transform),
+        "layers": layers,
+        "volume_maps": volume_maps,
+        "ascan_maps": ascan_maps,
+    }
+    return meta, arrays
+
+
+def _build_volume(meta, load_array: Callable) -> EyeVolume:
+    """Create a volume from archive meta data.
+
+    Args:
+        meta: Archive meta data as created by `_describe_volume`
+        load_array: Returns an array given its path relative to the archive
+            directory and whether it is an annotation. If the array does not
+            exist it returns None.
+    """
+    if meta.get("format") != FORMAT_NAME:
+        raise ValueError("The data is not an eyepy archive.")
+    if meta["version"] > FORMAT_VERSION:
+        raise ValueError(
+            f"The archive has version {meta['version']} but only versions up to"
+            f" {FORMAT_VERSION} are supported. Please update eyepy."
+        )
+
+    data = load_array("data.npy", False)
+    raw_data = load_array("raw.npy", False)
+
+    localizer = EyeEnface(
+        data=np.asarray(load_array("localizer.npy", False)),
+        meta=_decode(meta["localizer_meta"]),
+    )
+    volume = EyeVolume(
+        data=data if raw_data is None else raw_data,
+        meta=_decode(meta["meta"]),
+        localizer=localizer,
+        transformation=_decode_transform(meta["localizer_transform"]),
+    )
+    if raw_data is not None:
+        # The intensity transform can not be saved. The saved transformed
+        # volume is used until a new intensity transform is set.
+        volume._data = data
+
+    for layer in meta["layers"]:
+        volume.add_layer(layer["name"], load_array(f"layers/{layer['file']}", True))
+        volume.layers[layer["name"]].knots.update(_decode(layer["knots"]))
+
+    for voxel_map in meta["volume_maps"]:
+        volume.volume_maps[voxel_map["name"]] = EyeVolumeVoxelAnnotation(
+            load_array(f"volume_maps/{voxel_map['file']}", True),
+            voxel_map["name"],
+            volume,
+            radii=_decode(voxel_map["radii"]),
+            n_sectors=_decode(voxel_map["n_sectors"]),
+            offsets=_decode(voxel_map["offsets"]),
+            center=_decode(voxel_map["center"]),
+        )
+
+    for ascan_map in meta["ascan_maps"]:
+        volume.ascan_maps[_decode(ascan_map["name"])] = load_array(
+            f"ascan_maps/{ascan_map['file']}", True
+        )
+
+    return volume
+
+
+def save_eyevolume(
+    volume: EyeVolume, path: Union[str, Path], include_raw: bool = False
+):
+    """Save an EyeVolume as eyepy archive.
+
+    The archive is written next to `path` first and replaces an existing
+    archive at `path` afterwards. Hence volumes loaded from `path` can be saved
+    to `path` again. If saving is interrupted while the archives are swapped,
+    the previous archive is left at `path` with the suffix ".old".
+
+    Args:
+        volume: The volume to save
+        path: Location of the archive directory
+        include_raw: Whether to save the raw volume in addition to the
+            intensity transformed volume
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    for folder in ["layers", "volume_maps", "ascan_maps"]:
+        (tmp_path / folder).mkdir(parents=True)
+
+    meta, arrays = _describe_volume(volume, include_raw)
+    for name, array in arrays.items():
+        _save_array(tmp_path / name, array)
+
+    with open(tmp_path / "meta.json", "w") as f:
+        json.dump(meta, f)
+
+    # The previous archive is moved aside before the new one is moved in, so
+    # one of them is complete at any time. It is removed last, volumes memory
+    # mapped from it keep their mappings.
+    old_path = path.with_name(path.name + ".old")
+    if path.exists():
+        if old_path.exists():
+            shutil.rmtree(old_path)
+        path.rename(old_path)
+    tmp_path.rename(path)
+    # Files of live memory maps can not be removed on Windows, the remains are
+    # removed by the next save
+    shutil.rmtree(old_path, ignore_errors=True)
+    _set_saved(volume, path)
+
+
+def load_eyevolume(path: Union[str, Path], mmap_mode: str = "r") -> EyeVolume:
+    """Load an EyeVolume from an eyepy archive.
+
+    The volume is memory mapped, so B-scans are only read from disk when they
+    are accessed. Annotations are memory mapped copy-on-write: they can be
+    modified, but changes are only written to the archive by
+    `save_annotations`.
+
+    Args:
+        path: Location of the archive directory
+        mmap_mode: Memory map mode of the volume (see `numpy.load`). Use None
+            to read the complete volume into memory.
+    """
+    path = Path(path)
+    with open(path / "meta.json", "r") as f:
+        meta = json.load(f)
+
+    annotation_mode = None if mmap_mode is None else "c"
+
+    def load_array(name, annotation):
+        if not (path / name).exists():
+            return None
+        return np.load(
+            path / name, mmap_mode=annotation_mode if annotation else mmap_mode
+        )
+
+    volume = _build_volume(meta, load_array)
+    _set_saved(volume, path)
+    return volume
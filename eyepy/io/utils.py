@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Union, MutableMapping, Tuple
+from typing import Callable, List, MutableMapping, Optional, Tuple, Union
 
+import imageio
 import numpy as np
 from skimage import transform
 
@@ -92,6 +94,46 @@ def _get_date_from_xml(elements):
     return datetime(year, month, day).date()
 
 
+def _read_images(
+    paths: List,
+    transform: Optional[Callable] = None,
+    max_workers: Optional[int] = None,
+) -> np.ndarray:
+    """Decode images into a single (n, height, width) array.
+
+    Images are decoded in a thread pool and written directly into a
+    preallocated array. Shape and dtype are taken from the first image. Of
+    multichannel images only the first channel is used.
+
+    Args:
+        paths: Paths of the images in the order of the returned array
+        transform: Applied to every decoded 2D image
+        max_workers: Maximum number of threads decoding images
+    """
+    if len(paths) == 0:
+        raise ValueError("There are no images to read.")
+
+    def read(path):
+        image = imageio.imread(path)
+        if image.ndim == 3:
+            image = image[..., 0]
+        if transform is not None:
+            image = transform(image)
+        return image
+
+    first = read(paths[0])
+    images = np.empty((len(paths),) + first.shape, dtype=first.dtype)
+    images[0] = first
+
+    def read_into(index):
+        images[index] = read(paths[index])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consume the results to raise exceptions from the workers
+        list(executor.map(read_into, range(1, len(paths))))
+    return images
+
+
 def _compute_localizer_oct_transform(
     volume_meta: MutableMapping,
     enface_meta: MutableMapping,
@@ -139,16 +181,32 @@ def _get_enface_meta(lazy_volume: LazyVolume):
     )
 
 
-def _get_volume_meta(lazy_volume: LazyVolume):
-    bscan_meta = [
-        EyeBscanMeta(
-            quality=b.meta["Quality"],
-            start_pos=(b.meta["StartX"], b.meta["StartY"]),
-            end_pos=(b.meta["EndX"], b.meta["EndY"]),
-            pos_unit="mm",
+def _get_volume_meta(lazy_volume: LazyVolume, bscan_headers: np.ndarray = None):
+    """Create the EyeVolumeMeta from a LazyVolume.
+
+    If the B-scan headers are available as a structured array (see
+    `HeyexVolReader.bscan_headers`), the B-scan meta is read column-wise from
+    it instead of accessing the meta of every B-scan individually.
+    """
+    if bscan_headers is None:
+        bscan_meta = [
+            EyeBscanMeta(
+                quality=b.meta["Quality"],
+                start_pos=(b.meta["StartX"], b.meta["StartY"]),
+                end_pos=(b.meta["EndX"], b.meta["EndY"]),
+                pos_unit="mm",
+            )
+            for b in lazy_volume
+        ]
+    else:
+        start_pos = zip(
+            bscan_headers["StartX"].tolist(), bscan_headers["StartY"].tolist()
         )
-        for b in lazy_volume
-    ]
+        end_pos = zip(bscan_headers["EndX"].tolist(), bscan_headers["EndY"].tolist())
+        bscan_meta = [
+            EyeBscanMeta(quality=q, start_pos=s, end_pos=e, pos_unit="mm")
+            for q, s, e in zip(bscan_headers["Quality"].tolist(), start_pos, end_pos)
+        ]
 
     if not lazy_volume.ScanPattern == 1:
         # Check if all B-scans are parallel and have the same distance. They might be rotated though
@@ -178,5 +236,6 @@ def _get_volume_meta(lazy_volume: LazyVolume):
         laterality=lazy_volume.meta["ScanPosition"],
         visit_date=lazy_volume.meta["VisitDate"],
         exam_time=lazy_volume.meta["ExamTime"],
+        patient_id=lazy_volume.meta["PatientID"],
         bscan_meta=bscan_meta,
     )
@@ -1 +1 @@
-from ._drusen import drusen
+from ._drusen import IncrementalDrusen, drusen
@@ -1,38 +1,104 @@
 # -*- coding: utf-8 -*-
 import logging
+import math
 
 import numpy as np
+from scipy import ndimage
+
 from eyepy.core import EyeVolumeLayerAnnotation
+from eyepy.core.voxelmaps import IntervalVoxelMap
 
 from eyepy.quantification.utils.filter import filter_by_height_enface
 
 logger = logging.getLogger("eyepy.quantification.drusen")
 
 
+def _ideal_rpe_height(hist, edges, clean_shifted):
+    """The ideal RPE height relative to the BM aligned to the center line."""
+    # Compute the ideal RPE as the mean of the biggest bin and its neighbours
+    lower_edge = edges[np.argmax(hist) - 1]
+    upper_edge = edges[np.argmax(hist) + 2]
+    return np.mean(
+        clean_shifted[
+            np.logical_and(clean_shifted <= upper_edge, clean_shifted >= lower_edge)
+        ]
+    )
+
+
+def _bm_shift(bm_height, volume_shape):
+    """Shift which aligns the BM to the horizontal center line."""
+    d, h, w = volume_shape
+    shift = np.empty((d, w), dtype="int")
+    shift.fill(h - (h / 2))
+    return shift - bm_height
+
+
+def _height_statistics(shifted_rpe_height, height):
+    """Per row statistics of the shifted RPE heights.
+
+    Returns the counts and sums of the heights in the bins of
+    `np.histogram(heights, bins=np.arange(height))` and the counts of integer
+    heights. Heights outside the bins and NaNs are ignored.
+    """
+    n_rows = len(shifted_rpe_height)
+    n_bins = height - 1
+    rows = np.broadcast_to(np.arange(n_rows)[:, np.newaxis], shifted_rpe_height.shape)
+    valid = (shifted_rpe_height >= 0) & (shifted_rpe_height <= n_bins)
+    values = shifted_rpe_height[valid]
+    rows = rows[valid]
+
+    # The last bin includes its upper edge
+    index = rows * n_bins + np.minimum(values.astype(int), n_bins - 1)
+    counts = np.bincount(index, minlength=n_rows * n_bins)
+    sums = np.bincount(index, weights=values, minlength=n_rows * n_bins)
+    integer = values == np.floor(values)
+    exact = np.bincount(
+        rows[integer] * height + values[integer].astype(int),
+        minlength=n_rows * height,
+    )
+    return (
+        counts.reshape(n_rows, n_bins),
+        sums.reshape(n_rows, n_bins),
+        exact.reshape(n_rows, height),
+    )
+
+
+def _ideal_rpe_height_from_statistics(hist, sums, exact, shifted_rpe_height):
+    """The ideal RPE height from the statistics of `_height_statistics`.
+
+    Equals `_ideal_rpe_height` up to rounding, but does not depend on the row
+    order and only reads the bins around the biggest bin.
+    """
+    k = np.argmax(hist)
+    if k == 0 or k + 2 > len(hist):
+        # The neighbouring edges wrap around or do not exist
+        clean_shifted = shifted_rpe_height[~np.isnan(shifted_rpe_height)]
+        return _ideal_rpe_height(hist, np.arange(len(hist) + 1), clean_shifted)
+
+    count = hist[k - 1 : k + 2].sum()
+    total = math.fsum(sums[:, k - 1 : k + 2].ravel())
+    if k + 2 < len(hist):
+        # Heights on the upper edge are in the next bin
+        n_upper = exact[:, k + 2].sum()
+        count += n_upper
+        total += (k + 2) * n_upper
+    return total / count
+
+
 def ideal_rpe(rpe_height, bm_height, volume_shape):
     d, h, w = volume_shape
 
     # compute shift needed to align the BM to the horizontal center line
-    shift = np.empty((d, w), dtype="int")
-    shift.fill(h - (h / 2))
-    shift = shift - bm_height
+    shift = _bm_shift(bm_height, volume_shape)
 
     # now shift the RPE location array as well
     shifted_rpe_height = rpe_height + shift
 
-    # Remove all NANs from the shifted RPE data
-    clean_shifted = shifted_rpe_height[~np.isnan(shifted_rpe_height)]
+    # Histogram with a bin for every pixel height in a B-Scan
+    counts, sums, exact = _height_statistics(shifted_rpe_height, h)
 
-    # Compute a histogram with a bin for every pixel height in a B-Scan
-    hist, edges = np.histogram(clean_shifted.flatten(), bins=np.arange(volume_shape[1]))
-
-    # Compute the ideal RPE as the mean of the biggest bin and its neighbours
-    lower_edge = edges[np.argmax(hist) - 1]
-    upper_edge = edges[np.argmax(hist) + 2]
-    irpe_height = np.mean(
-        clean_shifted[
-            np.logical_and(clean_shifted <= upper_edge, clean_shifted >= lower_edge)
-        ]
+    irpe_height = _ideal_rpe_height_from_statistics(
+        counts.sum(axis=0), sums, exact, shifted_rpe_height
     )
     ideal_rpe = np.full_like(shifted_rpe_height, irpe_height)
 
@@ -42,12 +108,35 @@ def ideal_rpe(rpe_height, bm_height, volume_shape):
     return ideal_rpe
 
 
+def _slice_bounds(start, stop, length):
+    """Rows selected by `start:stop` along an axis of the given length.
+
+    Start and stop are float arrays which are truncated to int like slice
+    indices, negative values count from the end. NaN starts select nothing,
+    NaN stops are treated as 0.
+    """
+    valid = ~np.isnan(start)
+    start = np.where(valid, start, 0).astype(int)
+    stop = np.where(np.isnan(stop), 0, stop).astype(int)
+
+    def normalize(index):
+        index = np.where(index < 0, index + length, index)
+        return np.clip(index, 0, length)
+
+    top = normalize(start)
+    bottom = np.where(valid, np.maximum(normalize(stop), top), top)
+    return top, bottom
+
+
 def drusen(rpe_height, bm_height, volume_shape, minimum_height=2):
     """Compute drusen from the RPE and BM layer segmentation.
 
     First estimate the ideal RPE based on a histogram of the RPE heights relativ
     to the BM.
     Then compute drusen as the area between the RPE and the normal RPE
+
+    The drusen of every A-scan are a single interval, hence they are returned as
+    an IntervalVoxelMap. Use `np.asarray` to get a dense boolean map.
     """
     # Estimate ideal RPE
     if type(rpe_height) is EyeVolumeLayerAnnotation:
@@ -56,16 +145,297 @@ def drusen(rpe_height, bm_height, volume_shape, minimum_height=2):
         bm_height = bm_height.data
 
     idealrpe = ideal_rpe(rpe_height, bm_height, volume_shape)
-    # Create drusen map
-    drusen_map = np.zeros(volume_shape, dtype=bool)
     # Exclude normal RPE and RPE from the drusen area.
-    rpe = np.flip((rpe_height + 1).astype(int), axis=0)
-    irpe = np.flip(idealrpe.astype(int), axis=0)
-    for sli in range(drusen_map.shape[0]):
-        for col in range(drusen_map.shape[2]):
-            if not rpe[sli, col] == -9223372036854775808:
-                drusen_map[sli, rpe[sli, col] : irpe[sli, col], col] = 1
+    rpe = np.flip(rpe_height + 1, axis=0)
+    irpe = np.flip(idealrpe, axis=0)
+    top, bottom = _slice_bounds(rpe, irpe, volume_shape[1])
+    drusen_map = IntervalVoxelMap(top, bottom, volume_shape[1])
 
     drusen_map = filter_by_height_enface(drusen_map, minimum_height)
 
     return drusen_map
+
+
+class IncrementalDrusen:
+    def __init__(
+        self,
+        volume: "EyeVolume",
+        rpe: str = "RPE",
+        bm: str = "BM",
+        minimum_height: int = 2,
+        name: str = "drusen",
+    ):
+        """Drusen of a volume which are updated when the RPE or BM changes
+
+        The drusen are computed like `drusen` and set as volume map `name`.
+        When heights of the RPE or BM are changed for a B-scan (for example
+        with `volume[i].layers["RPE"] = heights`), the ideal RPE histogram is
+        updated and only A-scans whose drusen changed are recomputed. Enface
+        components are relabeled only around the changed A-scans.
+
+        Args:
+            volume: The volume holding the layers
+            rpe: Name of the RPE layer
+            bm: Name of the BM layer
+            minimum_height: Minimum height of the highest A-scan of a drusen
+            name: Name of the volume map holding the drusen
+        """
+        self.volume = volume
+        self.rpe = rpe
+        self.bm = bm
+        self.minimum_height = minimum_height
+        self.name = name
+
+        self._compute()
+        volume._layer_listeners.append(self._on_layer_change)
+
+    def detach(self):
+        """Stop updating the drusen on layer changes."""
+        self.volume._layer_listeners.remove(self._on_layer_change)
+
+    @property
+    def drusen_map(self) -> IntervalVoxelMap:
+        return self.volume.volume_maps[self.name].data
+
+    def _layer_rows(self, layer, bscans=None):
+        # Heights in B-scan order, the first B-scan is the last row of a layer
+        data = self.volume.layers[layer].data
+        if bscans is None:
+            return np.flip(np.asarray(data, dtype=float), 0)
+        return np.asarray(data[len(data) - 1 - bscans], dtype=float)
+
+    def _compute(self):
+        self._rpe_layer = self.volume.layers[self.rpe]
+        self._bm_layer = self.volume.layers[self.bm]
+        self._rpe = self._layer_rows(self.rpe)
+        self._shift = _bm_shift(self._layer_rows(self.bm), self.volume.shape)
+        self._shifted = self._rpe + self._shift
+        self._counts, self._sums, self._exact = _height_statistics(
+            self._shifted, self.volume.size_y
+        )
+        self._hist = self._counts.sum(axis=0)
+        self._irpe_height = self._ideal_rpe_height()
+        self._top, self._bottom = _slice_bounds(
+            self._rpe + 1, self._irpe_height - self._shift, self.volume.size_y
+        )
+
+        self._projection = self._bottom - self._top
+        self._labels, n_labels = ndimage.label(self._projection != 0)
+        self._max_heights = np.zeros(n_labels + 1)
+        # Bounding box (start row, stop row, start column, stop column) per label
+        self._boxes = np.zeros((n_labels + 1, 4), dtype=int)
+        if n_labels:
+            self._max_heights[1:] = ndimage.maximum(
+                self._projection, self._labels, index=np.arange(1, n_labels + 1)
+            )
+            self._boxes[1:] = _boxes(ndimage.find_objects(self._labels))
+        self._keep = self._max_heights[self._labels] >= self.minimum_height
+        # Labels of removed components, which are reused for new components
+        self._free_labels = np.zeros(0, dtype=self._labels.dtype)
+
+        self._map = IntervalVoxelMap(
+            self._top, np.where(self._keep, self._bottom, self._top), self.volume.size_y
+        )
+        self.volume.set_volume_map(self.name, self._map)
+
+    def _ideal_rpe_height(self):
+        return _ideal_rpe_height_from_statistics(
+            self._hist, self._sums, self._exact, self._shifted
+        )
+
+    def _on_layer_change(self, layer, bscan_index):
+        layers = self.volume.layers
+        if layer is not layers.get(self.rpe) and layer is not layers.get(self.bm):
+            return
+        if (
+            bscan_index is None
+            or layer is not self._rpe_layer
+            and layer is not self._bm_layer
+        ):
+            # A layer was replaced or changed completely
+            self._compute()
+        else:
+            self.update(bscan_index)
+
+    def update(self, bscan_index):
+        """Recompute the drusen after layer changes of the given B-scans.
+
+        Only the changed layer rows are read. The drusen bounds are recomputed
+        for the given B-scans, and for all B-scans only if the ideal RPE height
+        changed.
+        """
+        bscans = np.unique(np.atleast_1d(bscan_index) % len(self.volume))
+        h = self.volume.size_y
+
+        # Update the ideal RPE statistics with the changed B-scans
+        self._rpe[bscans] = self._layer_rows(self.rpe, bscans)
+        self._shift[bscans] = _bm_shift(
+            self._layer_rows(self.bm, bscans), (len(bscans),) + self.volume.shape[1:]
+        )
+        self._shifted[bscans] = self._rpe[bscans] + self._shift[bscans]
+        counts, sums, exact = _height_statistics(self._shifted[bscans], h)
+        self._hist += counts.sum(axis=0) - self._counts[bscans].sum(axis=0)
+        self._counts[bscans] = counts
+        self._sums[bscans] = sums
+        self._exact[bscans] = exact
+
+        irpe_height = self._ideal_rpe_height()
+        if irpe_height == self._irpe_height:
+            top, bottom = _slice_bounds(
+                self._rpe[bscans] + 1, irpe_height - self._shift[bscans], h
+            )
+            rows, cols = np.nonzero(
+                (top != self._top[bscans]) | (bottom != self._bottom[bscans])
+            )
+            self._top[bscans] = top
+            self._bottom[bscans] = bottom
+            rows = bscans[rows]
+        else:
+            # A changed ideal RPE can change the drusen of every B-scan
+            top, bottom = _slice_bounds(self._rpe + 1, irpe_height - self._shift, h)
+            rows, cols = np.nonzero((top != self._top) | (bottom != self._bottom))
+            self._top, self._bottom = top, bottom
+            self._irpe_height = irpe_height
+        if not len(rows):
+            return
+
+        self._projection[rows, cols] = self._bottom[rows, cols] - self._top[rows, cols]
+        boxes = self._relabel(rows, cols)
+        self._update_map(boxes)
+
+    def _update_map(self, boxes):
+        annotation = self.volume.volume_maps.get(self.name)
+        if annotation is None or annotation._data is not self._map:
+            # The volume map was removed or replaced
+            self._map = IntervalVoxelMap(
+                self._top,
+                np.where(self._keep, self._bottom, self._top),
+                self.volume.size_y,
+            )
+            self.volume.set_volume_map(self.name, self._map)
+            return
+
+        bscans = set()
+        for r0, r1, c0, c1 in boxes:
+            box = np.s_[r0:r1, c0:c1]
+            self._map.top[box] = self._top[box]
+            self._map.bottom[box] = np.where(
+                self._keep[box], self._bottom[box], self._top[box]
+            )
+            bscans.update(range(r0, r1))
+        annotation.mark_dirty(sorted(bscans))
+
+    def _relabel(self, rows, cols):
+        """Relabel the components touching the changed A-scans.
+
+        Returns the boxes (start row, stop row, start column, stop column)
+        which were relabeled.
+        """
+        n_rows, n_cols = self._labels.shape
+        # Components next to a changed A-scan might be split, grown or merged
+        neighbours = np.array([[0, 0], [-1, 0], [1, 0], [0, -1], [0, 1]])
+        touching = np.unique(
+            self._labels[
+                np.clip(rows[:, np.newaxis] + neighbours[:, 0], 0, n_rows - 1),
+                np.clip(cols[:, np.newaxis] + neighbours[:, 1], 0, n_cols - 1),
+            ]
+        )
+        touching = touching[touching != 0]
+
+        # Runs of changed A-scans within a B-scan and the touching components
+        # are grouped into boxes which do not touch each other.
+        run_starts = np.flatnonzero(
+            np.concatenate([[True], (np.diff(rows) != 0) | (np.diff(cols) != 1)])
+        )
+        run_stops = np.concatenate([run_starts[1:], [len(rows)]]) - 1
+        runs = np.stack(
+            [
+                rows[run_starts],
+                rows[run_starts] + 1,
+                cols[run_starts],
+                cols[run_stops] + 1,
+            ],
+            axis=1,
+        )
+        boxes = _merge_boxes(np.concatenate([runs, self._boxes[touching]]))
+
+        # The touching components are replaced completely. New components get
+        # their labels first, so the number of labels stays close to the
+        # number of components.
+        free = np.concatenate([self._free_labels, touching])
+        self._max_heights[touching] = 0
+        for r0, r1, c0, c1 in boxes:
+            box = np.s_[r0:r1, c0:c1]
+            scope = np.isin(self._labels[box], touching)
+            inside = (rows >= r0) & (rows < r1) & (cols >= c0) & (cols < c1)
+            scope[rows[inside] - r0, cols[inside] - c0] = True
+            local_labels, n_labels = ndimage.label(scope & (self._projection[box] != 0))
+            max_heights = np.zeros(n_labels + 1)
+            local_boxes = np.zeros((n_labels, 4), dtype=int)
+            if n_labels:
+                max_heights[1:] = ndimage.maximum(
+                    self._projection[box],
+                    local_labels,
+                    index=np.arange(1, n_labels + 1),
+                )
+                local_boxes = _boxes(ndimage.find_objects(local_labels))
+                local_boxes += [r0, r0, c0, c0]
+
+            n_appended = max(n_labels - len(free), 0)
+            appended = np.arange(n_appended) + len(self._max_heights)
+            new_labels = np.concatenate([free[:n_labels], appended]).astype(
+                self._labels.dtype
+            )
+            free = free[n_labels:]
+            self._max_heights = np.concatenate(
+                [self._max_heights, np.zeros(n_appended)]
+            )
+            self._boxes = np.concatenate(
+                [self._boxes, np.zeros((n_appended, 4), dtype=int)]
+            )
+            self._max_heights[new_labels] = max_heights[1:]
+            self._boxes[new_labels] = local_boxes
+
+            labels = np.concatenate([[0], new_labels])[local_labels]
+            self._labels[box] = np.where(scope, labels, self._labels[box])
+            self._keep[box] = np.where(
+                scope,
+                max_heights[local_labels] >= self.minimum_height,
+                self._keep[box],
+            )
+        self._free_labels = free
+        return boxes
+
+
+def _boxes(slices):
+    """Boxes (start row, stop row, start column, stop column) of 2D slices."""
+    return np.array([[s[0].start, s[0].stop, s[1].start, s[1].stop] for s in slices])
+
+
+def _merge_boxes(boxes, max_boxes=256):
+    """Merge boxes until no two boxes overlap or touch each other."""
+    if len(boxes) > max_boxes:
+        return [
+            (
+                boxes[:, 0].min(),
+                boxes[:, 1].max(),
+                boxes[:, 2].min(),
+                boxes[:, 3].max(),
+            )
+        ]
+
+    merged = [tuple(box) for box in boxes]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for r0, r1, c0, c1 in merged:
+            for i, (s0, s1, d0, d1) in enumerate(result):
+                if r0 <= s1 and s0 <= r1 and c0 <= d1 and d0 <= c1:
+                    result[i] = (min(r0, s0), max(r1, s1), min(c0, d0), max(c1, d1))
+                    changed = True
+                    break
+            else:
+                result.append((r0, r1, c0, c1))
+        merged = result
+    return merged
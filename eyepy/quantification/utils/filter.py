@@ -4,48 +4,86 @@ import logging
 import numpy as np
 from scipy import ndimage as ndimage
 
+from eyepy.core.voxelmaps import IntervalVoxelMap
+
 logger = logging.getLogger(__name__)
 
 
+def _label_lookup(connected_component_array, values):
+    """Map every element to the value of its component (0 for the background)."""
+    lut = np.zeros(len(values) + 1, dtype=np.result_type(values, np.int64))
+    lut[1:] = values
+    return lut[connected_component_array]
+
+
 def filter_by_depth(drusen_map, minimum_depth=2):
-    filtered_drusen = np.copy(drusen_map)
+    """Remove drusen whose maximum depth is below `minimum_depth`.
+
+    The depth of a drusen is the maximum number of its voxels along the first
+    axis (across B-scans) at any position of the B-scan plane.
+    """
     if minimum_depth == 0:
         return drusen_map
+    drusen_map = np.asarray(drusen_map)
     # get array where connected components get same label
     connected_component_array, num_drusen = ndimage.label(drusen_map)
-    # Go through each component, sum it along axis 0 and check max depth against threshold
-    max_depths = np.zeros_like(connected_component_array)
-    for label, drusen_pos in enumerate(ndimage.find_objects(connected_component_array)):
-        component_sub_vol = connected_component_array[drusen_pos]
-        component_max_depth = np.max(np.sum(component_sub_vol == label + 1, axis=0))
-        component_sub_vol[component_sub_vol == label + 1] = component_max_depth
-        max_depths[drusen_pos] = component_sub_vol
-    filtered_drusen[max_depths < minimum_depth] = False
-    return filtered_drusen.astype(bool)
+    if num_drusen == 0:
+        return drusen_map.astype(bool)
+
+    # Count the voxels of every component at every position of the B-scan
+    # plane, then take the maximum count per component. Only the annotated
+    # voxels are visited.
+    plane_size = np.prod(drusen_map.shape[1:])
+    voxels = np.nonzero(drusen_map)
+    positions = np.ravel_multi_index(voxels[1:], drusen_map.shape[1:])
+    labels = connected_component_array[voxels].astype(np.int64)
+    keys, counts = np.unique(labels * plane_size + positions, return_counts=True)
+    max_depths = np.zeros(num_drusen + 1, dtype=np.int64)
+    np.maximum.at(max_depths, keys // plane_size, counts)
+
+    keep = max_depths[labels] >= minimum_depth
+    filtered_drusen = np.zeros(drusen_map.shape, dtype=bool)
+    filtered_drusen[tuple(index[keep] for index in voxels)] = True
+    return filtered_drusen
+
+
+def _component_max_heights(projection):
+    """For every A-scan the maximum height of its connected drusen component.
+
+    Args:
+        projection: Drusen height per A-scan, shape (n_bscans, width)
+    """
+    # Find connected components in the enface projection
+    connected_component_array, num_drusen = ndimage.label(projection != 0)
+    if num_drusen == 0:
+        return np.zeros_like(projection)
+    max_heights = ndimage.maximum(
+        projection, connected_component_array, index=np.arange(1, num_drusen + 1)
+    )
+    return _label_lookup(connected_component_array, max_heights)
 
 
 def filter_by_height_enface(drusen_map, minimum_height=2):
+    """Remove drusen whose maximum height is below `minimum_height`.
+
+    Heights are measured per A-scan and drusen are connected components of the
+    enface projection.
+
+    Args:
+        drusen_map: Boolean array of shape (n_bscans, height, width) or an
+            IntervalVoxelMap. For an IntervalVoxelMap the filtered map is again
+            an IntervalVoxelMap.
+        minimum_height: Minimum height of the highest A-scan of a drusen
+    """
     if minimum_height == 0:
         return drusen_map
 
-    projection = np.sum(drusen_map, axis=1, keepdims=True)  # Shape (n_bscans, width)
+    if isinstance(drusen_map, IntervalVoxelMap):
+        max_heights = _component_max_heights(drusen_map.projection())
+        return drusen_map.masked(max_heights >= minimum_height)
 
-    # Find connected components in the enface projection
-    connected_component_array, num_drusen = ndimage.label(projection != 0)
-    # print(connected_component_array.shape)
-    max_heights = np.zeros_like(connected_component_array)
-    for drusen_pos in ndimage.find_objects(connected_component_array):
-        # Work on subvolume for faster processing
-        component_sub_vol = connected_component_array[drusen_pos]
-        # Find current label (most frequent label in the subvolume)
-        label = np.bincount(component_sub_vol[component_sub_vol != 0]).argmax()
-        component_max_height = np.max(
-            projection[drusen_pos][component_sub_vol == label]
-        )
-        # Set drusen region to drusen max height
-        max_heights[drusen_pos][component_sub_vol == label] = component_max_height
-
-    filtered_drusen = np.copy(drusen_map)
-    indices = np.nonzero(max_heights < minimum_height)
-    filtered_drusen[indices[0], :, indices[2]] = False
-    return filtered_drusen.astype(bool)
+    projection = np.count_nonzero(drusen_map, axis=1)  # Shape (n_bscans, width)
+    max_heights = _component_max_heights(projection)
+
+    keep = max_heights >= minimum_height
+    return np.logical_and(drusen_map, keep[:, np.newaxis, :])
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""Compact grid masks and a cache for them shared between processes.
+
+Grid regions do not overlap, hence all masks of a grid are stored as a single
+label image. Only pixels shared by several regions (with smooth edges) are
+stored separately together with their weights. The cache keeps these arrays
+as .npy files in one directory per grid, which are memory mapped read-only,
+so processes using the same cache directory share the masks through the
+page cache. Without a cache directory, masks are kept in memory per process.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from eyepy import config
+
+logger = logging.getLogger(__name__)
+
+# Increment when the computation of the masks changes to invalidate entries
+CACHE_VERSION = 2
+
+_ARRAYS = ["labels", "edge_pixels", "edge_regions", "edge_weights"]
+
+
+class GridMasks:
+    def __init__(
+        self,
+        names: List[str],
+        labels: np.ndarray,
+        edge_pixels: np.ndarray,
+        edge_regions: np.ndarray,
+        edge_weights: np.ndarray,
+    ):
+        """Masks of non-overlapping grid regions
+
+        Args:
+            names: Names of the regions
+            labels: Label image where pixels which belong to region i with
+                weight 1 have the label i + 1. All other pixels are 0.
+            edge_pixels: Flat indices of pixels which partially belong to
+                regions
+            edge_regions: Region index for every entry of `edge_pixels`
+            edge_weights: Weight of the pixel in the region for every entry of
+                `edge_pixels`
+        """
+        self.names = list(names)
+        self.labels = labels
+        self.edge_pixels = edge_pixels
+        self.edge_regions = edge_regions
+        self.edge_weights = edge_weights
+
+    @classmethod
+    def from_masks(cls, masks: Dict[str, np.ndarray]) -> "GridMasks":
+        """Create compact masks from dense masks of equal shape
+
+        Pixels with weight 1 may only belong to a single region.
+        """
+        names = list(masks.keys())
+        shape = np.shape(masks[names[0]])
+        dtype = np.uint8 if len(names) < 2 ** 8 else np.uint16
+        labels = np.zeros(shape, dtype=dtype)
+        pixels, regions, weights = [], [], []
+        for i, name in enumerate(names):
+            mask = np.asarray(masks[name], dtype=float)
+            full = mask == 1
+            if np.any(labels[full]):
+                raise ValueError(f"Region {name} overlaps with another region.")
+            labels[full] = i + 1
+
+            (partial,) = np.nonzero(np.logical_and(mask > 0, mask < 1).ravel())
+            pixels.append(partial)
+            regions.append(np.full(len(partial), i, dtype=np.int64))
+            weights.append(mask.ravel()[partial])
+
+        return cls(
+            names,
+            labels,
+            np.concatenate(pixels),
+            np.concatenate(regions),
+            np.concatenate(weights),
+        )
+
+    @property
+    def shape(self):
+        return self.labels.shape
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    def mask(self, index: int) -> np.ndarray:
+        """Dense float mask of the region with the given index"""
+        mask = np.equal(self.labels, index + 1).astype(float)
+        selection = self.edge_regions == index
+        mask.flat[self.edge_pixels[selection]] = self.edge_weights[selection]
+        return mask
+
+    def to_masks(self) -> Dict[str, np.ndarray]:
+        """Dense float masks by region name
+
+        The masks are newly created and can be modified.
+        """
+        return {name: self.mask(i) for i, name in enumerate(self.names)}
+
+    def matrix(self):
+        """Masks stacked into a sparse (n_regions, n_pixels) matrix
+
+        The pixels are the flattened pixels of the mask shape. Quantifying an
+        image for all regions is a single product with the flattened image.
+        """
+        from scipy import sparse
+
+        labels = self.labels.ravel()
+        (pixels,) = np.nonzero(labels)
+        rows = np.concatenate([labels[pixels].astype(np.int64) - 1, self.edge_regions])
+        cols = np.concatenate([pixels, self.edge_pixels])
+        values = np.concatenate([np.ones(len(pixels)), self.edge_weights])
+        return sparse.csr_matrix(
+            (values, (rows, cols)), shape=(len(self.names), labels.size)
+        )
+
+
+def _digest(key: dict) -> str:
+    content = json.dumps({"version": CACHE_VERSION, **key}, sort_keys=True)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def _entry_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.iterdir())
+
+
+class GridCache:
+    def __init__(self, path: Union[str, Path], max_bytes: int = 256 * 2 ** 20):
+        """A cache of grid masks on disk, shared by processes
+
+        Entries are written atomically, so several processes can use the same
+        directory at once. Loaded masks are memory mapped read-only.
+
+        Args:
+            path: Directory of the cache. It is created if it does not exist.
+            max_bytes: When the entries exceed this size in bytes, the least
+                recently used entries are removed.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Masks already loaded by this process
+        self._loaded = {}
+
+    @property
+    def nbytes(self) -> int:
+        """Size of all entries on disk in bytes"""
+        return sum(_entry_size(p) for p in self._entries())
+
+    def _entries(self) -> List[Path]:
+        return [
+            p for p in self.path.iterdir() if p.is_dir() and not p.name.startswith(".")
+        ]
+
+    def get(self, key: dict) -> Optional[GridMasks]:
+        """The cached masks for the key or None"""
+        digest = _digest(key)
+        if digest in self._loaded:
+            return self._loaded[digest]
+
+        entry = self.path / digest
+        try:
+            with open(entry / "meta.json") as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(entry / f"{name}.npy", mmap_mode="r") for name in _ARRAYS
+            }
+            # Mark the entry as recently used
+            os.utime(entry)
+        except (FileNotFoundError, ValueError):
+            # Missing, or removed while it was read
+            return None
+        if meta["key"] != json.loads(json.dumps(key)):
+            return None
+
+        grid_masks = GridMasks(meta["names"], **arrays)
+        self._loaded[digest] = grid_masks
+        return grid_masks
+
+    def put(self, key: dict, grid_masks: GridMasks) -> GridMasks:
+        """Store masks for the key and return the stored (memory mapped) masks"""
+        digest = _digest(key)
+        entry = self.path / digest
+        tmp = Path(tempfile.mkdtemp(prefix=f".{digest}-", dir=self.path))
+        try:
+            for name in _ARRAYS:
+                np.save(tmp / f"{name}.npy", getattr(grid_masks, name))
+            with open(tmp / "meta.json", "w") as f:
+                json.dump({"key": key, "names": grid_masks.names}, f)
+            os.rename(tmp, entry)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # Unless another process stored the same masks in the meantime
+            if not entry.exists():
+                logger.warning(f"Could not store grid masks in {self.path}: {e}")
+                return grid_masks
+
+        self._evict(keep=entry)
+        stored = self.get(key)
+        return grid_masks if stored is None else stored
+
+    def get_or_create(self, key: dict, create: Callable[[], GridMasks]) -> GridMasks:
+        """The cached masks for the key, created and stored if missing"""
+        grid_masks = self.get(key)
+        if grid_masks is None:
+            grid_masks = self.put(key, create())
+        return grid_masks
+
+    def _evict(self, keep: Path):
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append((entry.stat().st_mtime, _entry_size(entry), entry))
+            except FileNotFoundError:
+                pass
+        total = sum(size for _, size, _ in entries)
+        # Least recently used first
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            # Processes which mapped the entry keep their mapping
+            shutil.rmtree(entry, ignore_errors=True)
+            self._loaded.pop(entry.name, None)
+            total -= size
+
+    def clear(self):
+        """Remove all entries"""
+        for entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+        self._loaded = {}
+
+
+class MemoryGridCache:
+    def __init__(self, max_bytes: int = 256 * 2 ** 20):
+        """A cache of grid masks in memory of the current process
+
+        The cached masks are read-only.
+
+        Args:
+            max_bytes: When the masks exceed this size in bytes, the least
+                recently used masks are removed.
+        """
+        self.max_bytes = max_bytes
+        self._loaded = OrderedDict()
+
+    @property
+    def nbytes(self) -> int:
+        """Size of all cached masks in bytes"""
+        return sum(grid_masks.nbytes for grid_masks in self._loaded.values())
+
+    def get(self, key: dict) -> Optional[GridMasks]:
+        """The cached masks for the key or None"""
+        digest = _digest(key)
+        if digest not in self._loaded:
+            return None
+        self._loaded.move_to_end(digest)
+        return self._loaded[digest]
+
+    def put(self, key: dict, grid_masks: GridMasks) -> GridMasks:
+        """Store masks for the key and return them read-only"""
+        for name in _ARRAYS:
+            getattr(grid_masks, name).flags.writeable = False
+        self._loaded[_digest(key)] = grid_masks
+
+        total = self.nbytes
+        # Least recently used first, the new masks are kept
+        while total > self.max_bytes and len(self._loaded) > 1:
+            _, removed = self._loaded.popitem(last=False)
+            total -= removed.nbytes
+        return grid_masks
+
+    def get_or_create(self, key: dict, create: Callable[[], GridMasks]) -> GridMasks:
+        """The cached masks for the key, created and stored if missing"""
+        grid_masks = self.get(key)
+        if grid_masks is None:
+            grid_masks = self.put(key, create())
+        return grid_masks
+
+    def clear(self):
+        """Remove all masks"""
+        self._loaded.clear()
+
+
+_default_caches = {}
+_memory_cache = MemoryGridCache()
+
+
+def default_grid_cache() -> Union[GridCache, MemoryGridCache]:
+    """The cache in `config.grid_cache_dir`
+
+    A cache in memory of the current process if no directory is configured or
+    the cache can not be created.
+    """
+    cache = None
+    if config.grid_cache_dir is not None:
+        path = Path(config.grid_cache_dir).expanduser()
+        if path not in _default_caches:
+            try:
+                _default_caches[path] = GridCache(path)
+            except OSError as e:
+                logger.warning(
+                    f"Grid masks are cached in memory, {path} is not writable: {e}"
+                )
+                _default_caches[path] = None
+        cache = _default_caches[path]
+
+    if cache is None:
+        cache = _memory_cache
+    cache.max_bytes = config.grid_cache_size
+    return cache
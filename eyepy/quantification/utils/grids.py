@@ -5,41 +5,214 @@ from functools import lru_cache
 from typing import Iterable, Union, Optional, Tuple
 
 import numpy as np
-from skimage import transform
 
+from eyepy.quantification.utils.grid_cache import (
+    GridCache,
+    GridMasks,
+    MemoryGridCache,
+    default_grid_cache,
+)
 
 logger = logging.getLogger(__name__)
 
 Shape = Union[int, Tuple[int, int]]
 
 
-def circle_mask(radius, mask_shape=None, smooth_edges=False):
-    """Create a centered circular mask with given radius.
+def _center_offsets(mask_shape, center=None, mirror=False):
+    """Offsets of the pixel centers from the grid center.
+
+    x increases to the right and y upwards, such that angles are counted
+    counter-clockwise from the horizontal line on the right.
+
+    :param mask_shape: Shape of the mask (rows, columns)
+    :param center: Grid center (x, y) in pixel coordinates. Defaults to the
+        pixel at (columns // 2, rows // 2)
+    :param mirror: If True, x increases to the left
+    :return: x offsets of shape (1, columns) and y offsets of shape (rows, 1)
+    """
+    rows, cols = mask_shape
+    if center is None:
+        center = (cols // 2, rows // 2)
+    x = np.arange(cols) - center[0]
+    y = center[1] - np.arange(rows)
+    if mirror:
+        x = -x
+    return x[np.newaxis, :], y[:, np.newaxis]
+
+
+def _snap(coverage, tolerance=1e-9):
+    """Set coverages within tolerance of 0 or 1 to exactly 0 or 1 in place.
+
+    The analytic coverages leave rounding errors for pixels which are not cut
+    by any edge. Without snapping they would be stored as partial pixels.
+    """
+    np.clip(coverage, 0, 1, out=coverage)
+    coverage[coverage < tolerance] = 0
+    coverage[coverage > 1 - tolerance] = 1
+    return coverage
+
+
+def _disk_coverage(radius, x, y):
+    """Area of the unit pixel squares centered at (x, y) covered by a disk.
+
+    The disk is centered at the origin. The area is computed from the area of
+    the disk within the rectangles spanned by the origin and the pixel corners.
+
+    :param radius: Radius of the disk
+    :param x: x offsets of shape (1, columns)
+    :param y: y offsets of shape (rows, 1)
+    :return: Covered area of every pixel of shape (rows, columns)
+    """
+    coverage = np.zeros((y.shape[0], x.shape[1]))
+    # Only pixels within the bounding box of the disk can be covered
+    (rows,) = np.nonzero(np.abs(y[:, 0]) < radius + 1)
+    (cols,) = np.nonzero(np.abs(x[0, :]) < radius + 1)
+    if len(rows) == 0 or len(cols) == 0:
+        return coverage
+    rows = slice(rows[0], rows[-1] + 1)
+    cols = slice(cols[0], cols[-1] + 1)
+
+    def antiderivative(u):
+        # Area under the circle from 0 to u
+        return 0.5 * (
+            u * np.sqrt(radius ** 2 - u ** 2) + radius ** 2 * np.arcsin(u / radius)
+        )
+
+    def rectangle_area(u, v):
+        # Area of the disk within the rectangle spanned by (0, 0) and (u, v).
+        # The sign is negative if the rectangle is mirrored along one axis.
+        sign = np.sign(u) * np.sign(v)
+        u = np.minimum(np.abs(u), radius)
+        v = np.minimum(np.abs(v), radius)
+        # Up to u_v the disk covers the full height v
+        u_v = np.minimum(u, np.sqrt(radius ** 2 - v ** 2))
+        return sign * (u_v * v + antiderivative(u) - antiderivative(u_v))
+
+    x_edges = np.append(x[0, cols] - 0.5, x[0, cols][-1] + 0.5)
+    y_edges = np.append(y[rows, 0] + 0.5, y[rows, 0][-1] - 0.5)
+    area = rectangle_area(x_edges[np.newaxis, :], y_edges[:, np.newaxis])
+    coverage[rows, cols] = area[:-1, 1:] - area[:-1, :-1] - area[1:, 1:] + area[1:, :-1]
+    return _snap(coverage)
+
+
+def _halfplane_coverage(normal, x, y):
+    """Area of the unit pixel squares centered at (x, y) with normal · q >= 0.
+
+    The covered area is the cumulative distribution of normal · q for q
+    uniformly distributed in the pixel, which is a trapezoidal distribution.
+
+    :param normal: Unit normal (x, y) of the line through the origin
+    :param x: x offsets of shape (1, columns)
+    :param y: y offsets of shape (rows, 1)
+    :return: Covered area of every pixel of shape (rows, columns)
+    """
+    a, b = abs(normal[0]), abs(normal[1])
+    distance = normal[0] * x + normal[1] * y
+    width = (a + b) / 2
+    # Only pixels closer to the line than half their projected width are cut
+    coverage = (distance > 0).astype(float)
+    cut = np.abs(distance) < width
+    distance = distance[cut]
+
+    if min(a, b) < 1e-12:
+        # The line is parallel to the pixel edges
+        area = distance / max(a, b) + 0.5
+    else:
+        ramp = lambda t: np.maximum(t, 0) ** 2
+        area = (
+            ramp(distance + width)
+            - ramp(distance + width - a)
+            - ramp(distance + width - b)
+            + ramp(distance - width)
+        ) / (2 * a * b)
+    # Remove rounding errors, pixels cut by the line are identified by their
+    # fractional coverage
+    coverage[cut] = _snap(area)
+    return coverage
+
+
+def _clipped_square_area(x, y, normals):
+    """Area of the unit square centered at (x, y) with normal · q >= 0 for all normals."""
+    polygon = [
+        (x - 0.5, y - 0.5),
+        (x + 0.5, y - 0.5),
+        (x + 0.5, y + 0.5),
+        (x - 0.5, y + 0.5),
+    ]
+    for nx, ny in normals:
+        clipped = []
+        for (px, py), (qx, qy) in zip(polygon, polygon[1:] + polygon[:1]):
+            dp, dq = nx * px + ny * py, nx * qx + ny * qy
+            if dp >= 0:
+                clipped.append((px, py))
+            if (dp >= 0) != (dq >= 0):
+                t = dp / (dp - dq)
+                clipped.append((px + t * (qx - px), py + t * (qy - py)))
+        polygon = clipped
+        if not polygon:
+            return 0.0
+    xs, ys = np.array(polygon).T
+    return 0.5 * abs(np.dot(xs, np.roll(ys, -1)) - np.dot(ys, np.roll(xs, -1)))
+
+
+def _sector_coverage(start_angle, end_angle, x, y):
+    """Area of the unit pixel squares centered at (x, y) covered by a sector.
+
+    The sector spans counter-clockwise from start_angle to end_angle (in
+    degree) around the origin and is at most 180° wide. It is the intersection
+    of the half-planes left of the start ray and right of the end ray.
+
+    :param start_angle: Angle of the start ray
+    :param end_angle: Angle of the end ray
+    :param x: x offsets of shape (1, columns)
+    :param y: y offsets of shape (rows, 1)
+    :return: Covered area of every pixel of shape (rows, columns)
+    """
+    start, end = np.deg2rad(start_angle), np.deg2rad(end_angle)
+    normals = [(-np.sin(start), np.cos(start)), (np.sin(end), -np.cos(end))]
+    start_coverage = _halfplane_coverage(normals[0], x, y)
+    if np.isclose(end_angle - start_angle, 180):
+        # Both rays lie on the same line
+        return start_coverage
+    end_coverage = _halfplane_coverage(normals[1], x, y)
+
+    # Exact for pixels which are cut by at most one of the rays
+    coverage = start_coverage * end_coverage
+    # Pixels cut by both rays are close to the origin and clipped individually
+    cut = (0 < start_coverage) & (start_coverage < 1)
+    cut &= (0 < end_coverage) & (end_coverage < 1)
+    for row, col in zip(*np.nonzero(cut)):
+        coverage[row, col] = _clipped_square_area(x[0, col], y[row, 0], normals)
+    return _snap(coverage)
+
+
+def circle_mask(radius, mask_shape=None, smooth_edges=False, center=None):
+    """Create a circular mask with given radius.
 
     :param radius:
     :param mask_shape:
-    :param smooth_edges:
+    :param smooth_edges: If True, the mask contains the area of every pixel
+        covered by the circle
+    :param center: Center (x, y) of the circle in pixel coordinates. Defaults
+        to the center of the mask
     :return:
     """
     if mask_shape is None:
         mask_shape = (radius * 2, radius * 2)
 
+    x, y = _center_offsets(mask_shape, center)
     if smooth_edges:
-        work_shape = (mask_shape[0] * 5, mask_shape[1] * 5)
-        radius *= 5
-    else:
-        work_shape = mask_shape
-
-    circle_mask = np.zeros(work_shape)
-    circle_mask[
-        radius_filtergrid(work_shape, quadrant_shift=False, normalize=False) < radius
-    ] = 1
-
-    return transform.resize(circle_mask, mask_shape)
+        return _disk_coverage(radius, x, y)
+    return (x ** 2 + y ** 2 < radius ** 2).astype(float)
 
 
 def create_sectors(
-    mask_shape, n_sectors=4, start_angle=0, clockwise=False, smooth_edges=False
+    mask_shape,
+    n_sectors=4,
+    start_angle=0,
+    clockwise=False,
+    smooth_edges=False,
+    center=None,
 ):
     """Create masks for n radial sectors.
 
@@ -49,81 +222,53 @@ def create_sectors(
     For a binary mask pixels can not belong to two mask without changing the
     sum over all masks. But for pixels at the sector edges it is not clear to
     which sector they belong and assigning them to two sectors partially might
-    be desired. Hence if smooth_edges is True, we create 5 times bigger binary
-    masks and then use the anti-aliasing from downscaling them to the desired
-    shape to create a float mask.
+    be desired. Hence if smooth_edges is True, every mask contains the area of
+    the pixels covered by the sector, which is computed analytically.
 
     :param mask_shape:
     :param n_sectors:
     :param start_angle:
-    :param clockwise:
+    :param clockwise: If True, the sectors are the mirror image of counter
+        clockwise sectors starting at 180° - start_angle
     :param smooth_edges:
+    :param center: Center (x, y) of the sectors in pixel coordinates. Defaults
+        to the center of the mask
     :return:
     """
+    x, y = _center_offsets(mask_shape, center, mirror=clockwise)
+    if clockwise:
+        start_angle = 180 - start_angle
+    sector_size = 360 / n_sectors
+
     if smooth_edges:
-        work_shape = (mask_shape[0] * 5, mask_shape[1] * 5)
-    else:
-        work_shape = mask_shape
+        if n_sectors == 1:
+            return [np.ones(mask_shape)]
+        return [
+            _sector_coverage(
+                start_angle + i * sector_size, start_angle + (i + 1) * sector_size, x, y
+            )
+            for i in range(n_sectors)
+        ]
 
-    theta = theta_filtergrid(work_shape, quadrant_shift=False)
     # Convert from angles in radian range [-pi, +pi] to degree range [0, 360]
-    theta = theta / np.pi * 180
+    theta = np.arctan2(y, x) / np.pi * 180
     theta[np.where(theta < 0)] += 360
 
     masks = []
-    sector_size = 360 / n_sectors
     for i in range(n_sectors):
-        if clockwise:
-            theta = np.flip(theta, axis=1)
-            sector_start = start_angle - i * sector_size
-            sector_end = start_angle - (i + 1) * sector_size
-        else:
-            sector_start = start_angle + i * sector_size
-            sector_end = start_angle + (i + 1) * sector_size
-
-        sector_start = sector_start % 360
-        sector_end = sector_end % 360
-
-        mask = np.zeros(work_shape)
-        # Handle clockwise and counter-clockwise sector rotation
-        if clockwise:
+        sector_start = (start_angle + i * sector_size) % 360
+        sector_end = (start_angle + (i + 1) * sector_size) % 360
 
-            if sector_start > sector_end:
-                # If rotating clockwise the start angle is bigger than the end angle
-                selection = np.where(
-                    np.logical_and(theta <= sector_start, theta > sector_end)
-                )
-            else:
-                # If this is not the case, only the end angle has crossed the 0°
-                selection = np.where(
-                    np.logical_or(theta <= sector_start, theta > sector_end)
-                )
+        if sector_start < sector_end:
+            selection = np.logical_and(theta >= sector_start, theta < sector_end)
         else:
-            if sector_start < sector_end:
-                # If rotating counter-clockwise the start angle is smaller than the end
-                selection = np.where(
-                    np.logical_and(theta >= sector_start, theta < sector_end)
-                )
-            else:
-                # If this is not the case only the end angle has crossed the 360°
-                selection = np.where(
-                    np.logical_or(theta >= sector_start, theta < sector_end)
-                )
-
-        mask[selection] = 1
-
-        if smooth_edges:
-            mask = transform.resize(mask, mask_shape)
-
-        masks.append(mask)
+            # The end angle has crossed the 360°
+            selection = np.logical_or(theta >= sector_start, theta < sector_end)
+        masks.append(selection.astype(float))
 
     return masks
 
 
-import functools
-
-# Cache created grids. When quantifying many volumes you need the grid for both laterality and possibly different localizer sizes.
-@functools.lru_cache(8, typed=False)
 def create_grid_regions(
     mask_shape: tuple,
     radii: tuple,
@@ -131,6 +276,7 @@ def create_grid_regions(
     offsets: tuple,
     clockwise: bool,
     smooth_edges: bool = False,
+    center: Optional[tuple] = None,
 ) -> list:
     """Create sectorized circular region masks.
 
@@ -148,12 +294,13 @@ def create_grid_regions(
     :param offsets: Angular offset of first sector corresponding to the radii
     :param clockwise: If True sectors are added clockwise starting from the start_angles
     :param smooth_edges: If True, compute non binary masks where edges might be shared between adjacent regions
+    :param center: Center (x, y) of the regions in pixel coordinates
     :return:
     """
     # Create circles
     circles = []
     for radius in radii:
-        circles.append(circle_mask(radius, mask_shape, smooth_edges))
+        circles.append(circle_mask(radius, mask_shape, smooth_edges, center))
 
     level_sector_parts = []
     for n_sec, start_angle in zip(n_sectors, offsets):
@@ -165,6 +312,7 @@ def create_grid_regions(
                     start_angle=start_angle,
                     clockwise=clockwise,
                     smooth_edges=smooth_edges,
+                    center=center,
                 )
             )
 
@@ -182,41 +330,23 @@ def create_grid_regions(
     all_masks = []
     for cir, sectors in pairs:
         for sec in sectors:
-            all_masks.append(cir * sec)
+            mask = cir * sec
+            if smooth_edges:
+                # Differences and products of coverages add rounding errors
+                mask = _snap(mask)
+            all_masks.append(mask)
 
     return all_masks
 
 
-def grid(
-    mask_shape: tuple,
-    radii: Union[Iterable, int, float],
-    laterality: str,
-    n_sectors: Optional[Union[Iterable, int, float]] = 1,
-    offsets: Optional[Union[Iterable, int, float]] = 0,
-    center: Optional[tuple] = None,
-    smooth_edges: bool = False,
-    radii_scale: Union[int, float] = 1,
-):
-    """Create a quantification grid
-
-    :param mask_shape: Output shape of the computed masks
-    :param radii: Ascending radii of the circular regions in pixels
-    :param laterality: OD/OS depending for which eye to compute the grid
-    :param n_sectors: Number of sectors corresponding to the radii
-    :param offsets: Sector offsets from the horizonal line on the nasal side in degree
-    :param center: Center location of the computed masks
-    :param smooth_edges: If True, compute non binary masks where edges might be shared between adjacent regions
-    :param radii_scale:
-    :return:
-    """
+def _grid_parameters(radii, n_sectors, offsets):
+    """Radii, number of sectors and offsets as lists of equal length."""
     # Make sure radii, n_sectors and offsets are lists even if you get numbers or tuples
     if type(radii) in [int, float]:
         radii = [radii]
     radii = list(radii)
     if not sorted(radii) == radii:
         raise ValueError("radii have to be given in ascending order")
-    input_radii = radii
-    radii = [r / radii_scale for r in radii]
 
     if type(n_sectors) in [int, float]:
         n_sectors = [n_sectors]
@@ -229,44 +359,178 @@ def grid(
     offsets = list(offsets)
     if len(offsets) == 1:
         offsets = offsets * len(radii)
+    return radii, n_sectors, offsets
 
-    clockwise = False
-    masks = create_grid_regions(
-        mask_shape,
-        tuple(radii),
-        tuple(n_sectors),
-        tuple(offsets),
-        clockwise,
-        smooth_edges,
-    )
 
+def _region_names(radii, n_sectors):
     names = []
-    radii = [0.0] + radii
-    input_radii = [0] + input_radii
-    for i, r in enumerate(radii):
-        if i + 1 >= len(radii):
-            break
+    bounds = [0] + radii
+    for i in range(len(radii)):
         for s in range(n_sectors[i]):
-            names.append(f"Radius: {input_radii[i]}-{input_radii[i+1]} Sector: {s}")
+            names.append(f"Radius: {bounds[i]}-{bounds[i+1]} Sector: {s}")
+    return names
 
-    masks = {name: mask for name, mask in zip(names, masks)}
-    if laterality == "OS":
-        masks = {name: np.flip(m, axis=1) for name, m in masks.items()}
-    elif laterality == "OD":
-        pass
-    else:
+
+def grid_masks(
+    mask_shape: tuple,
+    radii: Union[Iterable, int, float],
+    laterality: str,
+    n_sectors: Optional[Union[Iterable, int, float]] = 1,
+    offsets: Optional[Union[Iterable, int, float]] = 0,
+    center: Optional[tuple] = None,
+    smooth_edges: bool = False,
+    radii_scale: Union[int, float] = 1,
+    cache: Union[GridCache, MemoryGridCache, bool] = True,
+) -> GridMasks:
+    """Create the masks of a quantification grid in compact form
+
+    See `grid` for the parameters. The masks are read-only.
+
+    :param cache: Cache for the masks. If True, the cache in
+        `eyepy.config.grid_cache_dir` is used if a directory is configured,
+        otherwise the masks are cached in memory. If False, the masks are not
+        cached.
+    :return:
+    """
+    radii, n_sectors, offsets = _grid_parameters(radii, n_sectors, offsets)
+    input_radii = radii
+    radii = [r / radii_scale for r in radii]
+
+    if laterality not in ["OD", "OS"]:
         raise ValueError("laterality has to be one of OD/OS")
 
     if center is not None:
-        translation = transform.AffineTransform(
-            translation=np.array(center) - np.array(mask_shape) / 2
+        center = tuple(float(c) for c in center)
+
+    def create():
+        if laterality == "OD":
+            clockwise, start_angles = False, offsets
+        else:
+            # The OS grid is the mirror image of the OD grid, with sectors added
+            # clockwise starting from the horizontal line on the nasal (left) side
+            clockwise, start_angles = True, [180 - o for o in offsets]
+
+        masks = create_grid_regions(
+            mask_shape,
+            tuple(radii),
+            tuple(n_sectors),
+            tuple(start_angles),
+            clockwise,
+            smooth_edges,
+            center,
         )
-        masks = {
-            name: transform.warp(masks[name], translation.inverse)
-            for name in masks.keys()
-        }
 
-    return masks
+        names = _region_names(input_radii, n_sectors)
+        return GridMasks.from_masks({name: m for name, m in zip(names, masks)})
+
+    if cache is True:
+        cache = default_grid_cache()
+    if not cache:
+        return create()
+
+    key = {
+        "mask_shape": [int(s) for s in mask_shape],
+        "radii": [float(r) for r in input_radii],
+        "radii_scale": float(radii_scale),
+        "laterality": laterality,
+        "n_sectors": [int(n) for n in n_sectors],
+        "offsets": [float(o) for o in offsets],
+        "center": center,
+        "smooth_edges": smooth_edges,
+    }
+    return cache.get_or_create(key, create)
+
+
+def grid(
+    mask_shape: tuple,
+    radii: Union[Iterable, int, float],
+    laterality: str,
+    n_sectors: Optional[Union[Iterable, int, float]] = 1,
+    offsets: Optional[Union[Iterable, int, float]] = 0,
+    center: Optional[tuple] = None,
+    smooth_edges: bool = False,
+    radii_scale: Union[int, float] = 1,
+    cache: Union[GridCache, MemoryGridCache, bool] = True,
+):
+    """Create a quantification grid
+
+    :param mask_shape: Output shape of the computed masks
+    :param radii: Ascending radii of the circular regions in pixels
+    :param laterality: OD/OS depending for which eye to compute the grid
+    :param n_sectors: Number of sectors corresponding to the radii
+    :param offsets: Sector offsets from the horizonal line on the nasal side in degree
+    :param center: Center (x, y) of the grid in pixel coordinates. Defaults to the center of the mask
+    :param smooth_edges: If True, compute non binary masks where edges might be shared between adjacent regions
+    :param radii_scale:
+    :param cache: Cache for the masks, see `grid_masks`
+    :return: The masks by region name. They are newly created and can be modified.
+    """
+    return grid_masks(
+        mask_shape,
+        radii,
+        laterality,
+        n_sectors,
+        offsets,
+        center,
+        smooth_edges,
+        radii_scale,
+        cache,
+    ).to_masks()
+
+
+def grid_regions(
+    x: np.ndarray,
+    y: np.ndarray,
+    mask_shape: tuple,
+    radii: Union[Iterable, int, float],
+    laterality: str,
+    n_sectors: Optional[Union[Iterable, int, float]] = 1,
+    offsets: Optional[Union[Iterable, int, float]] = 0,
+    center: Optional[tuple] = None,
+    radii_scale: Union[int, float] = 1,
+):
+    """Find the grid regions of points
+
+    This evaluates the binary grid of `grid` at arbitrary points instead of
+    pixel centers, for example at positions of A-scans on the localizer.
+
+    :param x: x coordinates (columns) of the points in pixel coordinates of the grid
+    :param y: y coordinates (rows) of the points
+    :param mask_shape: Shape of the masks the grid is defined for
+    :param radii: See `grid` for this and the remaining parameters
+    :param laterality:
+    :param n_sectors:
+    :param offsets:
+    :param center:
+    :param radii_scale:
+    :return: The region names and the index of the region of every point, which is -1 for points outside of the grid
+    """
+    radii, n_sectors, offsets = _grid_parameters(radii, n_sectors, offsets)
+    if laterality not in ["OD", "OS"]:
+        raise ValueError("laterality has to be one of OD/OS")
+    if center is None:
+        center = (mask_shape[1] // 2, mask_shape[0] // 2)
+
+    dx = np.asarray(x) - center[0]
+    dy = center[1] - np.asarray(y)
+    if laterality == "OS":
+        # The OS grid is the mirror image of the OD grid
+        dx = -dx
+    distance = dx ** 2 + dy ** 2
+    theta = np.arctan2(dy, dx) / np.pi * 180
+    theta[theta < 0] += 360
+
+    regions = np.full(distance.shape, -1, dtype=np.int64)
+    first_region, inner = 0, 0
+    for radius, n_sec, offset in zip(radii, n_sectors, offsets):
+        radius = radius / radii_scale
+        ring = np.logical_and(distance >= inner ** 2, distance < radius ** 2)
+        sector = ((theta[ring] - offset) % 360 // (360 / n_sec)).astype(np.int64)
+        regions[ring] = first_region + np.minimum(sector, n_sec - 1)
+        first_region += n_sec
+        inner = radius
+
+    return _region_names(radii, n_sectors), regions
 
 
 # # Todo
@@ -0,0 +1,10 @@
+import pytest
+
+from eyepy import config
+
+
+@pytest.fixture(autouse=True)
+def grid_cache_dir(tmp_path, monkeypatch):
+    # Grid masks are cached in a temporary directory instead of the user's cache
+    monkeypatch.setattr(config, "grid_cache_dir", str(tmp_path / "grids"))
+    return tmp_path / "grids"
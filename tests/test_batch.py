@@ -0,0 +1,105 @@
+import csv
+
+import numpy as np
+import pytest
+
+import eyepy as ep
+from eyepy.batch import BatchRunner, CheckLayers, ImportVolume, Quantify
+
+
+def make_archive(path, seed, layers=("RPE", "BM")):
+    rng = np.random.default_rng(seed)
+    volume = ep.EyeVolume(data=rng.integers(0, 255, (8, 60, 40), dtype=np.uint8))
+    volume.meta.update(patient_id=f"p{seed}", laterality="OD")
+    bm = np.full((8, 40), 50.0) + rng.uniform(-0.4, 0.4, (8, 40))
+    rpe = bm - 5
+    rpe[4:6, 10:20] -= np.array([2, 4, 6, 8, 9, 9, 8, 6, 4, 2])
+    heights = {"RPE": rpe, "BM": bm}
+    for name in layers:
+        volume.add_layer(name, heights[name])
+    volume.save(path)
+    return path
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return {row["path"]: row for row in csv.DictReader(f)}
+
+
+def test_batch_runner(tmp_path):
+    paths = [make_archive(tmp_path / f"volume{i}.eye", i) for i in range(3)]
+    paths.append(make_archive(tmp_path / "no_rpe.eye", 3, layers=["BM"]))
+    output = tmp_path / "results.csv"
+
+    with BatchRunner(output, max_workers=2) as runner:
+        assert runner.run(tmp_path / "*.eye") == {
+            "processed": 3,
+            "failed": 1,
+            "skipped": 0,
+        }
+    rows = read_rows(output)
+    assert len(rows) == 4
+    assert "RPE is missing" in rows[str(paths[3].resolve())]["error"]
+
+    # Reference computed in this process
+    volume = ep.EyeVolume.load(paths[0])
+    volume.set_volume_map(
+        "drusen",
+        ep.drusen(volume.layers["RPE"].data, volume.layers["BM"].data, volume.shape),
+    )
+    reference = volume.volume_maps["drusen"].quantification
+    row = rows[str(paths[0].resolve())]
+    assert row["error"] == ""
+    assert row["patient_id"] == "p0"
+    assert float(row["drusen Total [mm³]"]) == pytest.approx(reference["Total [mm³]"])
+
+    # Resume after an interruption: only files without checkpoint are processed
+    with BatchRunner(output, max_workers=0) as runner:
+        with runner._connection:
+            runner._connection.execute(
+                "DELETE FROM checkpoints WHERE path = ?", (str(paths[1].resolve()),)
+            )
+        assert runner.run(tmp_path / "*.eye") == {
+            "processed": 1,
+            "failed": 0,
+            "skipped": 3,
+        }
+    assert read_rows(output) == rows
+
+    # Failed files are only retried on request, with other stages here
+    stages = [ImportVolume(), CheckLayers(["BM"]), Quantify()]
+    with BatchRunner(output, stages, max_workers=0) as runner:
+        assert runner.run(paths, retry_failed=True)["processed"] == 1
+    rows = read_rows(output)
+    assert rows[str(paths[3].resolve())]["error"] == ""
+    assert rows[str(paths[3].resolve())]["BM missing"] == "0.0"
+
+    # Archives in directories are found, inaccessible inputs fail individually
+    missing = tmp_path / "missing.eye"
+    with BatchRunner(output, stages, max_workers=0) as runner:
+        assert runner.run(tmp_path)["skipped"] == 4
+        assert runner.run(paths + [missing]) == {
+            "processed": 0,
+            "failed": 1,
+            "skipped": 4,
+        }
+    assert "FileNotFoundError" in read_rows(output)[str(missing)]["error"]
+
+
+def test_batch_runner_empty_glob(tmp_path, caplog):
+    with BatchRunner(tmp_path / "results.csv", max_workers=0) as runner:
+        assert runner.run(tmp_path / "*.vol")["processed"] == 0
+    assert "No inputs match" in caplog.text
+
+
+def test_batch_runner_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    paths = [make_archive(tmp_path / f"volume{i}.eye", i) for i in range(2)]
+    output = tmp_path / "results.parquet"
+
+    with BatchRunner(output, max_workers=0) as runner:
+        runner.run(paths)
+    table = pq.read_table(output).to_pydict()
+    assert table["path"] == [str(p.resolve()) for p in paths]
+    assert table["error"] == [None, None]
+    assert all(v > 0 for v in table["drusen Total [mm³]"])
@@ -0,0 +1,60 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+import eyepy as ep
+from eyepy.io.cohort import CohortStore
+
+
+def make_volume(seed, patient_id, laterality):
+    rng = np.random.default_rng(seed)
+    volume = ep.EyeVolume(data=rng.integers(0, 255, (4, 16, 20), dtype=np.uint8))
+    volume.meta["patient_id"] = patient_id
+    volume.meta["visit_date"] = datetime(2021, 5, seed + 1, 10, 30)
+    volume.meta["laterality"] = laterality
+    volume.add_layer("BM", rng.uniform(5, 10, (4, 20)))
+    volume.set_volume_map("drusen", rng.random((4, 16, 20)) > 0.8)
+    return volume
+
+
+def test_cohort_store(tmp_path):
+    volumes = [
+        make_volume(0, "p1", "OD"),
+        make_volume(1, "p1", "OS"),
+        make_volume(2, "p2", "OD"),
+    ]
+    with CohortStore(tmp_path / "cohort", shard_size=4000) as store:
+        ids = [store.append(v) for v in volumes]
+        assert len(store) == 3
+
+    # Small shards force a new shard file for every volume
+    assert len(list((tmp_path / "cohort").glob("shard-*.bin"))) == 3
+
+    with CohortStore(tmp_path / "cohort") as store:
+        assert ("p1", date(2021, 5, 2), "OS") in store
+        assert store.lookup("p2", "2021-05-03", "OD") == [ids[2]]
+
+        loaded = store["p1", date(2021, 5, 2), "OS"]
+        assert isinstance(loaded._raw_data, np.memmap)
+        assert np.array_equal(loaded.data, volumes[1].data)
+        assert np.allclose(loaded.layers["BM"].data, volumes[1].layers["BM"].data)
+        assert np.array_equal(
+            loaded.volume_maps["drusen"].data, volumes[1].volume_maps["drusen"].data
+        )
+        assert loaded.meta["visit_date"] == volumes[1].meta["visit_date"]
+
+        with pytest.raises(KeyError):
+            store["p3", "2021-05-01", "OD"]
+
+
+def test_cohort_store_numeric_patient_id(tmp_path):
+    with CohortStore(tmp_path / "cohort") as store:
+        record_id = store.append(make_volume(0, 17, "OD"))
+        # Patient ids are stored as text, lookups convert them the same way
+        assert (17, "2021-05-01", "OD") in store
+        assert ("17", "2021-05-01", "OD") in store
+        assert store.lookup(17, "2021-05-01", "OD") == [record_id]
+
+    with CohortStore(tmp_path / "cohort") as store:
+        assert store.lookup(17, "2021-05-01", "OD") == [record_id]
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+import eyepy as ep
+from eyepy.core.voxelmaps import IntervalVoxelMap
+from eyepy.quantification.utils.filter import filter_by_height_enface
+
+
+def legacy_drusen_map(rpe_height, idealrpe, volume_shape):
+    # Reference implementation of the drusen map before the interval map
+    drusen_map = np.zeros(volume_shape, dtype=bool)
+    rpe = np.flip((rpe_height + 1).astype(int), axis=0)
+    irpe = np.flip(idealrpe.astype(int), axis=0)
+    for sli in range(drusen_map.shape[0]):
+        for col in range(drusen_map.shape[2]):
+            if not rpe[sli, col] == -9223372036854775808:
+                drusen_map[sli, rpe[sli, col] : irpe[sli, col], col] = 1
+    return drusen_map
+
+
+@pytest.fixture(scope="module")
+def layers():
+    rng = np.random.default_rng(4)
+    shape = (8, 60, 40)
+    bm = np.full((shape[0], shape[2]), 50.0) + rng.uniform(-0.4, 0.4, (8, 40))
+    rpe = bm - 5
+    # Drusen of different heights
+    rpe[1:3, 5:9] -= 1
+    rpe[4:6, 10:20] -= np.array([2, 4, 6, 8, 9, 9, 8, 6, 4, 2])
+    rpe[7, 30:33] -= 3
+    rpe[0, 0] = np.nan
+    return rpe, bm, shape
+
+
+def test_drusen_interval_map(layers):
+    rpe, bm, shape = layers
+    drusen_map = ep.drusen(rpe, bm, shape, minimum_height=0)
+    assert isinstance(drusen_map, IntervalVoxelMap)
+
+    idealrpe = ep.quantification._drusen.ideal_rpe(rpe, bm, shape)
+    expected = legacy_drusen_map(rpe, idealrpe, shape)
+    assert np.array_equal(np.asarray(drusen_map), expected)
+    assert np.array_equal(drusen_map.projection(), expected.sum(axis=1))
+
+
+@pytest.mark.parametrize("minimum_height", [0, 2, 5])
+def test_filter_by_height_enface(layers, minimum_height):
+    rpe, bm, shape = layers
+    drusen_map = ep.drusen(rpe, bm, shape, minimum_height=0)
+    dense = np.asarray(drusen_map)
+
+    filtered = filter_by_height_enface(drusen_map, minimum_height)
+    assert isinstance(filtered, IntervalVoxelMap)
+    assert np.array_equal(
+        np.asarray(filtered), filter_by_height_enface(dense, minimum_height)
+    )
+    assert np.array_equal(
+        np.asarray(ep.drusen(rpe, bm, shape, minimum_height)), np.asarray(filtered)
+    )
+
+
+def test_drusen_edge_cases():
+    # Bounds outside of the B-scan, negative bounds and NaNs are handled like
+    # the slices of the previous implementation
+    rng = np.random.default_rng(5)
+    shape = (6, 30, 25)
+    rpe = rng.uniform(-40, 40, (6, 25))
+    idealrpe = rng.uniform(-40, 40, (6, 25))
+    rpe[0, :5] = np.nan
+    idealrpe[1, :5] = np.nan
+
+    from eyepy.quantification._drusen import _slice_bounds
+
+    top, bottom = _slice_bounds(
+        np.flip(rpe + 1, axis=0), np.flip(idealrpe, axis=0), shape[1]
+    )
+    drusen_map = IntervalVoxelMap(top, bottom, shape[1])
+    with np.errstate(invalid="ignore"):
+        expected = legacy_drusen_map(rpe, idealrpe, shape)
+    assert np.array_equal(np.asarray(drusen_map), expected)
+    assert np.array_equal(drusen_map[2], expected[2])
+
+
+def test_incremental_drusen(layers):
+    from eyepy.quantification import IncrementalDrusen
+
+    rpe, bm, shape = layers
+    volume = ep.EyeVolume(data=np.zeros(shape))
+    volume.add_layer("RPE", rpe.copy())
+    volume.add_layer("BM", bm.copy())
+    tracker = IncrementalDrusen(volume, minimum_height=3)
+
+    def expected():
+        return np.asarray(
+            ep.drusen(volume.layers["RPE"], volume.layers["BM"], shape, 3)
+        )
+
+    assert np.array_equal(np.asarray(volume.volume_maps["drusen"].data), expected())
+    annotation = volume.volume_maps["drusen"]
+
+    # Grow a drusen, merge two drusen, remove a drusen and add one in B-scans
+    # given from the first (bottom row of the layer) to the last
+    edits = [(3, 10, 20, 8), (2, 5, 30, 4), (7, 0, 40, 0), (0, 35, 38, 6)]
+    for bscan_index, start, stop, height in edits:
+        heights = volume[bscan_index].layers["BM"] - 5
+        heights[start:stop] -= height
+        volume[bscan_index].layers["RPE"] = heights
+        # The map was updated incrementally
+        assert volume.volume_maps["drusen"] is annotation
+        assert np.array_equal(np.asarray(tracker.drusen_map), expected())
+
+    # Labels of replaced components are reused
+    n_labels = len(tracker._max_heights)
+    for height in [4, 0, 4, 0, 4, 0]:
+        heights = volume[2].layers["BM"] - 5
+        heights[5:30:3] -= height
+        volume[2].layers["RPE"] = heights
+        assert np.array_equal(np.asarray(tracker.drusen_map), expected())
+    assert len(tracker._max_heights) <= n_labels + 9
+
+    # Random RPE and BM edits, which may or may not change the ideal RPE
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        bscan_index = rng.integers(shape[0])
+        start = rng.integers(shape[2])
+        heights = np.round(volume[bscan_index].layers["BM"] - 5)
+        heights[start : start + rng.integers(1, 15)] -= rng.integers(0, 7)
+        if rng.uniform() < 0.5:
+            volume[bscan_index].layers["RPE"] = heights
+        else:
+            volume[bscan_index].layers["BM"] = np.round(heights + 5)
+        assert np.array_equal(np.asarray(tracker.drusen_map), expected())
+
+    # Replacing a layer triggers a complete recomputation
+    volume.add_layer("RPE", rpe.copy())
+    assert np.array_equal(np.asarray(tracker.drusen_map), expected())
+
+    tracker.detach()
+    volume[3].layers["RPE"] = volume[3].layers["BM"] - 20
+    assert not np.array_equal(np.asarray(tracker.drusen_map), expected())
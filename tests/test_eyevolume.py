@@ -59,3 +59,156 @@ def test_set_layers_on_eyebscan(eyevolume):
     assert np.sum(~np.isnan(eyevolume.layers["bscan_layer"].data)) == 100
     assert eyevolume.layers["bscan_layer"].data[-(5 + 1)][0] == 240
     assert np.all(np.isnan(eyevolume.layers["bscan_layer"].data[0]))
+
+
+def test_bscan_cache():
+    raw = np.random.random((10, 50, 100))
+    cached = ep.EyeVolume(
+        data=raw,
+        localizer=ep.EyeEnface(np.zeros((100, 100)), meta=None),
+        bscan_cache_size=2 * raw[0].nbytes,
+    )
+    calls = []
+
+    def transform(x):
+        calls.append(x.shape)
+        return x * 2
+
+    cached.set_intensity_transform(transform)
+    assert cached.shape == (10, 50, 100)
+    assert len(cached) == 10
+    assert cached[3].shape == (50, 100)
+    assert calls == []
+
+    assert np.allclose(cached[3].data, raw[3] * 2)
+    assert cached[3].data is cached[3].data
+    cached[4].data, cached[5].data
+    assert calls == [(50, 100)] * 3
+    # B-scan 3 was evicted
+    cached[3].data
+    assert len(calls) == 4
+
+    assert np.allclose(cached.data, raw * 2)
+    assert calls[-1] == (10, 50, 100)
+
+
+def test_volume_map_cache():
+    from skimage import transform
+
+    volume = ep.EyeVolume(data=np.random.random((10, 50, 100)))
+    volume.set_volume_map("map", np.random.random((10, 50, 100)) > 0.5)
+    voxel_map = volume.volume_maps["map"]
+
+    projection, enface = voxel_map.projection, voxel_map.enface
+    assert voxel_map.projection is projection
+    assert voxel_map.enface is enface
+    assert not projection.flags.writeable
+
+    voxel_map.data[0] = False
+    voxel_map.mark_dirty(0)
+    assert voxel_map.projection is not projection
+    assert np.all(voxel_map.projection[-1] == 0)
+
+    projection, enface = voxel_map.projection, voxel_map.enface
+    volume.localizer_transform = transform.AffineTransform(
+        volume.localizer_transform.params
+    )
+    assert voxel_map.projection is projection
+    assert voxel_map.enface is not enface
+    assert np.array_equal(voxel_map.enface, enface)
+
+
+def test_warp_projections():
+    from skimage import transform
+
+    volume = ep.EyeVolume(data=np.random.random((10, 50, 100)))
+    volume.localizer_transform = transform.AffineTransform(
+        scale=(1.1, 9), rotation=0.2, translation=(5, -3)
+    )
+    projections = np.random.randint(0, 50, size=(3, 10, 100))
+
+    warped = volume.warp_projections(projections)
+    shape = volume.localizer.shape
+    for projection, enface in zip(projections, warped):
+        reference = transform.warp(
+            projection,
+            volume.localizer_transform.inverse,
+            output_shape=shape,
+            order=0,
+            preserve_range=True,
+        )
+        assert np.array_equal(enface, reference)
+
+    linear = volume.warp_projections(projections[:1], order=1)
+    assert np.allclose(
+        linear[0],
+        transform.warp(
+            projections[0].astype(float),
+            volume.localizer_transform.inverse,
+            output_shape=shape,
+        ),
+    )
+
+    assert volume._warp_maps
+    volume.localizer_transform = transform.AffineTransform()
+    assert not volume._warp_maps
+
+
+def test_eyedata_does_not_modify_volume():
+    from eyepy.core.eyedata import EyeData
+
+    volume = ep.EyeVolume(data=np.random.random((10, 50, 100)))
+    volume.set_volume_map("drusen", np.random.random((10, 50, 100)) > 0.5)
+    localizer, transform = volume.localizer, volume.localizer_transform
+
+    eyedata = EyeData(volume, None, None)
+    assert volume.localizer is localizer
+    assert volume.localizer_transform is transform
+    assert eyedata.localizer_transformation is transform
+    assert eyedata.drusen_enface is volume.volume_maps["drusen"].enface
+    with pytest.raises(AttributeError):
+        eyedata.localizer_transformation = transform.inverse
+
+
+def test_quantify_volume_maps():
+    volume = ep.EyeVolume(data=np.random.random((10, 50, 100)))
+    volume.meta["laterality"] = "OD"
+    for i in range(3):
+        volume.set_volume_map(f"map{i}", np.random.random((10, 50, 100)) > 0.5)
+    volume.volume_maps["map2"].radii = (1, 2)
+
+    results = volume.quantify()
+    assert set(results) == {"map0", "map1", "map2"}
+    for name, result in results.items():
+        voxel_map = volume.volume_maps[name]
+        assert voxel_map.quantification is result
+        # Reference: sum of the enface projection within every mask
+        for mask_name, mask in voxel_map.masks.items():
+            reference = (voxel_map.enface * mask).sum()
+            reference *= result["Total [mm³]"] / voxel_map.enface.sum()
+            assert result[f"{mask_name} [mm³]"] == pytest.approx(reference)
+
+
+def test_quantify_oct_space():
+    # 25 B-scans with 100 A-scans, the default transform maps the first and
+    # last A-scan centers to the corners of a 100 x 100 pixel localizer
+    volume = ep.EyeVolume(data=np.zeros((25, 10, 100)))
+    volume.meta.update(
+        scale_x=0.04, scale_z=0.04 * 99 / 24, scale_y=0.01, laterality="OD"
+    )
+    volume.localizer = volume._default_localizer(volume.data)
+    volume.set_volume_map("map", np.ones((25, 10, 100), dtype=bool))
+    voxel_map = volume.volume_maps["map"]
+    voxel_map.radii = (0.5, 1.5)
+
+    result = voxel_map.quantify("oct")
+    assert volume.quantify(space="oct")["map"] is result
+    assert result["Total [mm³]"] == pytest.approx(4 * 0.04 * 103.125 * 0.1)
+    # Volume of a column with a height of 0.1 mm on the region
+    assert result["Radius: 0-0.5 Sector: 0 [mm³]"] == pytest.approx(
+        np.pi * 0.5 ** 2 * 0.1, rel=0.01
+    )
+    for sector in range(4):
+        assert result[f"Radius: 0.5-1.5 Sector: {sector} [mm³]"] == pytest.approx(
+            np.pi * (1.5 ** 2 - 0.5 ** 2) / 4 * 0.1, rel=0.01
+        )
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from eyepy.quantification.utils.filter import filter_by_depth, filter_by_height_enface
+
+
+@pytest.fixture(scope="module")
+def drusen_map():
+    # Many small components
+    rng = np.random.default_rng(6)
+    return rng.random((12, 6, 40)) > 0.92
+
+
+def test_filter_by_height_enface(drusen_map):
+    projection = drusen_map.sum(axis=1)
+    labels, n = ndimage.label(projection != 0)
+    assert n > 20
+    expected = drusen_map.copy()
+    for label in range(1, n + 1):
+        component = labels == label
+        if projection[component].max() < 3:
+            expected[np.nonzero(component)[0], :, np.nonzero(component)[1]] = False
+    assert np.array_equal(filter_by_height_enface(drusen_map, 3), expected)
+
+
+def test_filter_by_depth(drusen_map):
+    labels, n = ndimage.label(drusen_map)
+    assert n > 20
+    expected = drusen_map.copy()
+    for label in range(1, n + 1):
+        component = labels == label
+        if component.sum(axis=0).max() < 2:
+            expected[component] = False
+    assert np.array_equal(filter_by_depth(drusen_map, 2), expected)
+    assert not filter_by_depth(np.zeros((2, 3, 4), dtype=bool)).any()
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from eyepy.quantification.utils.grids import circle_mask, create_sectors, grid
+
+
+def supersampled(inside, mask_shape, center, factor=64):
+    """Fraction of sub-pixel centers for which inside(x, y) is True."""
+    offsets = (np.arange(factor) + 0.5) / factor - 0.5
+    rows = (np.arange(mask_shape[0])[:, None] + offsets).ravel()
+    cols = (np.arange(mask_shape[1])[:, None] + offsets).ravel()
+    x, y = cols[None, :] - center[0], center[1] - rows[:, None]
+    hits = inside(x, y).reshape(mask_shape[0], factor, mask_shape[1], factor)
+    return hits.mean(axis=(1, 3))
+
+
+def test_circle_coverage():
+    center = (9.3, 10.6)
+    mask = circle_mask(6.2, (20, 20), smooth_edges=True, center=center)
+    assert mask.sum() == pytest.approx(np.pi * 6.2 ** 2)
+    reference = supersampled(lambda x, y: x ** 2 + y ** 2 < 6.2 ** 2, (20, 20), center)
+    assert np.allclose(mask, reference, atol=0.02)
+
+
+@pytest.mark.parametrize("n_sectors, start_angle", [(4, 45), (3, 10), (2, 0)])
+def test_sector_coverage(n_sectors, start_angle):
+    center = (9.3, 10.6)
+    masks = create_sectors(
+        (20, 20), n_sectors, start_angle, smooth_edges=True, center=center
+    )
+    assert np.allclose(np.sum(masks, axis=0), 1)
+
+    size = 360 / n_sectors
+    for i, mask in enumerate(masks):
+        start = start_angle + i * size
+
+        def inside(x, y):
+            return (np.degrees(np.arctan2(y, x)) - start) % 360 < size
+
+        reference = supersampled(inside, (20, 20), center)
+        assert np.allclose(mask, reference, atol=0.02)
+
+
+def test_grid_laterality():
+    kwargs = dict(radii=(3, 6), n_sectors=(1, 4), offsets=(0, 30))
+    od = grid((21, 21), laterality="OD", **kwargs)
+    os = grid((21, 21), laterality="OS", **kwargs)
+    for name in od:
+        assert np.array_equal(os[name], np.flip(od[name], axis=1))
+
+
+def test_grid_cache(tmp_path):
+    from eyepy.quantification.utils.grid_cache import GridCache
+
+    kwargs = dict(radii=(3, 6), n_sectors=(1, 4), offsets=(0, 45), smooth_edges=True)
+    reference = grid((21, 21), laterality="OD", cache=False, **kwargs)
+    cache = GridCache(tmp_path)
+    masks = grid((21, 21), laterality="OD", cache=cache, **kwargs)
+    masks["Radius: 0-3 Sector: 0"][:] = 0
+
+    # A new cache on the same directory loads the stored masks
+    cache = GridCache(tmp_path, max_bytes=int(1.5 * cache.nbytes))
+    for name, mask in grid((21, 21), laterality="OD", cache=cache, **kwargs).items():
+        assert np.array_equal(mask, reference[name])
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # Least recently used grids are removed when the cache is too large
+    grid((21, 21), laterality="OS", cache=cache, **kwargs)
+    assert len(list(tmp_path.iterdir())) == 1
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_memory_grid_cache():
+    from eyepy.quantification.utils.grid_cache import MemoryGridCache
+    from eyepy.quantification.utils.grids import grid_masks
+
+    kwargs = dict(radii=(3, 6), n_sectors=(1, 4), offsets=(0, 45))
+    # Without a cache directory, masks are cached in memory by default
+    masks = grid_masks((21, 21), laterality="OD", **kwargs)
+    assert grid_masks((21, 21), laterality="OD", **kwargs) is masks
+    assert not masks.labels.flags.writeable
+
+    cache = MemoryGridCache()
+    od = grid_masks((21, 21), laterality="OD", cache=cache, **kwargs)
+    cache.max_bytes = int(1.5 * cache.nbytes)
+    # Least recently used masks are removed when the cache is too large
+    grid_masks((21, 21), laterality="OS", cache=cache, **kwargs)
+    assert grid_masks((21, 21), laterality="OD", cache=cache, **kwargs) is not od
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_grid_edge_pixels():
+    from eyepy.quantification.utils.grids import grid_masks
+
+    radii = (10, 30, 45)
+    masks = grid_masks(
+        (101, 101),
+        radii,
+        "OD",
+        n_sectors=(1, 4, 4),
+        offsets=45,
+        center=(50.3, 49.6),
+        smooth_edges=True,
+        cache=False,
+    )
+    # Only pixels cut by a circle or by one of the 4 sector rays are partial
+    bound = sum(8 * r + 4 for r in radii) + 4 * (2 * 45 + 2)
+    assert len(np.unique(masks.edge_pixels)) <= bound
+    assert np.all((masks.edge_weights > 1e-9) & (masks.edge_weights < 1 - 1e-9))
@@ -0,0 +1,184 @@
+import numpy as np
+import pytest
+
+import eyepy as ep
+from eyepy.io.heyex import HeyexVolReader
+from eyepy.io.heyex.specification.vol_export import (
+    HEVOL_BSCAN_VERSIONS,
+    HEVOL_VERSIONS,
+    spec_dtype,
+)
+
+N_BSCANS, SIZE_Y, SIZE_X, SIZE_SLO = 5, 64, 32, 48
+
+
+def write_vol(path):
+    """Write a small synthetic HEYEX .vol file and return its content."""
+    rng = np.random.default_rng(0)
+    bscan_hdr_size = 256 + 17 * SIZE_X * 4
+
+    header = np.zeros(1, dtype=spec_dtype(HEVOL_VERSIONS("HSF-OCT-103")))
+    header["Version"] = b"HSF-OCT-103"
+    header["SizeX"] = SIZE_X
+    header["NumBScans"] = N_BSCANS
+    header["SizeY"] = SIZE_Y
+    header["ScaleX"] = 0.011
+    header["Distance"] = 0.12
+    header["ScaleY"] = 0.0039
+    header["SizeXSlo"] = SIZE_SLO
+    header["SizeYSlo"] = SIZE_SLO
+    header["ScaleXSlo"] = 0.011
+    header["ScaleYSlo"] = 0.011
+    header["ScanPosition"] = b"OD"
+    header["ScanPattern"] = 3
+    header["BScanHdrSize"] = bscan_hdr_size
+    header["PatientID"] = b"patient-1"
+    header["VisitDate"] = 44000.0
+
+    slo = rng.integers(0, 255, (SIZE_SLO, SIZE_SLO), dtype=np.uint8)
+    volume = rng.random((N_BSCANS, SIZE_Y, SIZE_X), dtype=np.float32)
+    volume[:, 0, 0] = np.finfo(np.float32).max
+    layers = np.full((N_BSCANS, 17, SIZE_X), np.finfo(np.float32).max, "float32")
+    layers[:, 1] = 40  # BM
+    layers[:, 16] = 35  # RPE
+
+    bscan_dtype = spec_dtype(HEVOL_BSCAN_VERSIONS("HSF-BS-103"))
+    with open(path, "wb") as f:
+        f.write(header.tobytes())
+        f.write(slo.tobytes())
+        for i in range(N_BSCANS):
+            bscan_header = np.zeros(1, dtype=bscan_dtype)
+            bscan_header["Version"] = b"HSF-BS-103"
+            bscan_header["BScanHdrSize"] = bscan_hdr_size
+            bscan_header["StartX"] = 1.0
+            bscan_header["StartY"] = 1.0 + i * 0.12
+            bscan_header["EndX"] = 1.0 + (SIZE_X - 1) * 0.011
+            bscan_header["EndY"] = 1.0 + i * 0.12
+            bscan_header["NumSeg"] = 17
+            bscan_header["OffSeg"] = 256
+            bscan_header["Quality"] = 20.0 + i
+            f.write(bscan_header.tobytes())
+            f.write(layers[i].tobytes())
+            f.write(volume[i].tobytes())
+
+    return {"slo": slo, "volume": volume, "layers": layers}
+
+
+@pytest.fixture(scope="module")
+def vol_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("vol") / "synthetic.vol"
+    content = write_vol(path)
+    return path, content
+
+
+def test_oct_meta(vol_file):
+    path, _ = vol_file
+    reader = HeyexVolReader(path)
+    assert reader.oct_meta["Version"] == "HSF-OCT-103"
+    assert reader.oct_meta["SizeX"] == SIZE_X
+    assert reader.oct_meta["NumBScans"] == N_BSCANS
+    assert reader.oct_meta["ScanPosition"] == "OD"
+    assert reader.oct_meta["PatientID"] == "patient-1"
+    assert reader.oct_meta["ScaleX"] == 0.011
+
+
+def test_bscan_headers(vol_file):
+    path, _ = vol_file
+    reader = HeyexVolReader(path)
+    headers = reader.bscan_headers
+    assert headers.shape == (N_BSCANS,)
+    assert np.allclose(headers["StartY"], 1.0 + np.arange(N_BSCANS) * 0.12)
+    assert np.all(headers["OffSeg"] == 256)
+
+    bscan = reader.bscans[3]()
+    assert bscan.meta["Version"] == "HSF-BS-103"
+    assert bscan.meta["Quality"] == 23.0
+    assert bscan.meta["IVTrafo"] == (0.0,) * 6
+
+
+def test_import_heyex_vol(vol_file):
+    path, content = vol_file
+    volume = ep.import_heyex_vol(path)
+    assert volume.shape == (N_BSCANS, SIZE_Y, SIZE_X)
+    assert volume.data.dtype == np.uint8
+    assert volume.laterality == "OD"
+    assert volume[2].meta["quality"] == 22.0
+    assert volume[2].meta["start_pos"] == (1.0, 1.0 + 2 * 0.12)
+    assert np.all(volume.layers["BM"].data == 40)
+    assert np.all(volume.layers["RPE"].data == 35)
+    assert np.array_equal(volume.localizer.data, content["slo"])
+
+
+def test_volume_raw_is_view(vol_file):
+    path, content = vol_file
+    reader = HeyexVolReader(path)
+    volume_raw = reader.volume_raw
+    assert not volume_raw.flags.owndata
+    assert not volume_raw.flags.writeable
+    assert np.array_equal(volume_raw, content["volume"])
+    assert np.array_equal(reader.bscans[2]().scan_raw, content["volume"][2])
+
+
+def test_vol_intensity_transform(vol_file):
+    from skimage import img_as_ubyte
+
+    path, content = vol_file
+    data = content["volume"].copy()
+    selection_0 = data == np.finfo(np.float32).max
+    selection_data = data <= 1
+    data[selection_data] = (np.log(data[selection_data] + 2.44e-04) + 8.3) / 8.285
+    data[selection_0] = 0
+    expected = img_as_ubyte(np.clip(data, 0, 1))
+
+    volume = ep.import_heyex_vol(path)
+    assert np.array_equal(volume.data, expected)
+
+
+def test_chunked_intensity_transform(vol_file):
+    from eyepy.core.utils import ChunkedIntensityTransform
+    from eyepy.io.heyex.vol_export import vol_intensity_transform
+
+    path, _ = vol_file
+    volume_raw = HeyexVolReader(path).volume_raw
+    chunked = ChunkedIntensityTransform(
+        vol_intensity_transform, chunk_size=2, max_workers=3
+    )
+    expected = vol_intensity_transform(volume_raw)
+    result = chunked(volume_raw)
+    assert result.dtype == np.uint8
+    assert np.array_equal(result, expected)
+    assert np.array_equal(chunked(volume_raw[1]), expected[1])
+
+
+def test_catalog(vol_file, tmp_path):
+    from eyepy.io.catalog import Catalog, read_heyex_vol_header
+
+    path, _ = vol_file
+    header = read_heyex_vol_header(path)
+    assert header["NumBScans"] == N_BSCANS
+    assert header["PatientID"] == "patient-1"
+
+    data_dir = tmp_path / "exports"
+    data_dir.mkdir()
+    for name in ["a.vol", "b.vol"]:
+        (data_dir / name).write_bytes(path.read_bytes())
+
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        assert catalog.refresh(data_dir)["added"] == 2
+        rows = catalog.query(patient_id="patient-1", laterality="OD")
+        assert len(rows) == 2
+        assert rows[0]["n_bscans"] == N_BSCANS
+        assert rows[0]["scan_pattern"] == 3
+
+        (data_dir / "a.vol").unlink()
+        counts = catalog.refresh(data_dir)
+        assert counts == {"added": 0, "updated": 0, "removed": 1, "unchanged": 1}
+        assert len(catalog) == 1
+
+        # Single files, given as str or Path
+        assert catalog.refresh(str(data_dir / "b.vol"))["unchanged"] == 1
+        assert catalog.refresh(data_dir / "b.vol")["unchanged"] == 1
+        with pytest.raises(FileNotFoundError):
+            catalog.refresh(data_dir / "a.vol")
+        with pytest.raises(FileNotFoundError):
+            catalog.refresh(tmp_path / "missing")
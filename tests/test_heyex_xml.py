@@ -0,0 +1,164 @@
+import imageio
+import numpy as np
+import pytest
+
+import eyepy as ep
+from eyepy.io.heyex import HeyexXmlReader
+
+N_BSCANS, SIZE_Y, SIZE_X, SIZE_SLO = 4, 40, 30, 60
+
+
+def _date(year, month, day):
+    return f"<Date><Year>{year}</Year><Month>{month}</Month><Day>{day}</Day></Date>"
+
+
+def _image(image_type, name, width, height, extra=""):
+    return (
+        f"<Image><ImageType><Type>{image_type}</Type></ImageType>"
+        "<OphthalmicAcquisitionContext>"
+        f"<Width>{width}</Width><Height>{height}</Height>"
+        "<ScaleX>0.0113</ScaleX><ScaleY>0.0039</ScaleY>"
+        "<Angle>30</Angle><Focus>0.5</Focus>"
+        f"{extra}</OphthalmicAcquisitionContext>"
+        f"<ImageData><ExamURL>C:\\export\\{name}</ExamURL></ImageData>"
+        "</Image>"
+    )
+
+
+def write_xml_export(folder):
+    """Write a small synthetic HEYEX XML export and return its content."""
+    rng = np.random.default_rng(1)
+    localizer = rng.integers(0, 255, (SIZE_SLO, SIZE_SLO), dtype=np.uint8)
+    imageio.imwrite(folder / "localizer.png", localizer)
+
+    bscans = rng.integers(0, 255, (N_BSCANS, SIZE_Y, SIZE_X), dtype=np.uint8)
+    layers = {
+        "BM": rng.uniform(25, 30, (N_BSCANS, SIZE_X)).astype("float32"),
+        "RPE": rng.uniform(20, 25, (N_BSCANS, SIZE_X)).astype("float32"),
+    }
+
+    images = [_image("LOCALIZER", "localizer.png", SIZE_SLO, SIZE_SLO)]
+    for i in range(N_BSCANS):
+        imageio.imwrite(folder / f"bscan_{i}.png", bscans[i])
+        y = 0.5 + i * 0.1
+        position = (
+            f"<Start><Coord><X>0.5</X><Y>{y}</Y></Coord></Start>"
+            f"<End><Coord><X>{0.5 + 0.0113 * (SIZE_X - 1)}</X><Y>{y}</Y></Coord></End>"
+            f"<ImageQuality>{30 + i}</ImageQuality>"
+        )
+        seglines = "".join(
+            f"<SegLine><Name>{name}</Name>"
+            f"<Array>{' '.join(str(v) for v in values[i])}</Array></SegLine>"
+            for name, values in layers.items()
+        )
+        image = _image("OCT", f"bscan_{i}.png", SIZE_X, SIZE_Y, position)
+        image = image.replace(
+            "</Image>",
+            f"<Segmentation><NumSegmentations>{len(layers)}</NumSegmentations>"
+            f"{seglines}</Segmentation></Image>",
+        )
+        images.append(image)
+
+    xml = (
+        "<?xml version='1.0' encoding='UTF-8'?><HEDX><BODY>"
+        "<SWVersion><Name>Heidelberg</Name><Version>6.12.4.0</Version></SWVersion>"
+        "<Patient><ID>7</ID><PatientID>patient-2</PatientID>"
+        f"<Birthdate>{_date(1950, 1, 2)}</Birthdate>"
+        f"<Study><StudyDate>{_date(2021, 3, 4)}</StudyDate>"
+        "<Series><ID>11</ID><Laterality>L</Laterality>"
+        f"{''.join(images)}</Series></Study></Patient></BODY></HEDX>"
+    )
+    (folder / "export.xml").write_text(xml)
+    return {"localizer": localizer, "bscans": bscans, "layers": layers}
+
+
+@pytest.fixture(scope="module")
+def xml_export(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("xml")
+    content = write_xml_export(folder)
+    return folder, content
+
+
+def test_reader_index(xml_export):
+    folder, _ = xml_export
+    reader = HeyexXmlReader(folder)
+    assert reader.version == "6.12.4.0"
+    assert reader.oct_meta["NumBScans"] == N_BSCANS
+    assert reader.oct_meta["SizeX"] == SIZE_X
+    assert reader.oct_meta["ScanPosition"] == "OS"
+    assert reader.oct_meta["PatientID"] == "patient-2"
+    assert reader.localizer.name == "localizer.png"
+    assert reader.bscans is reader.bscans
+
+    bscan = reader.bscans[2]()
+    assert bscan.name == "bscan_2.png"
+    assert bscan.meta["Quality"] == 32.0
+    assert bscan.meta["StartY"] == pytest.approx(0.7)
+    # The meta data is read while indexing, the document is not retained
+    assert not hasattr(reader, "xml_root")
+    assert reader.oct_meta["VisitDate"].year == 2021
+
+
+def test_reader_layers(xml_export):
+    from eyepy.io.lazy import SEG_MAPPING
+
+    folder, content = xml_export
+    reader = HeyexXmlReader(folder)
+    assert reader.layers.shape == (17, N_BSCANS, SIZE_X)
+    assert reader.layers.dtype == np.float32
+    for name, values in content["layers"].items():
+        assert np.array_equal(reader.layers[SEG_MAPPING[name]], values)
+    assert np.all(np.isnan(reader.layers[SEG_MAPPING["ILM"]]))
+
+
+def test_import_heyex_xml(xml_export):
+    folder, content = xml_export
+    volume = ep.import_heyex_xml(folder)
+    assert volume.shape == (N_BSCANS, SIZE_Y, SIZE_X)
+    assert volume.laterality == "OS"
+    assert np.array_equal(volume.data, content["bscans"])
+    assert np.array_equal(volume.localizer.data, content["localizer"])
+    # Layer height maps have the first B-scan at the bottom
+    for name, values in content["layers"].items():
+        assert np.allclose(volume.layers[name].data, np.flip(values, axis=0))
+
+
+def test_lazy_layers_are_read_only(xml_export):
+    from eyepy.io.lazy import LazyVolume
+
+    folder, content = xml_export
+    reader = HeyexXmlReader(folder)
+    l_volume = LazyVolume(
+        bscans=reader.bscans,
+        localizer=reader.localizer,
+        meta=reader.oct_meta,
+        data_path=reader.path,
+    )
+    # The cached height maps are shared and can not be modified
+    assert not l_volume.layers["BM"].flags.writeable
+    assert not l_volume[1].layers["BM"].flags.writeable
+
+    volume = ep.import_heyex_xml(folder)
+    volume[1].layers["BM"] = 0
+    assert np.all(volume.layers["BM"].data[-2] == 0)
+
+
+def test_import_bscan_folder(xml_export, tmp_path):
+    _, content = xml_export
+    for i, bscan in enumerate(content["bscans"]):
+        imageio.imwrite(tmp_path / f"{i:03d}.png", bscan)
+    volume = ep.import_bscan_folder(tmp_path, max_workers=2)
+    assert volume.data.dtype == np.uint8
+    assert np.array_equal(volume.data, content["bscans"])
+
+
+def test_read_heyex_xml_header(xml_export):
+    from eyepy.io.catalog import read_heyex_xml_header
+
+    folder, _ = xml_export
+    header = read_heyex_xml_header(folder / "export.xml")
+    assert header["PatientID"] == "patient-2"
+    assert header["ScanPosition"] == "OS"
+    assert header["SizeX"] == SIZE_X
+    assert header["SizeY"] == SIZE_Y
+    assert header["NumBScans"] is None
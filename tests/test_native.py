@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+import eyepy as ep
+
+
+@pytest.fixture
+def eyevolume():
+    rng = np.random.default_rng(2)
+    volume = ep.EyeVolume(data=rng.random((6, 20, 30)))
+    volume.set_intensity_transform(lambda x: (x * 255).astype(np.uint8))
+    volume.add_layer("BM", np.full((6, 30), 15.0))
+    volume.layers["BM"].knots[2] = [
+        {"pos": (1.0, 15.0), "cp_in": (0.5, 15.0), "cp_out": (1.5, 15.0)}
+    ]
+    volume.set_volume_map("drusen", rng.random((6, 20, 30)) > 0.9)
+    volume.volume_maps["drusen"].radii = (1, 2, 3)
+    volume.ascan_maps["GA"] = rng.random((6, 30)) > 0.5
+    return volume
+
+
+def test_save_load(eyevolume, tmp_path):
+    eyevolume.save(tmp_path / "volume.eye")
+    loaded = ep.EyeVolume.load(tmp_path / "volume.eye")
+
+    assert isinstance(loaded._raw_data, np.memmap)
+    assert np.array_equal(loaded.data, eyevolume.data)
+    assert np.array_equal(loaded[3].data, eyevolume[3].data)
+    assert loaded.meta["bscan_meta"][2]["start_pos"] == (0, 3)
+    assert type(loaded[2].meta) == ep.EyeBscanMeta
+    assert np.allclose(loaded.localizer.data, eyevolume.localizer.data)
+    assert np.allclose(
+        loaded.localizer_transform.params, eyevolume.localizer_transform.params
+    )
+
+    assert np.array_equal(loaded.layers["BM"].data, eyevolume.layers["BM"].data)
+    assert loaded.layers["BM"].knots[2][0]["cp_in"] == (0.5, 15.0)
+    drusen = loaded.volume_maps["drusen"]
+    assert np.array_equal(drusen.data, eyevolume.volume_maps["drusen"].data)
+    assert drusen.radii == (1, 2, 3)
+    assert np.array_equal(loaded.ascan_maps["GA"], eyevolume.ascan_maps["GA"])
+
+    # Annotations of a loaded volume can be edited without changing the archive
+    loaded[0].layers["BM"] = 10
+    assert np.all(ep.EyeVolume.load(tmp_path / "volume.eye").layers["BM"].data == 15)
+
+
+def test_save_load_raw(eyevolume, tmp_path):
+    eyevolume.save(tmp_path / "volume.eye", include_raw=True)
+    loaded = ep.EyeVolume.load(tmp_path / "volume.eye")
+    assert np.array_equal(loaded.data, eyevolume.data)
+    assert np.array_equal(loaded._raw_data, eyevolume._raw_data)
+
+    # Overwrite the archive the volume was loaded from
+    loaded.save(tmp_path / "volume.eye")
+    assert np.array_equal(
+        ep.EyeVolume.load(tmp_path / "volume.eye").data, eyevolume.data
+    )
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["volume.eye"]
+
+
+def test_save_interrupted(eyevolume, tmp_path, monkeypatch):
+    from pathlib import Path
+
+    eyevolume.save(tmp_path / "volume.eye")
+    rename = Path.rename
+
+    def interrupted(self, target):
+        if self.name.endswith(".tmp"):
+            raise OSError("interrupted")
+        return rename(self, target)
+
+    # An interrupted swap leaves the previous archive complete
+    monkeypatch.setattr(Path, "rename", interrupted)
+    with pytest.raises(OSError):
+        eyevolume.save(tmp_path / "volume.eye")
+    loaded = ep.EyeVolume.load(tmp_path / "volume.eye.old")
+    assert np.array_equal(loaded.data, eyevolume.data)
+
+    monkeypatch.setattr(Path, "rename", rename)
+    eyevolume.save(tmp_path / "volume.eye")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["volume.eye"]
+
+
+def test_save_annotations(eyevolume, tmp_path):
+    path = tmp_path / "volume.eye"
+    with pytest.raises(ValueError):
+        eyevolume.save_annotations(path)
+    eyevolume.save(path)
+    assert eyevolume.layers["BM"].dirty_bscans == []
+
+    loaded = ep.EyeVolume.load(path)
+    bm_file = path / "layers" / "0.npy"
+    data_mtime = (path / "data.npy").stat().st_mtime_ns
+
+    loaded[1].layers["BM"] = 12
+    loaded[4].layers["BM"] = 13
+    assert loaded.layers["BM"].dirty_bscans == [1, 4]
+    loaded.volume_maps["drusen"].data[2, 0, 0] = True
+    loaded.volume_maps["drusen"].mark_dirty(2)
+    assert loaded.volume_maps["drusen"].dirty_bscans == [2]
+    loaded.add_layer("ILM", np.full((6, 30), 3.0))
+    loaded.save_annotations()
+
+    assert loaded.layers["BM"].dirty_bscans == []
+    assert (path / "data.npy").stat().st_mtime_ns == data_mtime
+    assert bm_file.exists()
+
+    reloaded = ep.EyeVolume.load(path)
+    assert np.all(reloaded[1].layers["BM"] == 12)
+    assert np.all(reloaded[4].layers["BM"] == 13)
+    assert np.all(reloaded[0].layers["BM"] == 15)
+    assert np.all(reloaded.layers["ILM"].data == 3)
+    assert reloaded.volume_maps["drusen"].data[2, 0, 0]
+
+    # Removed annotations are deleted from the archive
+    del reloaded.layers["ILM"]
+    reloaded.save_annotations()
+    assert "ILM" not in ep.EyeVolume.load(path).layers
+    assert len(list((path / "layers").iterdir())) == 1
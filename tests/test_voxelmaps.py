@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import eyepy as ep
+from eyepy.core.voxelmaps import (
+    LabelVoxelMap,
+    PackedVoxelMap,
+    RunLengthVoxelMap,
+    VoxelMap,
+)
+
+
+@pytest.fixture(scope="module")
+def labels():
+    rng = np.random.default_rng(3)
+    return rng.integers(0, 4, (5, 19, 23), dtype=np.uint8)
+
+
+@pytest.mark.parametrize(
+    "compact",
+    [
+        lambda labels: PackedVoxelMap(labels == 2),
+        lambda labels: RunLengthVoxelMap(labels == 2),
+        lambda labels: LabelVoxelMap(labels, 2),
+    ],
+)
+def test_voxel_maps(labels, compact):
+    dense = labels == 2
+    voxel_map = compact(labels)
+    assert voxel_map.shape == dense.shape
+    assert len(voxel_map) == len(dense)
+    assert np.array_equal(voxel_map.projection(), dense.sum(axis=1))
+    assert np.array_equal(voxel_map[3], dense[3])
+    assert np.array_equal(voxel_map[-1, 2:5], dense[-1, 2:5])
+    assert np.array_equal(voxel_map[1:4, :, 3], dense[1:4, :, 3])
+    assert np.array_equal(np.asarray(voxel_map), dense)
+
+    volume = ep.EyeVolume(data=np.zeros(dense.shape))
+    volume.set_volume_map("fluid", voxel_map)
+    assert np.array_equal(
+        volume.volume_maps["fluid"].projection, np.flip(dense.sum(axis=1), axis=0)
+    )
+    assert np.array_equal(volume[2].area_maps["fluid"], dense[2])
+
+
+def test_incomplete_voxel_map():
+    class BscansOnly(VoxelMap):
+        def _bscan(self, index):
+            return np.zeros(self.shape[1:], dtype=bool)
+
+    with pytest.raises(TypeError):
+        BscansOnly((2, 3, 4))